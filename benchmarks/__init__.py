@@ -0,0 +1,12 @@
+"""
+Пакет инструментов измерения производительности бота.
+
+Содержит:
+- fake_openai: Заглушка OpenAI-совместимого API
+- fake_telegram: Заглушка Telegram Bot API
+- load_test: Сквозной нагрузочный тест через настоящие Dispatcher и routers
+- micro: Микробенчмарки горячих участков кода с контролем регрессий
+
+Пакет не используется ботом во время работы и запускается вручную:
+    python -m benchmarks.load_test --help
+"""
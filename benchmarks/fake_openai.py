@@ -0,0 +1,264 @@
+"""
+Детерминированная заглушка OpenAI-совместимого API.
+
+Поднимает локальный HTTP-сервер с эндпоинтом /v1/chat/completions,
+на который можно направить ChatGpt через переменную окружения GPT_BASE_URL.
+
+Основные возможности:
+- Настраиваемое распределение задержек (константа, равномерное, логнормальное)
+- Потоковые ответы (stream=true) в формате SSE
+- Инъекция ошибок 429 и 5xx с заданной вероятностью
+- Воспроизводимость за счет фиксированного seed
+
+Пример использования:
+	python -m benchmarks.fake_openai --port 8090 --latency lognormal:0.8:0.4
+
+Зависимости:
+- aiohttp: HTTP-сервер (устанавливается вместе с aiogram)
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+@dataclass
+class LatencyModel:
+	"""
+	Распределение задержки ответа в секундах.
+
+	Attributes:
+		kind (str): Тип распределения: const, uniform или lognormal
+		a (float): Значение (const), нижняя граница (uniform) или медиана (lognormal)
+		b (float): Верхняя граница (uniform) или sigma (lognormal)
+	"""
+	kind: str = 'const'
+	a: float = 0.0
+	b: float = 0.0
+
+	@classmethod
+	def parse(cls, spec: str) -> 'LatencyModel':
+		"""
+		Создает модель задержки из строки вида 'kind:a:b'.
+
+		Args:
+			spec (str): Описание распределения, например 'uniform:0.2:1.5'
+
+		Returns:
+			LatencyModel: Модель задержки
+
+		Raises:
+			ValueError: Если тип распределения неизвестен
+		"""
+		kind, *params = spec.split(':')
+		if kind not in ('const', 'uniform', 'lognormal'):
+			raise ValueError(f"Unknown latency distribution: {kind}")
+		values = [float(p) for p in params] + [0.0, 0.0]
+		return cls(kind, values[0], values[1])
+
+	def sample(self, rng: random.Random) -> float:
+		"""
+		Возвращает случайную задержку.
+
+		Args:
+			rng (random.Random): Генератор случайных чисел
+
+		Returns:
+			float: Задержка в секундах
+		"""
+		if self.kind == 'uniform':
+			return rng.uniform(self.a, self.b)
+		if self.kind == 'lognormal':
+			return self.a * rng.lognormvariate(0.0, self.b)
+		return self.a
+
+
+@dataclass
+class FakeOpenAIStats:
+	"""Счетчики обработанных заглушкой запросов."""
+	requests: int = 0
+	errors_429: int = 0
+	errors_5xx: int = 0
+	streamed: int = 0
+	models: Dict[str, int] = field(default_factory=dict)
+
+
+class FakeOpenAIServer:
+	"""
+	Локальный сервер, имитирующий Chat Completions API.
+
+	Ответы детерминированы: текст зависит только от содержимого запроса
+	и номера запроса, а задержки и ошибки определяются seed.
+
+	Attributes:
+		latency (LatencyModel): Распределение задержки ответа
+		error_429_rate (float): Доля ответов 429 Too Many Requests
+		error_5xx_rate (float): Доля ответов 500/503
+		reply_length (int): Длина ответа для свободного диалога в символах
+		stats (FakeOpenAIStats): Статистика запросов
+	"""
+
+	def __init__(
+		self,
+		latency: Optional[LatencyModel] = None,
+		error_429_rate: float = 0.0,
+		error_5xx_rate: float = 0.0,
+		reply_length: int = 300,
+		seed: int = 42,
+	):
+		self.latency = latency or LatencyModel()
+		self.error_429_rate = error_429_rate
+		self.error_5xx_rate = error_5xx_rate
+		self.reply_length = reply_length
+		self.stats = FakeOpenAIStats()
+		self._rng = random.Random(seed)
+		self._runner: Optional[web.AppRunner] = None
+		self.base_url = ''
+
+	def _make_app(self) -> web.Application:
+		app = web.Application()
+		app.router.add_post('/v1/chat/completions', self._chat_completions)
+		app.router.add_get('/v1/models', self._models)
+		return app
+
+	async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+		"""
+		Запускает сервер.
+
+		Args:
+			host (str): Адрес для прослушивания
+			port (int): Порт (0 - выбрать свободный)
+
+		Returns:
+			str: Базовый URL для GPT_BASE_URL
+		"""
+		self._runner = web.AppRunner(self._make_app(), access_log=None)
+		await self._runner.setup()
+		site = web.TCPSite(self._runner, host, port)
+		await site.start()
+		sockets = site._server.sockets  # type: ignore[union-attr]
+		port = sockets[0].getsockname()[1]
+		self.base_url = f'http://{host}:{port}/v1'
+		return self.base_url
+
+	async def stop(self) -> None:
+		"""Останавливает сервер."""
+		if self._runner is not None:
+			await self._runner.cleanup()
+			self._runner = None
+
+	def _reply_text(self, messages: List[Dict[str, Any]], number: int, structured: bool) -> str:
+		"""Формирует детерминированный ответ в формате, ожидаемом режимом бота."""
+		system = messages[0].get('content', '') if messages else ''
+		if structured:
+			return json.dumps({'title': f'Произведение {number}', 'desc': f'Синтетическое описание рекомендации {number}.'}, ensure_ascii=False)
+		if 'Название:' in system:
+			return f'Название: Произведение {number}\nОписание: Синтетическое описание рекомендации {number}.'
+		if 'quiz' in system:
+			return 'Правильно!' if number % 2 else f'Вопрос {number}: как называется столица Франции?'
+		base = f'Синтетический ответ {number}. '
+		return (base * (self.reply_length // len(base) + 1))[:self.reply_length]
+
+	async def _models(self, request: web.Request) -> web.Response:
+		return web.json_response({'object': 'list', 'data': [{'id': 'fake-model', 'object': 'model'}]})
+
+	async def _chat_completions(self, request: web.Request) -> web.StreamResponse:
+		body = await request.json()
+		self.stats.requests += 1
+		number = self.stats.requests
+		model = body.get('model', '')
+		self.stats.models[model] = self.stats.models.get(model, 0) + 1
+
+		await asyncio.sleep(self.latency.sample(self._rng))
+
+		roll = self._rng.random()
+		if roll < self.error_429_rate:
+			self.stats.errors_429 += 1
+			return web.json_response(
+				{'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error'}},
+				status=429,
+				headers={'retry-after': '1'},
+			)
+		if roll < self.error_429_rate + self.error_5xx_rate:
+			self.stats.errors_5xx += 1
+			return web.json_response(
+				{'error': {'message': 'Service unavailable', 'type': 'server_error'}},
+				status=503 if number % 2 else 500,
+			)
+
+		text = self._reply_text(body.get('messages', []), number, 'response_format' in body)
+		completion_id = f'chatcmpl-fake-{number}'
+		created = int(time.time())
+		if body.get('stream'):
+			self.stats.streamed += 1
+			return await self._stream(request, completion_id, created, model, text)
+		return web.json_response({
+			'id': completion_id,
+			'object': 'chat.completion',
+			'created': created,
+			'model': model,
+			'choices': [{
+				'index': 0,
+				'message': {'role': 'assistant', 'content': text},
+				'finish_reason': 'stop',
+			}],
+			'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+		})
+
+	async def _stream(self, request: web.Request, completion_id: str, created: int, model: str, text: str) -> web.StreamResponse:
+		response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+		await response.prepare(request)
+		chunk_size = 20
+		for start in range(0, len(text), chunk_size):
+			chunk = {
+				'id': completion_id,
+				'object': 'chat.completion.chunk',
+				'created': created,
+				'model': model,
+				'choices': [{'index': 0, 'delta': {'content': text[start:start + chunk_size]}, 'finish_reason': None}],
+			}
+			await response.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode())
+		await response.write(b'data: [DONE]\n\n')
+		await response.write_eof()
+		return response
+
+
+async def _serve(args: argparse.Namespace) -> None:
+	server = FakeOpenAIServer(
+		latency=LatencyModel.parse(args.latency),
+		error_429_rate=args.error_429,
+		error_5xx_rate=args.error_5xx,
+		reply_length=args.reply_length,
+		seed=args.seed,
+	)
+	url = await server.start(args.host, args.port)
+	print(f'Fake OpenAI API listening on {url}')
+	try:
+		await asyncio.Event().wait()
+	finally:
+		await server.stop()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Fake OpenAI-compatible API server')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8090)
+	parser.add_argument('--latency', default='const:0.5', help="const:S | uniform:MIN:MAX | lognormal:MEDIAN:SIGMA")
+	parser.add_argument('--error-429', type=float, default=0.0)
+	parser.add_argument('--error-5xx', type=float, default=0.0)
+	parser.add_argument('--reply-length', type=int, default=300)
+	parser.add_argument('--seed', type=int, default=42)
+	try:
+		asyncio.run(_serve(parser.parse_args()))
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == '__main__':
+	main()
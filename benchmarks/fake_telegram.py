@@ -0,0 +1,209 @@
+"""
+Заглушка Telegram Bot API для нагрузочных тестов.
+
+Поднимает локальный HTTP-сервер, совместимый с форматом запросов aiogram,
+на который бот направляется через TelegramAPIServer.from_base
+(переменная окружения TELEGRAM_API_URL).
+
+Основные возможности:
+- Ответы на методы отправки сообщений, фото, действий и callback-запросов
+- Проверка лимитов длины подписи и текста, как у настоящего Bot API
+- Проверка парности разметки Markdown с ошибкой "can't parse entities"
+- Имитация ограничений скорости (глобальных и на чат) с ответом 429
+
+Зависимости:
+- aiohttp: HTTP-сервер (устанавливается вместе с aiogram)
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+from aiohttp import web
+
+BOT_USER = {'id': 100000, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+
+MAX_CAPTION_LENGTH = 1024
+MAX_MESSAGE_LENGTH = 4096
+
+
+@dataclass
+class FakeTelegramStats:
+	"""Счетчики вызовов методов Bot API."""
+	calls: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+	bad_requests: int = 0
+	rate_limited: int = 0
+	uploaded_bytes: int = 0
+
+
+def markdown_is_balanced(text: str) -> bool:
+	"""
+	Упрощенная проверка разметки Markdown (legacy), как ее видит Bot API.
+
+	Args:
+		text (str): Текст сообщения
+
+	Returns:
+		bool: True, если все сущности разметки закрыты
+	"""
+	open_entity: Optional[str] = None
+	i = 0
+	while i < len(text):
+		char = text[i]
+		if char == '\\' and open_entity is None:
+			i += 2
+			continue
+		if open_entity is None:
+			if text.startswith('```', i):
+				open_entity = '```'
+				i += 3
+				continue
+			if char in '*_`':
+				open_entity = char
+			elif char == '[':
+				open_entity = ']'
+		elif text.startswith(open_entity, i):
+			i += len(open_entity)
+			open_entity = None
+			continue
+		i += 1
+	return open_entity is None
+
+
+class FakeTelegramServer:
+	"""
+	Локальный сервер, имитирующий Telegram Bot API.
+
+	Attributes:
+		latency (float): Задержка ответа на каждый вызов в секундах
+		global_rate (Optional[int]): Лимит отправок в секунду на весь бот
+		chat_rate (Optional[int]): Лимит отправок в секунду на один чат
+		stats (FakeTelegramStats): Статистика вызовов
+	"""
+
+	def __init__(self, latency: float = 0.0, global_rate: Optional[int] = None, chat_rate: Optional[int] = None):
+		self.latency = latency
+		self.global_rate = global_rate
+		self.chat_rate = chat_rate
+		self.stats = FakeTelegramStats()
+		self._message_id = 0
+		self._global_window: Deque[float] = deque()
+		self._chat_windows: Dict[Any, Deque[float]] = defaultdict(deque)
+		self._runner: Optional[web.AppRunner] = None
+		self.base_url = ''
+
+	async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+		"""
+		Запускает сервер.
+
+		Args:
+			host (str): Адрес для прослушивания
+			port (int): Порт (0 - выбрать свободный)
+
+		Returns:
+			str: Базовый URL для TELEGRAM_API_URL
+		"""
+		app = web.Application(client_max_size=50 * 1024 * 1024)
+		app.router.add_post('/bot{token}/{method}', self._handle)
+		self._runner = web.AppRunner(app, access_log=None)
+		await self._runner.setup()
+		site = web.TCPSite(self._runner, host, port)
+		await site.start()
+		port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+		self.base_url = f'http://{host}:{port}'
+		return self.base_url
+
+	async def stop(self) -> None:
+		"""Останавливает сервер."""
+		if self._runner is not None:
+			await self._runner.cleanup()
+			self._runner = None
+
+	@staticmethod
+	def _error(code: int, description: str, **parameters: Any) -> web.Response:
+		payload: Dict[str, Any] = {'ok': False, 'error_code': code, 'description': description}
+		if parameters:
+			payload['parameters'] = parameters
+		return web.json_response(payload, status=code)
+
+	def _is_rate_limited(self, chat_id: Any) -> bool:
+		now = time.monotonic()
+		windows = [(self._global_window, self.global_rate), (self._chat_windows[chat_id], self.chat_rate)]
+		for window, limit in windows:
+			while window and now - window[0] > 1.0:
+				window.popleft()
+			if limit is not None and len(window) >= limit:
+				return True
+		for window, _ in windows:
+			window.append(now)
+		return False
+
+	def _message(self, chat_id: Any, **extra: Any) -> Dict[str, Any]:
+		self._message_id += 1
+		message = {
+			'message_id': self._message_id,
+			'date': int(time.time()),
+			'chat': {'id': int(chat_id), 'type': 'private'},
+			'from': BOT_USER,
+		}
+		message.update({key: value for key, value in extra.items() if value is not None})
+		return message
+
+	async def _handle(self, request: web.Request) -> web.Response:
+		method = request.match_info['method'].lower()
+		form = await request.post()
+		self.stats.calls[method] += 1
+		if self.latency:
+			await asyncio.sleep(self.latency)
+
+		if method == 'getme':
+			return web.json_response({'ok': True, 'result': BOT_USER})
+		if method in ('sendchataction', 'answercallbackquery', 'deletemessage'):
+			return web.json_response({'ok': True, 'result': True})
+
+		chat_id = form.get('chat_id', 0)
+		if self._is_rate_limited(chat_id):
+			self.stats.rate_limited += 1
+			return self._error(429, 'Too Many Requests: retry after 1', retry_after=1)
+
+		text = str(form.get('text') or form.get('caption') or '')
+		limit = MAX_MESSAGE_LENGTH if 'text' in form else MAX_CAPTION_LENGTH
+		if len(text) > limit:
+			self.stats.bad_requests += 1
+			what = 'message is too long' if 'text' in form else 'message caption is too long'
+			return self._error(400, f'Bad Request: {what}')
+		if str(form.get('parse_mode', '')).lower() == 'markdown' and not markdown_is_balanced(text):
+			self.stats.bad_requests += 1
+			return self._error(400, "Bad Request: can't parse entities: can't find end of the entity")
+
+		photo = None
+		if method in ('sendphoto', 'editmessagemedia'):
+			photo_field = form.get('photo') or form.get('media')
+			if method == 'editmessagemedia':
+				photo_field = json.loads(str(photo_field)).get('media')
+			# aiogram передает файл отдельным полем и ссылается на него как attach://<поле>
+			if isinstance(photo_field, str) and photo_field.startswith('attach://'):
+				photo_field = form.get(photo_field[len('attach://'):])
+			raw = getattr(photo_field, 'file', None)
+			content = raw.read() if raw else str(photo_field).encode()
+			if raw:
+				self.stats.uploaded_bytes += len(content)
+			digest = hashlib.sha1(content).hexdigest()[:16]
+			photo = [{'file_id': f'fake-{digest}', 'file_unique_id': digest, 'width': 1280, 'height': 720}]
+
+		if method in ('sendmessage', 'sendphoto', 'editmessagemedia', 'editmessagecaption', 'editmessagetext'):
+			reply_markup = form.get('reply_markup')
+			markup = json.loads(str(reply_markup)) if reply_markup else None
+			result = self._message(
+				chat_id,
+				text=form.get('text'),
+				caption=form.get('caption'),
+				photo=photo,
+				reply_markup=markup if markup and 'inline_keyboard' in markup else None,
+			)
+			return web.json_response({'ok': True, 'result': result})
+		return web.json_response({'ok': True, 'result': True})
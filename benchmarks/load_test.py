@@ -0,0 +1,380 @@
+"""
+Сквозной нагрузочный тест бота на локальных заглушках.
+
+Поднимает заглушки OpenAI и Telegram Bot API, направляет на них бота
+через GPT_BASE_URL и TELEGRAM_API_URL и прогоняет синтетические обновления
+через настоящие Dispatcher и routers из main.create_dispatcher().
+
+Отчет содержит:
+- Пропускную способность (обновлений в секунду)
+- Задержку обработки обновления p50/p95/p99
+- Память на 1000 активных сессий (по tracemalloc)
+- Статистику вызовов заглушек
+- Долю попаданий в кэш ответов ChatGPT и число объединенных запросов
+- Количество отброшенных повторных доставок (при --redeliver)
+
+Пример использования:
+	python -m benchmarks.load_test --users 200 --turns 5 --gpt-latency lognormal:0.8:0.4
+
+Запускается из корня репозитория, так как ресурсы бота ищутся по относительным путям.
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from .fake_openai import FakeOpenAIServer, LatencyModel
+from .fake_telegram import BOT_USER, FakeTelegramServer
+
+FAKE_BOT_TOKEN = '123456:FAKE-LOAD-TEST-TOKEN'
+SERVICE_CHAT_ID = -1000
+SCENARIOS = ('gpt', 'talk', 'quiz', 'random', 'media', 'translator')
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+	"""
+	Возвращает перцентиль по методу ближайшего ранга.
+
+	Args:
+		values (Sequence[float]): Набор значений
+		q (float): Перцентиль от 0 до 100
+
+	Returns:
+		float: Значение перцентиля или 0.0 для пустого набора
+	"""
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+	return ordered[index]
+
+
+class UpdateFactory:
+	"""Генератор синтетических обновлений Telegram в виде словарей."""
+
+	def __init__(self):
+		self._update_id = itertools.count(1)
+		self._message_id = itertools.count(1)
+		self._callback_id = itertools.count(1)
+
+	@staticmethod
+	def _user(user_id: int) -> Dict[str, Any]:
+		return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+
+	def message(self, user_id: int, text: str) -> Dict[str, Any]:
+		"""Создает обновление с текстовым сообщением пользователя."""
+		return {
+			'update_id': next(self._update_id),
+			'message': {
+				'message_id': next(self._message_id),
+				'date': int(time.time()),
+				'chat': {'id': user_id, 'type': 'private'},
+				'from': self._user(user_id),
+				'text': text,
+			},
+		}
+
+	def callback(self, user_id: int, data: str) -> Dict[str, Any]:
+		"""Создает обновление с нажатием inline-кнопки."""
+		return {
+			'update_id': next(self._update_id),
+			'callback_query': {
+				'id': str(next(self._callback_id)),
+				'from': self._user(user_id),
+				'chat_instance': str(user_id),
+				'data': data,
+				'message': {
+					'message_id': next(self._message_id),
+					'date': int(time.time()),
+					'chat': {'id': user_id, 'type': 'private'},
+					'from': BOT_USER,
+					'caption': 'synthetic',
+				},
+			},
+		}
+
+
+def build_scenarios(factory: UpdateFactory, turns: int) -> Dict[str, Callable[[int], List[Dict[str, Any]]]]:
+	"""
+	Описывает пользовательские сценарии для каждого режима бота.
+
+	Каждый сценарий оставляет сессию пользователя активной, чтобы
+	ее можно было учесть при измерении памяти.
+
+	Args:
+		factory (UpdateFactory): Генератор обновлений
+		turns (int): Количество реплик пользователя в диалоговых режимах
+
+	Returns:
+		Dict[str, Callable[[int], List[Dict[str, Any]]]]: Сценарии по имени режима
+	"""
+	from models import CelebrityData, QuizData, MediaData, TranslatorData
+
+	def gpt(uid: int) -> List[Dict[str, Any]]:
+		return [factory.message(uid, '/gpt')] + [factory.message(uid, f'Вопрос номер {i}') for i in range(turns)]
+
+	def talk(uid: int) -> List[Dict[str, Any]]:
+		select = CelebrityData(button='select_celebrity', file_name='talk_cobain').pack()
+		return [factory.message(uid, '/talk'), factory.callback(uid, select)] + [
+			factory.message(uid, f'Расскажи о песне {i}') for i in range(turns)
+		]
+
+	def quiz(uid: int) -> List[Dict[str, Any]]:
+		topic = QuizData(button='select_topic', topic='quiz_prog', topic_name='Язык Python')
+		updates = [factory.message(uid, '/quiz'), factory.callback(uid, topic.pack())]
+		for i in range(turns):
+			updates.append(factory.message(uid, f'Ответ {i}'))
+			updates.append(factory.callback(uid, QuizData(button='next_question', topic=topic.topic, topic_name=topic.topic_name).pack()))
+		return updates
+
+	def random_fact(uid: int) -> List[Dict[str, Any]]:
+		return [factory.message(uid, '/start')] + [factory.message(uid, '/random') for _ in range(turns)]
+
+	def media(uid: int) -> List[Dict[str, Any]]:
+		return [
+			factory.message(uid, '/media'),
+			factory.callback(uid, MediaData(button='select_category', category='movies').pack()),
+			factory.callback(uid, MediaData(button='select_genre', category='movies', genre='action').pack()),
+		] + [factory.callback(uid, MediaData(button='dislike', category='movies', genre='action').pack()) for _ in range(turns)]
+
+	def translator(uid: int) -> List[Dict[str, Any]]:
+		updates = []
+		for i in range(turns):
+			updates += [
+				factory.message(uid, '/translator'),
+				factory.callback(uid, TranslatorData(button='eng_rus', direction='eng_rus').pack()),
+				factory.message(uid, f'Hello world number {i}'),
+			]
+		return updates
+
+	return {
+		'gpt': gpt,
+		'talk': talk,
+		'quiz': quiz,
+		'random': random_fact,
+		'media': media,
+		'translator': translator,
+	}
+
+
+async def run_users(
+	dp: Any,
+	bot: Any,
+	plans: List[List[Dict[str, Any]]],
+	concurrency: int,
+	redeliver: float = 0.0,
+	seed: int = 0,
+) -> Tuple[List[float], int]:
+	"""
+	Прогоняет сценарии пользователей через диспетчер.
+
+	Обновления одного пользователя обрабатываются последовательно,
+	разные пользователи - параллельно с ограничением concurrency.
+
+	Args:
+		dp (Dispatcher): Диспетчер бота
+		bot (Bot): Экземпляр бота
+		plans (List[List[Dict[str, Any]]]): Списки обновлений по пользователям
+		concurrency (int): Максимум одновременно активных пользователей
+		redeliver (float): Доля обновлений, доставляемых повторно (как после сбоя сети)
+		seed (int): Зерно генератора повторных доставок
+
+	Returns:
+		Tuple[List[float], int]: Задержки обработки обновлений в секундах
+			и количество обновлений, завершившихся исключением
+	"""
+	from aiogram.types import Update
+
+	latencies: List[float] = []
+	errors = 0
+	semaphore = asyncio.Semaphore(concurrency)
+	rng = random.Random(seed)
+
+	async def run_user(updates: List[Dict[str, Any]]) -> None:
+		nonlocal errors
+		async with semaphore:
+			for raw in updates:
+				update = Update.model_validate(raw, context={'bot': bot})
+				deliveries = 2 if redeliver and rng.random() < redeliver else 1
+				for _ in range(deliveries):
+					started = time.perf_counter()
+					try:
+						await dp.feed_update(bot, update)
+					except Exception:
+						errors += 1
+					latencies.append(time.perf_counter() - started)
+
+	await asyncio.gather(*(run_user(plan) for plan in plans))
+	return latencies, errors
+
+
+def make_plans(scenarios: Dict[str, Callable[[int], List[Dict[str, Any]]]], modes: Sequence[str], user_ids: range, seed: int) -> List[List[Dict[str, Any]]]:
+	"""Распределяет пользователей по режимам в воспроизводимом порядке."""
+	rng = random.Random(seed)
+	return [scenarios[rng.choice(modes)](uid) for uid in user_ids]
+
+
+def count_sessions(dp: Any) -> int:
+	"""Считает сессии FSM с непустыми данными."""
+	storage = getattr(dp.storage, 'storage', {})
+	return sum(1 for record in storage.values() if record.data)
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+	"""
+	Выполняет нагрузочный тест и возвращает отчет.
+
+	Args:
+		args (argparse.Namespace): Параметры запуска
+
+	Returns:
+		Dict[str, Any]: Отчет с метриками
+	"""
+	openai_server = FakeOpenAIServer(
+		latency=LatencyModel.parse(args.gpt_latency),
+		error_429_rate=args.error_429,
+		error_5xx_rate=args.error_5xx,
+		reply_length=args.reply_length,
+		seed=args.seed,
+	)
+	telegram_server = FakeTelegramServer(
+		latency=args.tg_latency,
+		global_rate=args.tg_global_rate,
+		chat_rate=args.tg_chat_rate,
+	)
+	os.environ['GPT_BASE_URL'] = await openai_server.start()
+	os.environ['TELEGRAM_API_URL'] = await telegram_server.start()
+	os.environ.setdefault('GPT_TOKEN', 'fake-token')
+	os.environ.setdefault('BOT_TOKEN', FAKE_BOT_TOKEN)
+	# Прогоны не должны зависеть от сессий и обновлений предыдущего запуска
+	os.environ['SESSION_SNAPSHOT_PATH'] = ''
+	os.environ['DEDUP_DB_PATH'] = ''
+	os.environ['PREFERENCES_DB_PATH'] = ''
+	os.environ['QUIZ_BANK_DB_PATH'] = ''
+	os.environ['FILE_IDS_DB_PATH'] = ''
+	if args.preupload:
+		os.environ['SERVICE_CHAT_ID'] = str(SERVICE_CHAT_ID)
+	# Синтетические пользователи пишут быстрее людей; для проверки
+	# ограничения частоты задайте THROTTLE_* в окружении
+	for name in ('THROTTLE_RATE', 'THROTTLE_BURST', 'THROTTLE_GPT_RATE', 'THROTTLE_GPT_BURST'):
+		os.environ.setdefault(name, '1000000')
+
+	# Импорт после настройки окружения: Config читает переменные при импорте
+	from common import metrics, setup_logging
+	from main import create_bot, create_dispatcher
+
+	log_listener = setup_logging()
+	bot = create_bot(FAKE_BOT_TOKEN)
+	dp = create_dispatcher()
+	factory = UpdateFactory()
+	scenarios = build_scenarios(factory, args.turns)
+	modes = args.modes or SCENARIOS
+	try:
+		await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot])
+		plans = make_plans(scenarios, modes, range(1, args.users + 1), args.seed)
+		total_updates = sum(len(plan) for plan in plans)
+		started = time.perf_counter()
+		latencies, errors = await run_users(dp, bot, plans, args.concurrency, args.redeliver, args.seed)
+		elapsed = time.perf_counter() - started
+
+		memory_per_1k = None
+		if args.memory_users:
+			gc.collect()
+			tracemalloc.start()
+			baseline = tracemalloc.get_traced_memory()[0]
+			sessions_before = count_sessions(dp)
+			first_uid = args.users + 1
+			memory_plans = make_plans(scenarios, modes, range(first_uid, first_uid + args.memory_users), args.seed + 1)
+			await run_users(dp, bot, memory_plans, args.concurrency)
+			gc.collect()
+			retained = tracemalloc.get_traced_memory()[0] - baseline
+			tracemalloc.stop()
+			new_sessions = max(1, count_sessions(dp) - sessions_before)
+			memory_per_1k = retained / new_sessions * 1000
+	finally:
+		await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot])
+		await bot.session.close()
+		await openai_server.stop()
+		await telegram_server.stop()
+		log_listener.stop()
+
+	return {
+		'users': args.users,
+		'updates': total_updates,
+		'failed_updates': errors,
+		'elapsed_s': round(elapsed, 3),
+		'updates_per_s': round(total_updates / elapsed, 2) if elapsed else 0.0,
+		'latency_ms': {
+			'p50': round(percentile(latencies, 50) * 1000, 1),
+			'p95': round(percentile(latencies, 95) * 1000, 1),
+			'p99': round(percentile(latencies, 99) * 1000, 1),
+			'max': round(max(latencies, default=0.0) * 1000, 1),
+		},
+		'gpt_cache_hit_rate': round(metrics.ratio('gpt.cache.hit', 'gpt.cache.requests'), 3),
+		'gpt_coalesced': metrics.get('gpt.coalesced'),
+		'quiz_bank_hit_rate': round(metrics.ratio('quiz.bank.hit', 'quiz.bank.requests'), 3),
+		'file_id_hit_rate': round(metrics.ratio('assets.file_id.hit', 'assets.file_id.requests'), 3),
+		'images_preuploaded': metrics.get('assets.preuploaded'),
+		'duplicates_dropped': metrics.get('updates.duplicate'),
+		'logs_sampled_out': metrics.get('logging.sampled_out'),
+		'loop_lag_ms': {
+			name: round(metrics.get(f'loop.lag.{name}') * 1000, 1) for name in ('p50', 'p99', 'max')
+		},
+		'slow_callbacks': metrics.get('loop.slow_callbacks'),
+		'throttled': {
+			name: metrics.get(f'throttle.dropped.{name}') for name in ('default', 'gpt')
+		},
+		'active_sessions': count_sessions(dp),
+		'session_bytes': getattr(dp.storage, 'mode_bytes', None),
+		'memory_per_1k_sessions_bytes': round(memory_per_1k) if memory_per_1k is not None else None,
+		'openai': {
+			'requests': openai_server.stats.requests,
+			'errors_429': openai_server.stats.errors_429,
+			'errors_5xx': openai_server.stats.errors_5xx,
+			'models': openai_server.stats.models,
+		},
+		'telegram': {
+			'calls': dict(telegram_server.stats.calls),
+			'bad_requests': telegram_server.stats.bad_requests,
+			'rate_limited': telegram_server.stats.rate_limited,
+			'uploaded_bytes': telegram_server.stats.uploaded_bytes,
+		},
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='End-to-end load test against local OpenAI and Telegram stand-ins')
+	parser.add_argument('--users', type=int, default=100, help='Количество синтетических пользователей')
+	parser.add_argument('--turns', type=int, default=3, help='Реплик на пользователя в диалоговых режимах')
+	parser.add_argument('--concurrency', type=int, default=100, help='Одновременно активных пользователей')
+	parser.add_argument('--modes', nargs='*', choices=SCENARIOS, help='Режимы для сценариев (по умолчанию все)')
+	parser.add_argument('--gpt-latency', default='const:0.5', help="const:S | uniform:MIN:MAX | lognormal:MEDIAN:SIGMA")
+	parser.add_argument('--tg-latency', type=float, default=0.0, help='Задержка заглушки Bot API в секундах')
+	parser.add_argument('--tg-global-rate', type=int, help='Лимит отправок в секунду заглушки Bot API на весь бот')
+	parser.add_argument('--tg-chat-rate', type=int, help='Лимит отправок в секунду заглушки Bot API на один чат')
+	parser.add_argument('--error-429', type=float, default=0.0, help='Доля ответов 429 от OpenAI')
+	parser.add_argument('--error-5xx', type=float, default=0.0, help='Доля ответов 5xx от OpenAI')
+	parser.add_argument('--redeliver', type=float, default=0.0, help='Доля обновлений, доставляемых повторно')
+	parser.add_argument('--preupload', action='store_true', help='Предзагрузить изображения в служебный чат при старте')
+	parser.add_argument('--reply-length', type=int, default=300, help='Длина ответа GPT в символах')
+	parser.add_argument('--memory-users', type=int, default=200, help='Пользователей для замера памяти (0 - не замерять)')
+	parser.add_argument('--seed', type=int, default=42)
+	parser.add_argument('--json', dest='json_path', help='Сохранить отчет в JSON-файл')
+	args = parser.parse_args()
+
+	report = asyncio.run(run_load_test(args))
+	print(json.dumps(report, ensure_ascii=False, indent=2))
+	if args.json_path:
+		with open(args.json_path, 'w', encoding='UTF-8') as file:
+			json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+	main()
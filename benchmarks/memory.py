@@ -0,0 +1,109 @@
+"""
+Бенчмарк памяти, занимаемой историей диалогов.
+
+Сравнивает прежнее представление истории (список словарей
+{'role': ..., 'content': ...} с собственной копией системного промпта
+в каждой сессии) с компактным GPTMessage на заданном числе сессий.
+
+Объем измеряется через tracemalloc: учитывается все, что выделено
+при построении сессий, включая тексты сообщений. Тексты одинаковы
+для обоих представлений, поэтому разница - это накладные расходы.
+
+Пример использования:
+	python -m benchmarks.memory                          # 10000 сессий x 50 реплик
+	python -m benchmarks.memory --sessions 1000 --turns 20
+
+Запускается из корня репозитория.
+"""
+
+import argparse
+import gc
+import os
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+
+def _content(session: int, turn: int, length: int) -> str:
+	"""Создает уникальный текст сообщения заданной длины."""
+	head = f'Сообщение {turn} в сессии {session}. '
+	return (head * (length // len(head) + 1))[:length]
+
+
+def build_legacy(sessions: int, turns: int, length: int, prompt_path: str) -> List[List[Dict[str, str]]]:
+	"""Строит сессии в прежнем представлении: список словарей на сессию."""
+	result = []
+	for session in range(sessions):
+		with open(prompt_path, 'r', encoding='UTF-8') as file:
+			messages = [{'role': 'system', 'content': file.read()}]
+		for turn in range(turns):
+			role = 'user' if turn % 2 == 0 else 'assistant'
+			messages.append({'role': role, 'content': _content(session, turn, length)})
+		result.append(messages)
+	return result
+
+
+def build_compact(sessions: int, turns: int, length: int, prompt_path: str) -> List[Any]:
+	"""Строит сессии в виде компактных GPTMessage."""
+	from common import GPTRole
+	from models import GPTMessage
+
+	prompt = os.path.splitext(os.path.basename(prompt_path))[0]
+	result = []
+	for session in range(sessions):
+		message = GPTMessage(prompt)
+		for turn in range(turns):
+			role = GPTRole.USER if turn % 2 == 0 else GPTRole.ASSISTANT
+			message.update(role, _content(session, turn, length))
+		result.append(message)
+	return result
+
+
+def measure(build: Callable[[], Any]) -> int:
+	"""
+	Измеряет объем памяти, удерживаемой результатом build.
+
+	Args:
+		build (Callable[[], Any]): Функция построения сессий
+
+	Returns:
+		int: Объем удерживаемой памяти в байтах
+	"""
+	gc.collect()
+	tracemalloc.start()
+	baseline = tracemalloc.get_traced_memory()[0]
+	sessions = build()
+	gc.collect()
+	retained = tracemalloc.get_traced_memory()[0] - baseline
+	tracemalloc.stop()
+	del sessions
+	gc.collect()
+	return retained
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Memory benchmark for conversation history')
+	parser.add_argument('--sessions', type=int, default=10000, help='Количество сессий')
+	parser.add_argument('--turns', type=int, default=50, help='Реплик в каждой сессии')
+	parser.add_argument('--length', type=int, default=120, help='Длина текста одной реплики')
+	parser.add_argument('--prompt', default='gpt', help='Имя системного промпта')
+	args = parser.parse_args()
+
+	os.environ.setdefault('GPT_TOKEN', 'fake-token')
+	from common import ResourcePath
+
+	prompt_path = os.path.join(ResourcePath.PROMPTS.value, args.prompt + '.txt')
+	# Прогреваем кэш промпта, чтобы он не попал в замер
+	build_compact(1, 0, args.length, prompt_path)
+
+	legacy = measure(lambda: build_legacy(args.sessions, args.turns, args.length, prompt_path))
+	compact = measure(lambda: build_compact(args.sessions, args.turns, args.length, prompt_path))
+	saving = 1 - compact / legacy if legacy else 0.0
+
+	print(f'{args.sessions} сессий x {args.turns} реплик по {args.length} символов')
+	print(f'{"список словарей":20s} {legacy / 2 ** 20:10.1f} MiB  {legacy / args.sessions:10.0f} B/сессия')
+	print(f'{"GPTMessage":20s} {compact / 2 ** 20:10.1f} MiB  {compact / args.sessions:10.0f} B/сессия')
+	print(f'Экономия: {saving:.1%} ({(legacy - compact) / (args.sessions * max(1, args.turns)):.0f} B на реплику)')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,222 @@
+"""
+Микробенчмарки горячих локальных участков кода.
+
+Измеряет CPU-работу, выполняемую ботом на каждое обновление:
+построение и обновление GPTMessage, разбор ответов, сборку клавиатур,
+упаковку callback-данных, доступ к ресурсам и разбор имен знаменитостей.
+
+Результаты сравниваются с сохраненной базовой линией (benchmarks/baseline.json).
+Если какой-либо бенчмарк медленнее базовой линии больше чем на порог,
+скрипт завершается с кодом 1.
+
+Пример использования:
+	python -m benchmarks.micro --save          # записать базовую линию
+	python -m benchmarks.micro                 # сравнить с базовой линией
+	python -m benchmarks.micro -k keyboard     # только бенчмарки с 'keyboard' в имени
+
+Базовая линия зависит от машины: сохраняйте ее на том же окружении,
+на котором выполняется проверка. Запускается из корня репозитория.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+
+Benchmark = Tuple[str, Callable[[], Callable[[], object]]]
+
+
+def collect_benchmarks() -> List[Benchmark]:
+	"""
+	Собирает список бенчмарков.
+
+	Каждый бенчмарк - пара из имени и фабрики, которая выполняет подготовку
+	и возвращает измеряемую функцию без аргументов.
+
+	Returns:
+		List[Benchmark]: Список бенчмарков
+	"""
+	os.environ.setdefault('GPT_TOKEN', 'fake-token')
+
+	from common import GPTRole, Resource
+	from models import GPTMessage, Button, QuizData, MediaData, parse_media_response
+	from keyboards import (
+		kb_replay, kb_end_talk, kb_end_gpt,
+		ikb_celebrity, ikb_quiz_select_topic, ikb_quiz_next, ikb_translator,
+		ikb_media_categories, ikb_media_genres, ikb_media_actions,
+	)
+
+	def long_history(turns: int) -> GPTMessage:
+		message = GPTMessage('gpt')
+		for i in range(turns):
+			message.update(GPTRole.USER, f'Вопрос пользователя номер {i} о чем-нибудь интересном')
+			message.update(GPTRole.ASSISTANT, f'Развернутый ответ ассистента номер {i}. ' * 5)
+		return message
+
+	def gpt_message_update() -> Callable[[], object]:
+		message = long_history(500)
+		return lambda: message.update(GPTRole.USER, 'Еще один вопрос')
+
+	def gpt_message_list() -> Callable[[], object]:
+		message = long_history(50)
+		return lambda: message.message_list
+
+	media_reply = '{"title": "Бегущий по лезвию", "desc": "Культовый фантастический фильм о репликантах."}'
+	media_reply_fenced = f'Вот рекомендация:\n```json\n{media_reply}\n```'
+	media_reply_legacy = 'Название: Бегущий по лезвию\nОписание: Культовый фантастический фильм о репликантах.'
+	quiz_topic = QuizData(button='select_topic', topic='quiz_prog', topic_name='Язык Python')
+	quiz_packed = quiz_topic.pack()
+	media_data = MediaData(button='select_genre', category='movies', genre='sci-fi')
+	media_packed = media_data.pack()
+	celebrity_line = 'Ты - Курт Кобейн, легендарный фронтмен группы Nirvana. Общайся в его манере:'
+
+	return [
+		('gpt_message.init', lambda: lambda: GPTMessage('gpt')),
+		('gpt_message.update_long_history', gpt_message_update),
+		('gpt_message.message_list_50_turns', gpt_message_list),
+		('parse_media_response.json', lambda: lambda: parse_media_response(media_reply)),
+		('parse_media_response.fenced', lambda: lambda: parse_media_response(media_reply_fenced)),
+		('parse_media_response.legacy', lambda: lambda: parse_media_response(media_reply_legacy)),
+		('keyboard.kb_replay', lambda: lambda: kb_replay(['/random', '/gpt', '/talk', '/quiz', '/translator', '/media'])),
+		('keyboard.kb_end_talk', lambda: kb_end_talk),
+		('keyboard.kb_end_gpt', lambda: kb_end_gpt),
+		('keyboard.ikb_celebrity', lambda: ikb_celebrity),
+		('keyboard.ikb_quiz_select_topic', lambda: ikb_quiz_select_topic),
+		('keyboard.ikb_quiz_next', lambda: lambda: ikb_quiz_next(quiz_topic)),
+		('keyboard.ikb_translator', lambda: ikb_translator),
+		('keyboard.ikb_media_categories', lambda: ikb_media_categories),
+		('keyboard.ikb_media_genres', lambda: lambda: ikb_media_genres('movies')),
+		('keyboard.ikb_media_actions', lambda: lambda: ikb_media_actions('movies', 'sci-fi')),
+		('callback_data.quiz_pack', lambda: quiz_topic.pack),
+		('callback_data.quiz_unpack', lambda: lambda: QuizData.unpack(quiz_packed)),
+		('callback_data.media_pack', lambda: media_data.pack),
+		('callback_data.media_unpack', lambda: lambda: MediaData.unpack(media_packed)),
+		('resource.photo', lambda: lambda: Resource('gpt').photo),
+		('resource.text', lambda: lambda: Resource('gpt').text),
+		('button.extract_celebrity_name', lambda: lambda: Button._extract_celebrity_name(celebrity_line)),
+	]
+
+
+def measure(func: Callable[[], object], repeat: int = 7) -> float:
+	"""
+	Измеряет время одного вызова функции.
+
+	Args:
+		func (Callable[[], object]): Измеряемая функция
+		repeat (int): Количество повторов серии
+
+	Returns:
+		float: Минимальное время одного вызова в микросекундах
+	"""
+	timer = timeit.Timer(func)
+	number, _ = timer.autorange()
+	best = min(timer.repeat(repeat=repeat, number=number))
+	return best / number * 1e6
+
+
+def run(pattern: str = '', names: Optional[List[str]] = None) -> Dict[str, float]:
+	"""
+	Запускает бенчмарки, имя которых содержит pattern.
+
+	Args:
+		pattern (str): Подстрока для фильтрации по имени
+		names (Optional[List[str]]): Точный список имен (если задан)
+
+	Returns:
+		Dict[str, float]: Время одного вызова в микросекундах по имени бенчмарка
+	"""
+	results: Dict[str, float] = {}
+	for name, factory in collect_benchmarks():
+		if pattern and pattern not in name:
+			continue
+		if names is not None and name not in names:
+			continue
+		results[name] = measure(factory())
+	return results
+
+
+def find_regressions(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+	"""Возвращает имена бенчмарков, замедлившихся больше чем на threshold."""
+	return [
+		name for name, value in results.items()
+		if name in baseline and baseline[name] and value / baseline[name] > 1 + threshold
+	]
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+	"""
+	Сравнивает результаты с базовой линией и печатает таблицу.
+
+	Args:
+		results (Dict[str, float]): Текущие результаты
+		baseline (Dict[str, float]): Базовая линия
+		threshold (float): Допустимое относительное замедление
+
+	Returns:
+		List[str]: Имена бенчмарков с регрессией
+	"""
+	regressions = find_regressions(results, baseline, threshold)
+	for name, value in results.items():
+		base = baseline.get(name)
+		if base is None:
+			print(f'{name:45s} {value:12.2f} us   (нет базовой линии)')
+			continue
+		ratio = value / base if base else 1.0
+		mark = '  REGRESSION' if name in regressions else ''
+		print(f'{name:45s} {value:12.2f} us   x{ratio:5.2f} от {base:.2f} us{mark}')
+	return regressions
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Micro-benchmarks for per-update CPU work')
+	parser.add_argument('-k', dest='pattern', default='', help='Запускать только бенчмарки с подстрокой в имени')
+	parser.add_argument('--save', action='store_true', help='Сохранить результаты как базовую линию')
+	parser.add_argument('--baseline', default=BASELINE_PATH, help='Путь к файлу базовой линии')
+	parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Допустимое замедление (0.25 = 25%%)')
+	parser.add_argument('--retries', type=int, default=2, help='Повторных замеров для подтверждения регрессии')
+	args = parser.parse_args()
+
+	results = run(args.pattern)
+	if args.save:
+		payload = {
+			'python': platform.python_version(),
+			'machine': platform.machine(),
+			'results_us': {name: round(value, 3) for name, value in results.items()},
+		}
+		with open(args.baseline, 'w', encoding='UTF-8') as file:
+			json.dump(payload, file, ensure_ascii=False, indent=2)
+		for name, value in results.items():
+			print(f'{name:45s} {value:12.2f} us')
+		print(f'Базовая линия сохранена в {args.baseline}')
+		return
+
+	if not os.path.exists(args.baseline):
+		print(f'Файл базовой линии {args.baseline} не найден, запустите с --save')
+		sys.exit(2)
+	with open(args.baseline, 'r', encoding='UTF-8') as file:
+		saved = json.load(file)
+	baseline = saved['results_us']
+	if saved.get('python') != platform.python_version():
+		print(f"Внимание: базовая линия снята на Python {saved.get('python')}, текущий {platform.python_version()}")
+
+	# Повторно замеряем подозрительные бенчмарки, чтобы отсечь шум планировщика
+	for _ in range(args.retries):
+		suspects = find_regressions(results, baseline, args.threshold)
+		if not suspects:
+			break
+		for name, value in run(names=suspects).items():
+			results[name] = min(results[name], value)
+	regressions = compare(results, baseline, args.threshold)
+	if regressions:
+		print(f'Регрессии производительности (> {args.threshold:.0%}): {", ".join(regressions)}')
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,118 @@
+"""
+Бенчмарк холодного старта бота.
+
+Запускает отдельный интерпретатор с -X importtime, импортирует main
+и создает бота и диспетчер (без сетевых запросов). Измеряет:
+- время импорта main и полное время до готовых бота и диспетчера
+  (медиана нескольких запусков);
+- самые тяжелые модули по собственному времени импорта (по -X importtime).
+
+Также проверяет, что тяжелые модули, которые должны загружаться
+лениво (openai, httpx), не импортируются при старте.
+
+Скрипт завершается с кодом 1, если медиана превышает цель или
+ленивые модули загружены при импорте.
+
+Пример использования:
+	python -m benchmarks.startup
+	python -m benchmarks.startup --runs 10 --target-ms 2500 --top 20
+
+Запускается из корня репозитория.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_TARGET_MS = 2500.0
+LAZY_MODULES = ('openai', 'httpx')
+
+_PROBE = '''
+import sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.create_dispatcher()
+main.create_bot(main.get_bot_token())
+ready = time.perf_counter()
+print('RESULT', (imported - started) * 1000, (ready - started) * 1000,
+	','.join(name for name in {lazy} if name in sys.modules))
+'''.format(lazy=LAZY_MODULES)
+
+
+def run_once() -> Tuple[Dict[str, Tuple[int, int]], float, float, List[str]]:
+	"""
+	Выполняет один холодный старт в отдельном процессе.
+
+	Returns:
+		Tuple: Время импорта модулей (собственное и накопленное, мкс),
+			время импорта main и время до готового диспетчера (мс),
+			список загруженных ленивых модулей
+	"""
+	env = dict(os.environ)
+	env.setdefault('GPT_TOKEN', 'fake-token')
+	env.setdefault('BOT_TOKEN', '123456:fake-token')
+	completed = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', _PROBE],
+		capture_output=True, text=True, env=env, check=True,
+	)
+	modules: Dict[str, Tuple[int, int]] = {}
+	for line in completed.stderr.splitlines():
+		if not line.startswith('import time:') or 'self [us]' in line:
+			continue
+		self_us, cumulative_us, name = line[len('import time:'):].split('|')
+		modules[name.strip()] = (int(self_us), int(cumulative_us))
+	result = next(line for line in completed.stdout.splitlines() if line.startswith('RESULT'))
+	parts = result.split(' ')
+	eager = [name for name in parts[3].split(',') if name] if len(parts) > 3 else []
+	return modules, float(parts[1]), float(parts[2]), eager
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Cold start benchmark based on -X importtime')
+	parser.add_argument('--runs', type=int, default=5, help='Количество запусков')
+	parser.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS, help='Цель для медианы готовности, мс')
+	parser.add_argument('--top', type=int, default=15, help='Сколько самых тяжелых модулей показать')
+	args = parser.parse_args()
+
+	import_times: List[float] = []
+	ready_times: List[float] = []
+	self_times: Dict[str, List[int]] = {}
+	eager: List[str] = []
+	for _ in range(args.runs):
+		modules, imported_ms, ready_ms, loaded = run_once()
+		import_times.append(imported_ms)
+		ready_times.append(ready_ms)
+		eager = loaded
+		for name, (self_us, _) in modules.items():
+			self_times.setdefault(name, []).append(self_us)
+
+	heaviest = sorted(
+		((statistics.median(values), name) for name, values in self_times.items()),
+		reverse=True,
+	)[:args.top]
+	print(f'{"модуль":50s} {"собственное, мс":>16s}')
+	for value, name in heaviest:
+		print(f'{name:50s} {value / 1000:16.1f}')
+
+	median_import = statistics.median(import_times)
+	median_ready = statistics.median(ready_times)
+	print(f'\nИмпорт main:          {median_import:8.1f} мс (медиана {args.runs} запусков)')
+	print(f'Готовность диспетчера: {median_ready:8.1f} мс, цель {args.target_ms:.0f} мс')
+
+	failed = False
+	if eager:
+		print(f'Ошибка: при старте импортированы ленивые модули: {", ".join(eager)}')
+		failed = True
+	if median_ready > args.target_ms:
+		print('Ошибка: время старта превышает цель')
+		failed = True
+	if failed:
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -27,17 +27,19 @@
 - handlers: Обработчики состояний
 - keyboards: Клавиатуры и кнопки
 - utils: Вспомогательные функции
+- storage: Показанные пользователю факты
 """
 
-from aiogram import Router, F
+from aiogram import Router, F, flags
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from models import gpt_client, GPTMessage
+from storage import preferences, FACT
 from common import Resource
 from handlers.state_handlers import ChatGPTRequests, Quiz, Translator, MediaRecommendation
-from utils import bot_thinking
+from utils import bot_thinking, send_answer
 
 from keyboards import kb_replay, ikb_celebrity, ikb_quiz_select_topic, ikb_translator, ikb_media_categories
 
@@ -74,12 +76,14 @@ async def cmd_start(message: Message):
 
 @commands_router.message(F.text == 'Хочу ещё факт')
 @commands_router.message(Command('random'))
+@flags.throttling('gpt')
 async def cmd_random(message: Message):
 	"""
 	Обрабатывает команду для получения случайного факта.
 	
 	Отправляет пользователю случайный интересный факт,
 	полученный от ChatGPT, с возможностью запросить ещё.
+	Факты, которые пользователь уже видел, запрашиваются заново в обход кэша.
 	
 	Args:
 		message (Message): Сообщение с командой /random или кнопкой "Хочу ещё факт"
@@ -91,12 +95,19 @@ async def cmd_random(message: Message):
 		'Хочу ещё факт',
 		'Закончить',
 	]
-	msg_text = await gpt_client.request(gpt_message)
-	await message.answer_photo(
+	msg_text = await preferences.first_unseen(
+		message.chat.id,
+		FACT,
+		lambda attempt: gpt_client.request(gpt_message, use_cache=not attempt),
+	)
+	await send_answer(
+		message.bot,
+		message.chat.id,
+		msg_text,
 		photo=resource.photo,
-		caption=msg_text,
 		reply_markup=kb_replay(buttons),
 	)
+	await preferences.add(message.chat.id, FACT, msg_text)
 
 
 @commands_router.message(Command('gpt'))
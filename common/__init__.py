@@ -12,6 +12,8 @@
 - ResourcePath, GPTRole, Extensions, MediaCategory, MediaGenre, TranslationDirection: Перечисления
 - MEDIA_CATEGORY_NAMES, MEDIA_GENRE_NAMES, MEDIA_GENRES_BY_CATEGORY, TRANSLATION_DIRECTION_TEXTS: Словари данных
 - Resource: Класс для работы с ресурсами
+- metrics: Реестр внутренних метрик
+- setup_logging, log_context: Асинхронное структурированное логирование и его контекст
 
 Пример использования:
     from common import Resource, MediaCategory, MESSAGES
@@ -24,6 +26,8 @@ from .enums import (
     MEDIA_CATEGORY_NAMES, MEDIA_GENRE_NAMES, MEDIA_GENRES_BY_CATEGORY, TRANSLATION_DIRECTION_TEXTS
 )
 from .assets import Resource
+from .metrics import metrics
+from .logs import setup_logging, log_context
 
 # Экспорт основных компонентов
 __all__ = [
@@ -38,4 +42,10 @@ __all__ = [
     
     # Классы
     'Resource',
+    
+    # Метрики
+    'metrics',
+    
+    # Логирование
+    'setup_logging', 'log_context',
 ] 
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""
+Модуль сборки изображений для отправки в Telegram.
+
+Содержит:
+- build: Готовит сжатые варианты изображений и манифест
+- check: Проверяет актуальность манифеста
+- format_report: Отчет об экономии байт по изображениям
+
+Сборка читает resources/images/*.jpg и делает следующее:
+- одинаковые по содержимому файлы (SHA-256) собираются один раз
+  и указывают на один вариант (main и avatar_main);
+- изображение уменьшается до размера, в котором Telegram его показывает
+  (Config.ASSET_MAX_SIDE по длинной стороне), и перекодируется в
+  прогрессивный JPEG с качеством Config.ASSET_JPEG_QUALITY и без метаданных;
+- если перекодированный файл не меньше исходного, сохраняется исходный.
+
+Варианты записываются в resources/images/build под именем по хешу
+содержимого, соответствие имен и вариантов - в resources/images/manifest.json,
+который читает Resource. Неизменившиеся изображения не перекодируются.
+
+Пример использования:
+	python -m common.asset_pipeline            # собрать и показать отчет
+	python -m common.asset_pipeline --check    # проверить манифест (код 1, если устарел)
+
+Зависимости:
+- Pillow: Перекодирование (необязательно, pip install Pillow; без него
+  выполняется только устранение дубликатов)
+- config: Размер и качество вариантов
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+
+from .assets import MANIFEST_PATH
+from .enums import Extensions, ResourcePath
+
+try:
+	from PIL import Image, ImageOps
+except ImportError:
+	Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+BUILD_DIR = os.path.join(ResourcePath.IMAGES.value, 'build')
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class BuiltImage:
+	"""
+	Запись манифеста об одном изображении.
+
+	Attributes:
+		file (str): Путь варианта относительно resources/images
+		sha256 (str): Хеш содержимого варианта
+		source_sha256 (str): Хеш содержимого исходного файла
+		source_bytes (int): Размер исходного файла
+		bytes (int): Размер варианта
+		width (Optional[int]): Ширина варианта (None без Pillow)
+		height (Optional[int]): Высота варианта (None без Pillow)
+		duplicate_of (Optional[str]): Имя изображения с тем же содержимым
+	"""
+
+	file: str
+	sha256: str
+	source_sha256: str
+	source_bytes: int
+	bytes: int
+	width: Optional[int] = None
+	height: Optional[int] = None
+	duplicate_of: Optional[str] = None
+
+	@property
+	def saved(self) -> int:
+		"""Сэкономлено байт при загрузке (дубликат не загружается повторно)."""
+		return self.source_bytes if self.duplicate_of else self.source_bytes - self.bytes
+
+
+def encoder_settings(max_side: int, quality: int) -> Dict[str, object]:
+	"""
+	Возвращает параметры сборки, при изменении которых варианты пересобираются.
+
+	Args:
+		max_side (int): Максимальная длинная сторона
+		quality (int): Качество JPEG
+
+	Returns:
+		Dict[str, object]: Параметры для заголовка манифеста
+	"""
+	if Image is None:
+		return {'encoder': 'copy'}
+	return {'encoder': 'pillow', 'max_side': max_side, 'quality': quality}
+
+
+def source_images() -> Dict[str, str]:
+	"""
+	Возвращает исходные изображения.
+
+	Returns:
+		Dict[str, str]: Пути к файлам по имени без расширения
+	"""
+	images = {}
+	for file_name in sorted(os.listdir(ResourcePath.IMAGES.value)):
+		name, extension = os.path.splitext(file_name)
+		if extension == Extensions.JPG.value:
+			images[name] = os.path.join(ResourcePath.IMAGES.value, file_name)
+	return images
+
+
+def encode(data: bytes, max_side: int, quality: int) -> Tuple[bytes, Optional[Tuple[int, int]]]:
+	"""
+	Уменьшает и перекодирует изображение.
+
+	Args:
+		data (bytes): Исходный JPEG
+		max_side (int): Максимальная длинная сторона
+		quality (int): Качество JPEG
+
+	Returns:
+		Tuple[bytes, Optional[Tuple[int, int]]]: Вариант и его размеры (без Pillow - исходный файл и None)
+	"""
+	if Image is None:
+		return data, None
+	with Image.open(io.BytesIO(data)) as source:
+		image = ImageOps.exif_transpose(source)
+		resized = max(image.size) > max_side
+		if resized:
+			image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+		if image.mode not in ('RGB', 'L'):
+			image = image.convert('RGB')
+		buffer = io.BytesIO()
+		image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+		size = image.size
+	encoded = buffer.getvalue()
+	if not resized and len(encoded) >= len(data):
+		with Image.open(io.BytesIO(data)) as source:
+			return data, source.size
+	return encoded, size
+
+
+def read_manifest() -> Optional[dict]:
+	"""
+	Читает манифест с диска.
+
+	Returns:
+		Optional[dict]: Содержимое манифеста или None, если его нет или он поврежден
+	"""
+	if not os.path.exists(MANIFEST_PATH):
+		return None
+	try:
+		with open(MANIFEST_PATH, 'r', encoding='UTF-8') as file:
+			manifest = json.load(file)
+	except (OSError, ValueError) as e:
+		logger.warning("Image manifest %s is unreadable: %s", MANIFEST_PATH, e)
+		return None
+	if manifest.get('version') != MANIFEST_VERSION:
+		return None
+	return manifest
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+	"""Записывает файл через временный, чтобы не оставить его недописанным."""
+	tmp_path = path + '.tmp'
+	with open(tmp_path, 'wb') as file:
+		file.write(data)
+	os.replace(tmp_path, path)
+
+
+def build(max_side: Optional[int] = None, quality: Optional[int] = None) -> Dict[str, BuiltImage]:
+	"""
+	Собирает варианты изображений и записывает манифест.
+
+	Варианты из предыдущей сборки переиспользуются, если исходный файл
+	и параметры не изменились; варианты, на которые больше нет ссылок,
+	удаляются.
+
+	Args:
+		max_side (Optional[int]): Максимальная длинная сторона (по умолчанию из Config)
+		quality (Optional[int]): Качество JPEG (по умолчанию из Config)
+
+	Returns:
+		Dict[str, BuiltImage]: Записи манифеста по имени изображения
+	"""
+	max_side = max_side or Config.ASSET_MAX_SIDE
+	quality = quality or Config.ASSET_JPEG_QUALITY
+	settings = encoder_settings(max_side, quality)
+	if Image is None:
+		logger.warning("Pillow is not installed, images are deduplicated but not re-encoded")
+
+	previous = read_manifest() or {}
+	reusable: Dict[str, BuiltImage] = {}
+	if all(previous.get(key) == value for key, value in settings.items()):
+		for entry in previous.get('images', {}).values():
+			image = BuiltImage(**{**entry, 'duplicate_of': None})
+			if os.path.exists(os.path.join(ResourcePath.IMAGES.value, image.file)):
+				reusable[image.source_sha256] = image
+
+	os.makedirs(BUILD_DIR, exist_ok=True)
+	images: Dict[str, BuiltImage] = {}
+	# Первое имя для каждого содержимого: остальные помечаются дубликатами
+	by_source: Dict[str, str] = {}
+	for name, path in source_images().items():
+		with open(path, 'rb') as file:
+			data = file.read()
+		source_sha256 = hashlib.sha256(data).hexdigest()
+		if source_sha256 in by_source:
+			images[name] = BuiltImage(**{**asdict(images[by_source[source_sha256]]), 'duplicate_of': by_source[source_sha256]})
+			continue
+		by_source[source_sha256] = name
+
+		image = reusable.get(source_sha256)
+		if image is None:
+			encoded, size = encode(data, max_side, quality)
+			sha256 = hashlib.sha256(encoded).hexdigest()
+			file_name = sha256[:16] + Extensions.JPG.value
+			_write_atomic(os.path.join(BUILD_DIR, file_name), encoded)
+			image = BuiltImage(
+				file=os.path.relpath(os.path.join(BUILD_DIR, file_name), ResourcePath.IMAGES.value),
+				sha256=sha256,
+				source_sha256=source_sha256,
+				source_bytes=len(data),
+				bytes=len(encoded),
+				width=size[0] if size else None,
+				height=size[1] if size else None,
+			)
+		images[name] = image
+
+	referenced = {os.path.basename(image.file) for image in images.values()}
+	for file_name in os.listdir(BUILD_DIR):
+		if file_name not in referenced:
+			os.remove(os.path.join(BUILD_DIR, file_name))
+
+	manifest = {'version': MANIFEST_VERSION, **settings, 'images': {name: asdict(image) for name, image in images.items()}}
+	_write_atomic(MANIFEST_PATH, json.dumps(manifest, ensure_ascii=False, indent=2).encode('UTF-8'))
+	return images
+
+
+def check(max_side: Optional[int] = None, quality: Optional[int] = None) -> Tuple[Dict[str, BuiltImage], List[str]]:
+	"""
+	Проверяет, что манифест соответствует исходным изображениям и параметрам.
+
+	Args:
+		max_side (Optional[int]): Максимальная длинная сторона (по умолчанию из Config)
+		quality (Optional[int]): Качество JPEG (по умолчанию из Config)
+
+	Returns:
+		Tuple[Dict[str, BuiltImage], List[str]]: Записи манифеста и описания расхождений
+	"""
+	settings = encoder_settings(max_side or Config.ASSET_MAX_SIDE, quality or Config.ASSET_JPEG_QUALITY)
+	manifest = read_manifest()
+	if manifest is None:
+		return {}, [f'{MANIFEST_PATH} не найден']
+
+	problems = []
+	for key, value in settings.items():
+		if manifest.get(key) != value:
+			problems.append(f'параметр {key}: в манифесте {manifest.get(key)}, нужен {value}')
+	images = {name: BuiltImage(**entry) for name, entry in manifest.get('images', {}).items()}
+	sources = source_images()
+	for name in sorted(images.keys() - sources.keys()):
+		problems.append(f'{name}: исходного файла больше нет')
+	for name, path in sources.items():
+		image = images.get(name)
+		if image is None:
+			problems.append(f'{name}: нет в манифесте')
+			continue
+		with open(path, 'rb') as file:
+			if hashlib.sha256(file.read()).hexdigest() != image.source_sha256:
+				problems.append(f'{name}: исходный файл изменился')
+		if not os.path.exists(os.path.join(ResourcePath.IMAGES.value, image.file)):
+			problems.append(f'{name}: нет файла {image.file}')
+	return images, problems
+
+
+def format_report(images: Dict[str, BuiltImage]) -> str:
+	"""
+	Форматирует отчет об экономии байт по изображениям.
+
+	Args:
+		images (Dict[str, BuiltImage]): Записи манифеста
+
+	Returns:
+		str: Таблица с итоговой строкой
+	"""
+	lines = [f'{"изображение":20s} {"исходный":>10s} {"вариант":>10s} {"экономия":>10s} {"%":>6s}  размер']
+	for name, image in images.items():
+		percent = 100 * image.saved / image.source_bytes if image.source_bytes else 0.0
+		if image.duplicate_of:
+			details = f'дубликат {image.duplicate_of}'
+		elif image.width:
+			details = f'{image.width}x{image.height}'
+		else:
+			details = ''
+		built = 0 if image.duplicate_of else image.bytes
+		lines.append(f'{name:20s} {image.source_bytes:10d} {built:10d} {image.saved:10d} {percent:6.1f}  {details}')
+	source_total = sum(image.source_bytes for image in images.values())
+	saved_total = sum(image.saved for image in images.values())
+	percent = 100 * saved_total / source_total if source_total else 0.0
+	lines.append(f'{"итого":20s} {source_total:10d} {source_total - saved_total:10d} {saved_total:10d} {percent:6.1f}')
+	return '\n'.join(lines)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Build size-optimized image variants for Telegram')
+	parser.add_argument('--check', action='store_true', help='Только проверить манифест и показать экономию')
+	parser.add_argument('--max-side', type=int, default=None, help='Максимальная длинная сторона в пикселях')
+	parser.add_argument('--quality', type=int, default=None, help='Качество JPEG (1-95)')
+	args = parser.parse_args()
+
+	if args.check:
+		images, problems = check(args.max_side, args.quality)
+		if images:
+			print(format_report(images))
+		for problem in problems:
+			print(f'Манифест устарел: {problem}')
+		if problems:
+			print('Запустите python -m common.asset_pipeline')
+			sys.exit(1)
+		return
+
+	print(format_report(build(args.max_side, args.quality)))
+	print(f'Манифест записан в {MANIFEST_PATH}')
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+	main()
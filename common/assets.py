@@ -8,12 +8,86 @@
 - Загрузка изображений из папки resources/images
 - Загрузка текстовых файлов из папки resources/messages
 - Получение ресурсов по имени файла без расширения
+- Подмена изображений подготовленными вариантами из манифеста
+- Повторная отправка изображений по file_id
+
+Манифест (resources/images/manifest.json) создает сборка изображений
+(python -m common.asset_pipeline): для каждого имени он указывает
+сжатый вариант в resources/images/build. Если манифеста или варианта нет
+либо исходное изображение изменилось после сборки (хеш не совпадает
+с source_sha256 манифеста), отправляется исходное изображение.
+
+Изображение, уже загруженное в Telegram, отправляется по file_id:
+Resource.file_ids хранит их по хешу содержимого, поэтому одинаковые
+файлы (main и avatar_main) загружаются один раз, а измененный файл -
+заново.
 """
 
 from aiogram.types import FSInputFile
+from functools import lru_cache
+import hashlib
+import json
+import logging
 import os
 
 from .enums import ResourcePath, Extensions
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.path.join(ResourcePath.IMAGES.value, 'manifest.json')
+
+_manifest: dict[str, dict] | None = None
+# Имена изображений, об устаревших вариантах которых уже предупреждали
+_stale_warned: set[str] = set()
+
+
+def load_manifest(reload: bool = False) -> dict[str, dict]:
+	"""
+	Читает манифест подготовленных изображений.
+	
+	Манифест читается один раз за процесс; ошибка чтения не мешает
+	работе бота - используются исходные изображения.
+	
+	Args:
+		reload (bool): Перечитать файл (после пересборки)
+		
+	Returns:
+		dict[str, dict]: Записи манифеста по имени изображения без расширения
+	"""
+	global _manifest
+	if _manifest is None or reload:
+		_manifest = {}
+		if os.path.exists(MANIFEST_PATH):
+			try:
+				with open(MANIFEST_PATH, 'r', encoding='UTF-8') as file:
+					_manifest = json.load(file)['images']
+			except (OSError, ValueError, KeyError) as e:
+				logger.warning("Image manifest %s is unreadable, serving source images: %s", MANIFEST_PATH, e)
+	return _manifest
+
+
+def file_digest(path: str) -> str:
+	"""
+	Вычисляет SHA-256 содержимого файла.
+	
+	Результат кэшируется по пути, размеру и времени изменения файла.
+	
+	Args:
+		path (str): Путь к файлу
+		
+	Returns:
+		str: Хеш в шестнадцатеричном виде
+	"""
+	stat = os.stat(path)
+	return _file_digest(path, stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+	"""Читает файл и вычисляет хеш (ключ кэша включает размер и время изменения)."""
+	with open(path, 'rb') as file:
+		return hashlib.sha256(file.read()).hexdigest()
 
 
 class Resource:
@@ -25,8 +99,12 @@ class Resource:
 	
 	Attributes:
 		_file_name (str): Имя файла без расширения
+		file_ids (dict[str, str]): file_id загруженных в Telegram изображений
+			по хешу содержимого (общий для всех ресурсов, заполняет storage.FileIdStore)
 	"""
 	
+	file_ids: dict[str, str] = {}
+	
 	def __init__(self, file_name: str):
 		"""
 		Инициализирует объект Resource.
@@ -36,19 +114,89 @@ class Resource:
 		"""
 		self._file_name = file_name
 	
-	@property
-	def photo(self) -> FSInputFile | None:
+	@staticmethod
+	def images() -> list[str]:
 		"""
-		Получает объект изображения.
+		Возвращает имена всех изображений без расширения.
 		
 		Returns:
-			FSInputFile | None: Объект изображения или None, если файл не найден
+			list[str]: Имена изображений в алфавитном порядке
 		"""
+		return sorted(
+			os.path.splitext(file_name)[0]
+			for file_name in os.listdir(ResourcePath.IMAGES.value)
+			if file_name.endswith(Extensions.JPG.value)
+		)
+	
+	def _photo_file(self) -> tuple[str, str] | None:
+		"""Возвращает путь к отправляемому файлу изображения и хеш его содержимого."""
 		photo_path = os.path.join(ResourcePath.IMAGES.value, self._file_name + Extensions.JPG.value)
-		if os.path.exists(photo_path):
-			return FSInputFile(photo_path)
+		source_digest = file_digest(photo_path) if os.path.exists(photo_path) else None
+		entry = load_manifest().get(self._file_name)
+		if entry is not None:
+			built_path = os.path.join(ResourcePath.IMAGES.value, entry['file'])
+			if source_digest is not None and source_digest != entry.get('source_sha256'):
+				if self._file_name not in _stale_warned:
+					_stale_warned.add(self._file_name)
+					logger.warning(
+						"Image %s changed since the build, serving the source file; rerun common.asset_pipeline",
+						self._file_name,
+					)
+			elif os.path.exists(built_path):
+				return built_path, entry['sha256']
+		if source_digest is not None:
+			return photo_path, source_digest
 		return None
 	
+	@property
+	def digest(self) -> str | None:
+		"""
+		Получает хеш содержимого отправляемого изображения.
+		
+		Returns:
+			str | None: SHA-256 в шестнадцатеричном виде или None, если файл не найден
+		"""
+		found = self._photo_file()
+		return found[1] if found else None
+	
+	@property
+	def upload_file(self) -> FSInputFile | None:
+		"""
+		Получает файл изображения для загрузки, даже если известен его file_id.
+		
+		Если в манифесте есть подготовленный вариант, возвращается он
+		(с исходным именем файла), иначе - исходное изображение.
+		
+		Returns:
+			FSInputFile | None: Объект изображения или None, если файл не найден
+		"""
+		found = self._photo_file()
+		if found is None:
+			return None
+		return FSInputFile(found[0], filename=self._file_name + Extensions.JPG.value)
+	
+	@property
+	def photo(self) -> FSInputFile | str | None:
+		"""
+		Получает объект изображения.
+		
+		Если изображение с таким содержимым уже загружено в Telegram,
+		возвращается его file_id, иначе - файл для загрузки (см. upload_file).
+		
+		Returns:
+			FSInputFile | str | None: file_id, объект изображения или None, если файл не найден
+		"""
+		found = self._photo_file()
+		if found is None:
+			return None
+		metrics.inc('assets.file_id.requests')
+		file_id = Resource.file_ids.get(found[1])
+		if file_id is not None:
+			metrics.inc('assets.file_id.hit')
+			return file_id
+		metrics.inc('assets.file_id.miss')
+		return FSInputFile(found[0], filename=self._file_name + Extensions.JPG.value)
+	
 	@property
 	def text(self) -> str | None:
 		"""
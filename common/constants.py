@@ -29,6 +29,7 @@ MESSAGES = {
     'NEXT_QUESTION': 'Следующий вопрос',
     'DISLIKE': 'Не нравится',
     'FINISH_MEDIA': 'Завершить',
+    'THROTTLED': 'Слишком много запросов. Подождите {seconds} с и попробуйте снова.',
 }
 
 # Коды ошибок
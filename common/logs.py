@@ -0,0 +1,206 @@
+"""
+Модуль асинхронного структурированного логирования.
+
+Обработчики логирования пишут в поток вывода синхронно, и при всплеске
+ошибок (например, при сбое OpenAI) запись логов останавливает цикл
+событий. Здесь корневой логгер только кладет записи в очередь, а в поток
+вывода их пишет QueueListener в фоновом потоке. В цикле событий
+выполняется лишь подстановка аргументов в сообщение; трассировки
+исключений форматируются в фоновом потоке (linecache читает исходники
+с диска).
+
+Повторяющиеся предупреждения и ошибки прореживаются: за окно
+Config.LOG_SAMPLE_WINDOW секунд проходит не больше Config.LOG_SAMPLE_BURST
+записей с одинаковым источником, шаблоном и типом исключения; первая
+запись следующего окна сообщает, сколько похожих записей пропущено.
+
+Основные компоненты:
+- setup_logging: Настраивает корневой логгер, возвращает запущенный QueueListener
+- log_context: Поля контекста текущей задачи (обновление, чат, обработчик, режим)
+- JsonFormatter: Формат JSON, одна запись в строке
+- ErrorSampler: Фильтр, прореживающий повторяющиеся предупреждения и ошибки
+
+Пример использования:
+    listener = setup_logging()
+    try:
+        ...
+    finally:
+        listener.stop()
+
+Зависимости:
+- config: Уровень, формат и параметры прореживания
+"""
+
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+
+from .metrics import metrics
+
+CONTEXT_FIELDS = ('update_id', 'chat_id', 'user_id', 'handler', 'mode')
+
+# Значение не изменяется на месте: для новой задачи устанавливается новый словарь
+log_context: ContextVar[Dict[str, Any]] = ContextVar('log_context', default={})
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись как JSON-объект в одну строку.
+
+    Поля: time, level, logger, message, поля контекста (см. CONTEXT_FIELDS),
+    context (место ошибки из log_exception), suppressed (число пропущенных
+    похожих записей), exc_type и traceback для исключений.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in (*CONTEXT_FIELDS, 'context', 'suppressed'):
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload['exc_type'] = record.exc_info[0].__name__
+            payload['traceback'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            payload['stack'] = record.stack_info
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class ErrorSampler(logging.Filter):
+    """
+    Прореживает повторяющиеся записи уровня WARNING и выше.
+
+    Attributes:
+        window (float): Окно в секундах
+        burst (int): Максимум записей с одним ключом за окно
+        max_keys (int): Максимум отслеживаемых ключей
+    """
+
+    def __init__(self, window: Optional[float] = None, burst: Optional[int] = None, max_keys: int = 1000):
+        """
+        Инициализирует фильтр. Не заданные параметры берутся из Config.
+
+        Args:
+            window (Optional[float]): Окно в секундах
+            burst (Optional[int]): Максимум записей с одним ключом за окно
+            max_keys (int): Максимум отслеживаемых ключей
+        """
+        super().__init__()
+        self.window = Config.LOG_SAMPLE_WINDOW if window is None else window
+        self.burst = Config.LOG_SAMPLE_BURST if burst is None else burst
+        self.max_keys = max_keys
+        # Ключ -> [начало окна, прошло записей, отброшено записей]
+        self._windows: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> Tuple:
+        """Ключ похожих записей: источник, уровень, шаблон, место и тип исключения."""
+        exc_type = record.exc_info[0].__name__ if record.exc_info else None
+        return record.name, record.levelno, str(record.msg), getattr(record, 'context', None), exc_type
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or not self.window:
+            return True
+        key = self._key(record)
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = int(state[2])
+                if state is None and len(self._windows) >= self.max_keys:
+                    self._windows = {
+                        other: value for other, value in self._windows.items() if now - value[0] < self.window
+                    }
+                    if len(self._windows) >= self.max_keys:
+                        self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+        metrics.inc('logging.sampled_out')
+        return False
+
+
+class LoopSafeQueueHandler(QueueHandler):
+    """
+    Обработчик, передающий записи в очередь фонового потока.
+
+    Сообщение собирается сразу (аргументы могут измениться до записи),
+    поля log_context копируются в запись, а исключение передается
+    без форматирования. При переполнении очереди запись отбрасывается
+    и учитывается в показателе logging.dropped.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        for name, value in log_context.get().items():
+            if not hasattr(record, name):
+                setattr(record, name, value)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc('logging.dropped')
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    json_format: Optional[bool] = None,
+    queue_size: Optional[int] = None,
+) -> QueueListener:
+    """
+    Настраивает корневой логгер на запись через очередь и фоновый поток.
+
+    Не заданные параметры берутся из Config.get_logging_config().
+
+    Args:
+        level (Optional[str]): Уровень логирования
+        json_format (Optional[bool]): Писать записи в JSON (иначе Config.LOG_FORMAT)
+        queue_size (Optional[int]): Максимум записей в очереди
+
+    Returns:
+        QueueListener: Запущенный фоновый поток; остановите его при завершении (stop)
+    """
+    logging_config = Config.get_logging_config()
+    level = level or logging_config['level']
+    json_format = logging_config['json'] if json_format is None else json_format
+    queue_size = queue_size or logging_config['queue_size']
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if json_format else logging.Formatter(logging_config['format']))
+    records: 'queue.Queue[logging.LogRecord]' = queue.Queue(maxsize=queue_size)
+    handler = LoopSafeQueueHandler(records)
+    handler.addFilter(ErrorSampler())
+
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level))
+
+    listener = QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,101 @@
+"""
+Модуль внутренних метрик приложения.
+
+Содержит простой потокобезопасный реестр счетчиков, который используется
+для учета событий (запросы к API, повторные запросы, ошибки разбора)
+и текущих значений (объем состояния сессий) без внешних зависимостей.
+
+Основные компоненты:
+- MetricsRegistry: Реестр счетчиков
+- metrics: Глобальный экземпляр реестра
+
+Пример использования:
+    from common import metrics
+    metrics.inc('media.requests')
+    metrics.set('session.bytes.ChatGPTRequests', 1024)
+    rate = metrics.ratio('media.wasted', 'media.requests')
+"""
+
+import threading
+from typing import Dict
+
+
+class MetricsRegistry:
+    """
+    Реестр именованных счетчиков.
+
+    Attributes:
+        _counters (Dict[str, float]): Значения счетчиков по имени
+        _lock (threading.Lock): Блокировка для обновлений из разных потоков
+    """
+
+    def __init__(self):
+        """Инициализирует пустой реестр."""
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """
+        Увеличивает счетчик.
+
+        Args:
+            name (str): Имя счетчика
+            value (float): Величина приращения
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set(self, name: str, value: float) -> None:
+        """
+        Устанавливает текущее значение показателя.
+
+        Args:
+            name (str): Имя показателя
+            value (float): Новое значение
+        """
+        with self._lock:
+            self._counters[name] = value
+
+    def get(self, name: str) -> float:
+        """
+        Возвращает значение счетчика.
+
+        Args:
+            name (str): Имя счетчика
+
+        Returns:
+            float: Значение счетчика или 0, если он не создан
+        """
+        return self._counters.get(name, 0)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """
+        Возвращает отношение двух счетчиков.
+
+        Args:
+            numerator (str): Имя счетчика-числителя
+            denominator (str): Имя счетчика-знаменателя
+
+        Returns:
+            float: Отношение или 0.0, если знаменатель равен нулю
+        """
+        total = self.get(denominator)
+        return self.get(numerator) / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Возвращает копию всех счетчиков.
+
+        Returns:
+            Dict[str, float]: Значения счетчиков по имени
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        """Сбрасывает все счетчики."""
+        with self._lock:
+            self._counters.clear()
+
+
+metrics = MetricsRegistry()
@@ -9,7 +9,7 @@
 """
 
 import os
-from typing import Optional
+from typing import FrozenSet, Optional
 
 
 class Config:
@@ -26,15 +26,149 @@ class Config:
     # OpenAI
     GPT_TOKEN: str = os.getenv('GPT_TOKEN', '')
     GPT_MODEL: str = os.getenv('GPT_MODEL', 'gpt-3.5-turbo')
+    # Быстрая модель для простых режимов (перевод, викторина, факты, рекомендации)
+    GPT_FAST_MODEL: str = os.getenv('GPT_FAST_MODEL', 'gpt-4o-mini')
+    # Переопределения маршрутов по режимам в JSON (см. models/routing.py)
+    GPT_ROUTES: str = os.getenv('GPT_ROUTES', '')
+    # Резервная модель и endpoint при сбоях основного (пусто - без резерва)
+    GPT_FALLBACK_MODEL: Optional[str] = os.getenv('GPT_FALLBACK_MODEL')
+    GPT_FALLBACK_BASE_URL: Optional[str] = os.getenv('GPT_FALLBACK_BASE_URL')
+    GPT_BASE_URL: Optional[str] = os.getenv('GPT_BASE_URL')
+    # Формат структурированного ответа для рекомендаций: auto (json_schema, если его
+    # поддерживает модель маршрута media), json_schema, json_object или none
+    GPT_MEDIA_RESPONSE_FORMAT: str = os.getenv('GPT_MEDIA_RESPONSE_FORMAT', 'auto')
+    
+    # Предохранитель OpenAI: доля ошибок в окне последних запросов,
+    # порог медленного ответа и пауза до пробного запроса
+    CIRCUIT_FAILURE_RATE: float = float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5'))
+    CIRCUIT_MIN_REQUESTS: int = int(os.getenv('CIRCUIT_MIN_REQUESTS', '10'))
+    CIRCUIT_WINDOW: int = int(os.getenv('CIRCUIT_WINDOW', '20'))
+    CIRCUIT_SLOW_CALL_SECONDS: float = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', '15'))
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+    
+    # Сжатие длинных диалогов: модель для кратких содержаний, порог
+    # длины истории в сообщениях и число последних сообщений без сжатия
+    GPT_SUMMARY_MODEL: str = os.getenv('GPT_SUMMARY_MODEL', 'gpt-4o-mini')
+    SUMMARY_THRESHOLD: int = int(os.getenv('SUMMARY_THRESHOLD', '30'))
+    SUMMARY_KEEP_LAST: int = int(os.getenv('SUMMARY_KEEP_LAST', '10'))
+    
+    # Telegram Bot API (локальный сервер или заглушка для нагрузочных тестов)
+    TELEGRAM_API_URL: Optional[str] = os.getenv('TELEGRAM_API_URL')
+    
+    # Ограничения исходящих отправок в Telegram
+    TG_GLOBAL_RATE: float = float(os.getenv('TG_GLOBAL_RATE', '30'))
+    TG_CHAT_RATE: float = float(os.getenv('TG_CHAT_RATE', '1'))
+    TG_GROUP_RATE: float = float(os.getenv('TG_GROUP_RATE', str(20 / 60)))
+    TG_CHAT_BURST: float = float(os.getenv('TG_CHAT_BURST', '3'))
+    TG_MAX_CHAT_BUCKETS: int = int(os.getenv('TG_MAX_CHAT_BUCKETS', '10000'))
+    
+    # Сессии FSM: время неактивности до вытеснения (0 - не вытеснять),
+    # интервал очистки и каталог для выгрузки на диск (пусто - удалять)
+    SESSION_TTL: float = float(os.getenv('SESSION_TTL', '86400'))
+    SESSION_SWEEP_INTERVAL: float = float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))
+    SESSION_SPILL_DIR: Optional[str] = os.getenv('SESSION_SPILL_DIR')
+    # Снимок сессий при остановке и восстановление при старте (пусто - не сохранять)
+    SESSION_SNAPSHOT_PATH: str = os.getenv('SESSION_SNAPSHOT_PATH', 'sessions.snapshot')
+    
+    # Ограничение частоты запросов одного пользователя (в секунду и всплеск):
+    # отдельно для обработчиков с запросами к ChatGPT и для остальных
+    THROTTLE_RATE: float = float(os.getenv('THROTTLE_RATE', '1'))
+    THROTTLE_BURST: float = float(os.getenv('THROTTLE_BURST', '10'))
+    THROTTLE_GPT_RATE: float = float(os.getenv('THROTTLE_GPT_RATE', str(10 / 60)))
+    THROTTLE_GPT_BURST: float = float(os.getenv('THROTTLE_GPT_BURST', '5'))
+    THROTTLE_MAX_USERS: int = int(os.getenv('THROTTLE_MAX_USERS', '10000'))
+    # Идентификаторы администраторов через запятую (без ограничений)
+    ADMIN_IDS: FrozenSet[int] = frozenset(
+        int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()
+    )
+    
+    # Отбрасывание повторных доставок: окно в секундах, максимум идентификаторов
+    # в памяти и файл SQLite, общий для процессов и перезапусков (пусто - память).
+    # Последнюю пачку getUpdates Telegram повторяет после каждого перезапуска
+    DEDUP_TTL: float = float(os.getenv('DEDUP_TTL', '3600'))
+    DEDUP_MAX_ENTRIES: int = int(os.getenv('DEDUP_MAX_ENTRIES', '100000'))
+    DEDUP_DB_PATH: str = os.getenv('DEDUP_DB_PATH', 'dedup.sqlite3')
+    
+    # Предпочтения пользователей (отклоненные рекомендации, показанные факты,
+    # заданные вопросы): файл SQLite (пусто - только в памяти), максимум записей
+    # на пользователя и вид, пользователей в памяти и повторных запросов к GPT
+    PREFERENCES_DB_PATH: str = os.getenv('PREFERENCES_DB_PATH', 'preferences.sqlite3')
+    PREFERENCES_MAX_ITEMS: int = int(os.getenv('PREFERENCES_MAX_ITEMS', '500'))
+    PREFERENCES_MAX_USERS: int = int(os.getenv('PREFERENCES_MAX_USERS', '10000'))
+    PREFERENCES_MAX_RETRIES: int = int(os.getenv('PREFERENCES_MAX_RETRIES', '2'))
+    # Общий банк вопросов викторины: файл SQLite (по умолчанию файл предпочтений)
+    # и максимум вопросов на тему
+    QUIZ_BANK_DB_PATH: str = os.getenv('QUIZ_BANK_DB_PATH', PREFERENCES_DB_PATH)
+    QUIZ_BANK_MAX_QUESTIONS: int = int(os.getenv('QUIZ_BANK_MAX_QUESTIONS', '1000'))
+    
+    # Сборка изображений (python -m common.asset_pipeline): длинная сторона
+    # в пикселях (Telegram показывает фото не больше 1280) и качество JPEG
+    ASSET_MAX_SIDE: int = int(os.getenv('ASSET_MAX_SIDE', '1280'))
+    ASSET_JPEG_QUALITY: int = int(os.getenv('ASSET_JPEG_QUALITY', '82'))
+    # Предзагрузка изображений при старте: служебный чат (пусто - не загружать),
+    # файл SQLite с file_id (по умолчанию файл предпочтений) и число одновременных загрузок
+    SERVICE_CHAT_ID: Optional[int] = int(os.getenv('SERVICE_CHAT_ID', '0')) or None
+    FILE_IDS_DB_PATH: str = os.getenv('FILE_IDS_DB_PATH', PREFERENCES_DB_PATH)
+    PREUPLOAD_CONCURRENCY: int = int(os.getenv('PREUPLOAD_CONCURRENCY', '4'))
+    
+    # Остановка: время ожидания незавершенных обработчиков в секундах
+    SHUTDOWN_DRAIN_TIMEOUT: float = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '20'))
     
     # Network
     PROXY: Optional[str] = os.getenv('PROXY')
     REQUEST_TIMEOUT: float = 30.0
     
+    # Пул соединений с OpenAI: максимум одновременных запросов (он же размер
+    # пула), время жизни простаивающего соединения, таймаут установки
+    # соединения, HTTP/2 (если установлен h2) и число соединений для прогрева
+    GPT_MAX_CONCURRENCY: int = int(os.getenv('GPT_MAX_CONCURRENCY', '64'))
+    GPT_KEEPALIVE_EXPIRY: float = float(os.getenv('GPT_KEEPALIVE_EXPIRY', '90'))
+    GPT_CONNECT_TIMEOUT: float = float(os.getenv('GPT_CONNECT_TIMEOUT', '5'))
+    GPT_HTTP2: bool = os.getenv('GPT_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+    GPT_WARMUP_CONNECTIONS: int = int(os.getenv('GPT_WARMUP_CONNECTIONS', '4'))
+    
+    # Адаптивные таймауты: окно задержек по режиму и модели, минимум образцов,
+    # таймаут = p99 * множитель, но не меньше GPT_MIN_TIMEOUT и не больше REQUEST_TIMEOUT
+    GPT_LATENCY_WINDOW: int = int(os.getenv('GPT_LATENCY_WINDOW', '200'))
+    GPT_LATENCY_MIN_SAMPLES: int = int(os.getenv('GPT_LATENCY_MIN_SAMPLES', '20'))
+    GPT_TIMEOUT_MULTIPLIER: float = float(os.getenv('GPT_TIMEOUT_MULTIPLIER', '3'))
+    GPT_MIN_TIMEOUT: float = float(os.getenv('GPT_MIN_TIMEOUT', '5'))
+    # Дублирующие запросы: перцентиль задержки, после которого отправляется дубль,
+    # и максимальная доля дублей от числа запросов (0 - не дублировать)
+    GPT_HEDGE_PERCENTILE: float = float(os.getenv('GPT_HEDGE_PERCENTILE', '95'))
+    GPT_HEDGE_BUDGET: float = float(os.getenv('GPT_HEDGE_BUDGET', '0.05'))
+    
+    # Кэш ответов на одинаковые короткие запросы: максимум ключей, время жизни
+    # в секундах и максимальная длина истории вместе с системным промптом
+    GPT_CACHE_MAX_ENTRIES: int = int(os.getenv('GPT_CACHE_MAX_ENTRIES', '5000'))
+    GPT_CACHE_TTL: float = float(os.getenv('GPT_CACHE_TTL', '3600'))
+    GPT_CACHE_MAX_MESSAGES: int = int(os.getenv('GPT_CACHE_MAX_MESSAGES', '2'))
+    
     # Logging
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FORMAT: str = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    
+    # Записи в JSON (иначе LOG_FORMAT), максимум записей в очереди фонового потока,
+    # окно в секундах и максимум повторяющихся предупреждений и ошибок за окно (0 - без прореживания)
+    LOG_JSON: bool = os.getenv('LOG_JSON', 'true').lower() in ('1', 'true', 'yes')
+    LOG_QUEUE_SIZE: int = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    LOG_SAMPLE_WINDOW: float = float(os.getenv('LOG_SAMPLE_WINDOW', '60'))
+    LOG_SAMPLE_BURST: int = int(os.getenv('LOG_SAMPLE_BURST', '10'))
+
+    # Диагностика по командам администратора (/diag_profile, /diag_memory, /diag_lag):
+    # каталог отчетов, интервал сэмплирования стека в секундах, максимальная
+    # длительность замера, глубина стека tracemalloc и порог задержки цикла событий
+    DIAGNOSTICS_DIR: str = os.getenv('DIAGNOSTICS_DIR', 'diagnostics_reports')
+    DIAG_SAMPLE_INTERVAL: float = float(os.getenv('DIAG_SAMPLE_INTERVAL', '0.005'))
+    DIAG_MAX_SECONDS: float = float(os.getenv('DIAG_MAX_SECONDS', '120'))
+    DIAG_TRACEMALLOC_FRAMES: int = int(os.getenv('DIAG_TRACEMALLOC_FRAMES', '1'))
+    LOOP_STALL_THRESHOLD: float = float(os.getenv('LOOP_STALL_THRESHOLD', '0.05'))
+    # Постоянный мониторинг цикла событий: включен ли, интервал замеров задержки
+    # и окно перцентилей в секундах, порог медленного шага задачи (0 - не отслеживать)
+    LOOP_MONITOR: bool = os.getenv('LOOP_MONITOR', 'true').lower() in ('1', 'true', 'yes')
+    LOOP_LAG_INTERVAL: float = float(os.getenv('LOOP_LAG_INTERVAL', '0.05'))
+    LOOP_LAG_WINDOW: float = float(os.getenv('LOOP_LAG_WINDOW', '60'))
+    LOOP_SLOW_CALLBACK: float = float(os.getenv('LOOP_SLOW_CALLBACK', '0.1'))
+
     @classmethod
     def validate(cls) -> None:
         """
@@ -54,9 +188,11 @@ class Config:
         Возвращает конфигурацию логирования.
         
         Returns:
-            dict: Настройки логирования с ключами 'level' и 'format'
+            dict: Настройки логирования с ключами 'level', 'format', 'json' и 'queue_size'
         """
         return {
             'level': cls.LOG_LEVEL,
-            'format': cls.LOG_FORMAT
+            'format': cls.LOG_FORMAT,
+            'json': cls.LOG_JSON,
+            'queue_size': cls.LOG_QUEUE_SIZE,
         } 
\ No newline at end of file
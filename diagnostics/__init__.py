@@ -0,0 +1,33 @@
+"""
+Пакет диагностики работающего бота.
+
+Профилирование, снимки памяти и замер задержки цикла событий по
+командам администратора, без перезапуска бота, и постоянный мониторинг
+задержки цикла событий и медленных шагов задач.
+
+Содержит:
+- diagnostics_router: Команды /diag_profile, /diag_memory, /diag_lag
+- StackSampler: Сэмплирующий профилировщик потока цикла событий
+- MemoryTracer: Разница снимков tracemalloc
+- LoopWatchdog: Задержка и блокировки цикла событий
+- LoopMonitor, loop_monitor: Постоянный мониторинг цикла событий и общий экземпляр
+- write_report: Запись отчета в Config.DIAGNOSTICS_DIR
+"""
+
+from .commands import diagnostics_router
+from .memory import MemoryTracer
+from .monitor import LoopMonitor, SlowCallback, loop_monitor
+from .profiler import StackSampler, format_profile
+from .reports import write_report
+from .watchdog import LoopWatchdog, Stall
+
+__all__ = [
+	'diagnostics_router',
+	'MemoryTracer',
+	'StackSampler',
+	'format_profile',
+	'write_report',
+	'LoopWatchdog',
+	'Stall',
+	'LoopMonitor', 'SlowCallback', 'loop_monitor',
+]
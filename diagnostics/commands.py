@@ -0,0 +1,150 @@
+"""
+Модуль команд диагностики для администраторов.
+
+Команды доступны только пользователям из Config.ADMIN_IDS и работают
+без перезапуска бота; подробные отчеты записываются в
+Config.DIAGNOSTICS_DIR, в ответе - краткая сводка и путь к файлу.
+
+Основные команды:
+- cmd_diag_profile: /diag_profile [секунды] - сэмплирующий профиль цикла событий
+- cmd_diag_memory: /diag_memory [топ|stop] - прирост памяти с предыдущего вызова (tracemalloc)
+- cmd_diag_lag: /diag_lag [секунды] - задержка цикла событий и стеки блокировок;
+  к отчету добавляются последние медленные шаги задач из loop_monitor
+
+Одновременно выполняется только один замер.
+
+Зависимости:
+- aiogram: Фреймворк для Telegram ботов
+- config: Администраторы и параметры диагностики
+"""
+
+import asyncio
+from typing import Optional
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from config import Config
+
+from .memory import MemoryTracer
+from .monitor import loop_monitor
+from .profiler import StackSampler, format_profile
+from .reports import write_report
+from .watchdog import LoopWatchdog
+
+diagnostics_router = Router()
+diagnostics_router.message.filter(F.from_user.id.in_(Config.ADMIN_IDS))
+
+_busy = asyncio.Lock()
+_memory = MemoryTracer(Config.DIAG_TRACEMALLOC_FRAMES)
+
+
+def _seconds(command: CommandObject, default: float) -> Optional[float]:
+	"""
+	Возвращает длительность замера из аргумента команды.
+
+	Args:
+		command (CommandObject): Команда с аргументами
+		default (float): Длительность без аргумента
+
+	Returns:
+		Optional[float]: Длительность не больше Config.DIAG_MAX_SECONDS или None, если аргумент некорректен
+	"""
+	if not command.args:
+		return default
+	try:
+		seconds = float(command.args.strip())
+	except ValueError:
+		return None
+	if seconds <= 0:
+		return None
+	return min(seconds, Config.DIAG_MAX_SECONDS)
+
+
+async def _save(kind: str, text: str) -> str:
+	"""Записывает отчет в отдельном потоке и возвращает путь к файлу."""
+	return await asyncio.to_thread(write_report, kind, text)
+
+
+@diagnostics_router.message(Command('diag_profile'))
+async def cmd_diag_profile(message: Message, command: CommandObject):
+	"""
+	Снимает сэмплирующий профиль цикла событий.
+
+	Args:
+		message (Message): Сообщение с командой /diag_profile [секунды]
+		command (CommandObject): Команда с аргументами
+	"""
+	seconds = _seconds(command, 10)
+	if seconds is None:
+		await message.answer('Использование: /diag_profile [секунды]', parse_mode=None)
+		return
+	if _busy.locked():
+		await message.answer('Уже выполняется другой замер', parse_mode=None)
+		return
+	async with _busy:
+		await message.answer(f'Профилирую {seconds:g} с...', parse_mode=None)
+		stacks = await StackSampler().profile(seconds)
+		report = format_profile(stacks)
+		path = await _save('profile', report)
+	summary = '\n'.join(report.splitlines()[:8])
+	await message.answer(f'{summary}\n\nОтчет: {path}', parse_mode=None)
+
+
+@diagnostics_router.message(Command('diag_memory'))
+async def cmd_diag_memory(message: Message, command: CommandObject):
+	"""
+	Сравнивает память с предыдущим вызовом или выключает tracemalloc.
+
+	Первый вызов включает tracemalloc и сохраняет исходный снимок.
+
+	Args:
+		message (Message): Сообщение с командой /diag_memory [топ|stop]
+		command (CommandObject): Команда с аргументами
+	"""
+	argument = (command.args or '').strip()
+	if argument == 'stop':
+		_memory.stop()
+		await message.answer('tracemalloc выключен', parse_mode=None)
+		return
+	if argument and not argument.isdigit():
+		await message.answer('Использование: /diag_memory [топ|stop]', parse_mode=None)
+		return
+	if _busy.locked():
+		await message.answer('Уже выполняется другой замер', parse_mode=None)
+		return
+	async with _busy:
+		report = await _memory.diff(int(argument or 20))
+		path = await _save('memory', report)
+	summary = '\n'.join(report.splitlines()[:12])
+	await message.answer(f'{summary}\n\nОтчет: {path}', parse_mode=None)
+
+
+@diagnostics_router.message(Command('diag_lag'))
+async def cmd_diag_lag(message: Message, command: CommandObject):
+	"""
+	Измеряет задержку цикла событий и снимает стеки блокировок.
+
+	Args:
+		message (Message): Сообщение с командой /diag_lag [секунды]
+		command (CommandObject): Команда с аргументами
+	"""
+	seconds = _seconds(command, 30)
+	if seconds is None:
+		await message.answer('Использование: /diag_lag [секунды]', parse_mode=None)
+		return
+	if _busy.locked():
+		await message.answer('Уже выполняется другой замер', parse_mode=None)
+		return
+	async with _busy:
+		await message.answer(f'Измеряю задержку {seconds:g} с...', parse_mode=None)
+		watchdog = LoopWatchdog()
+		await watchdog.watch(seconds)
+		report = watchdog.report()
+		monitor_report = loop_monitor.report()
+		if monitor_report:
+			report = f'{report}\n{monitor_report}'
+		path = await _save('lag', report)
+	summary = '\n'.join(report.splitlines()[:2] + monitor_report.splitlines()[:2])
+	await message.answer(f'{summary}\n\nОтчет: {path}', parse_mode=None)
@@ -0,0 +1,84 @@
+"""
+Модуль снимков памяти tracemalloc.
+
+Содержит:
+- MemoryTracer: Запуск tracemalloc и разница между последовательными снимками
+
+Первый вызов diff() включает tracemalloc и запоминает исходный снимок;
+каждый следующий сравнивает новый снимок с предыдущим и возвращает
+строки кода, на которых больше всего выросла память. Трассировка
+замедляет выделение памяти, поэтому ее следует выключать (stop())
+после диагностики.
+
+Зависимости:
+- config: Глубина стека трассировки
+"""
+
+import asyncio
+import tracemalloc
+from typing import Optional
+
+
+class MemoryTracer:
+	"""
+	Разница снимков памяти между вызовами.
+
+	Attributes:
+		frames (int): Глубина стека, сохраняемая для каждого выделения
+	"""
+
+	def __init__(self, frames: int = 1):
+		"""
+		Инициализирует трассировщик (tracemalloc включается при первом diff).
+
+		Args:
+			frames (int): Глубина стека для каждого выделения
+		"""
+		self.frames = frames
+		self._previous: Optional[tracemalloc.Snapshot] = None
+
+	@staticmethod
+	def _take() -> tracemalloc.Snapshot:
+		"""Делает снимок без выделений самого tracemalloc и импорта модулей."""
+		return tracemalloc.take_snapshot().filter_traces((
+			tracemalloc.Filter(False, tracemalloc.__file__),
+			tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+			tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+		))
+
+	def _diff(self, top: int) -> str:
+		"""Делает снимок и сравнивает его с предыдущим (блокирует вызывающий поток)."""
+		if not tracemalloc.is_tracing() or self._previous is None:
+			if not tracemalloc.is_tracing():
+				tracemalloc.start(self.frames)
+			self._previous = self._take()
+			return 'tracemalloc включен, исходный снимок сохранен; повторите команду для сравнения\n'
+
+		snapshot = self._take()
+		stats = snapshot.compare_to(self._previous, 'lineno')
+		self._previous = snapshot
+		current, peak = tracemalloc.get_traced_memory()
+		lines = [
+			f'Отслеживается: {current / 1024 / 1024:.1f} МБ, пик {peak / 1024 / 1024:.1f} МБ',
+			f'Прирост с предыдущего снимка, топ {top}:',
+		]
+		lines.extend(str(stat) for stat in stats[:top])
+		return '\n'.join(lines) + '\n'
+
+	async def diff(self, top: int = 20) -> str:
+		"""
+		Делает снимок в отдельном потоке и возвращает отчет о приросте памяти.
+
+		Args:
+			top (int): Количество строк кода в отчете
+
+		Returns:
+			str: Отчет
+		"""
+		return await asyncio.to_thread(self._diff, top)
+
+	def stop(self) -> None:
+		"""Выключает tracemalloc и забывает снимок."""
+		self._previous = None
+		if tracemalloc.is_tracing():
+			tracemalloc.stop()
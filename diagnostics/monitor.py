@@ -0,0 +1,290 @@
+"""
+Модуль постоянного мониторинга цикла событий.
+
+Содержит:
+- LoopMonitor: Задержка цикла событий в метриках и медленные шаги задач
+- SlowCallback: Медленный шаг задачи с контекстом обработчика и стеком
+- loop_monitor: Общий экземпляр (запускается при старте диспетчера)
+
+Чтение файлов, обход каталогов или синхронный вызов в обработчике
+останавливают цикл событий, и ждут все чаты сразу. Монитор:
+- постоянно измеряет задержку цикла (см. LoopWatchdog) и публикует
+  перцентили за последние Config.LOOP_LAG_WINDOW секунд в метриках
+  loop.lag.p50, loop.lag.p90, loop.lag.p99 и loop.lag.max (в секундах),
+  а число блокировок - в loop.stalls;
+- замеряет каждый шаг задач (от одного await до следующего), созданных
+  в цикле событий бота: фабрика задач (loop.set_task_factory) оборачивает
+  корутину задачи. Шаги дольше Config.LOOP_SLOW_CALLBACK пишутся в лог
+  с полями обработчика из log_context и стеком, снятым LoopWatchdog во
+  время блокировки, и учитываются в loop.slow_callbacks.
+
+Обработчики aiogram выполняются в задачах, поэтому их блокировки видны
+с обработчиком и стеком. Прочие обратные вызовы цикла (call_soon,
+протоколы транспорта) не замеряются, но их блокировки LoopWatchdog
+учитывает в loop.stalls. Режим отладки asyncio не используется: он
+снимает стек при планировании каждого обратного вызова.
+
+Стек снимается, только если замер задержки попал на блокировку и ждал
+дольше Config.LOOP_STALL_THRESHOLD, поэтому он гарантирован для вызовов
+длиннее LOOP_STALL_THRESHOLD + LOOP_LAG_INTERVAL (по умолчанию 100 мс).
+
+Зависимости:
+- common: Метрики и контекст логирования
+- config: Интервал замеров, окно перцентилей и пороги
+"""
+
+import asyncio
+import logging
+import time
+import types
+from collections import deque
+from collections.abc import Coroutine
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+from common import metrics, log_context
+from config import Config
+
+from .watchdog import LoopWatchdog
+
+logger = logging.getLogger(__name__)
+
+_WRAPPER_FRAME = f'  File "{__file__}"'
+
+
+@dataclass
+class SlowCallback:
+	"""
+	Медленный обратный вызов цикла событий.
+
+	Attributes:
+		started (float): Время начала (time.time())
+		duration (float): Длительность в секундах
+		callback (str): Задача и имя ее корутины
+		context (Dict[str, Any]): Поля log_context задачи (обработчик, чат, режим)
+		stack (str): Стек во время блокировки (пусто, если не снят)
+	"""
+	started: float
+	duration: float
+	callback: str
+	context: Dict[str, Any] = field(default_factory=dict)
+	stack: str = ''
+
+
+class _TimedCoroutine(Coroutine):
+	"""Обертка корутины задачи, замеряющая каждый шаг (send и throw)."""
+
+	__slots__ = ('_coro', '_monitor')
+
+	def __init__(self, coro: types.CoroutineType, monitor: 'LoopMonitor'):
+		self._coro = coro
+		self._monitor = monitor
+
+	def send(self, value: Any) -> Any:
+		started = time.monotonic()
+		try:
+			return self._coro.send(value)
+		finally:
+			self._monitor._check(started)
+
+	def throw(self, *args: Any) -> Any:
+		started = time.monotonic()
+		try:
+			return self._coro.throw(*args)
+		finally:
+			self._monitor._check(started)
+
+	def close(self) -> None:
+		self._coro.close()
+
+	def __await__(self):
+		return self._coro.__await__()
+
+	def __getattr__(self, name: str) -> Any:
+		# cr_frame, cr_code, __qualname__ и прочее - для repr задач и отладчиков
+		return getattr(self._coro, name)
+
+
+class LoopMonitor:
+	"""
+	Постоянный монитор цикла событий.
+
+	Attributes:
+		slow_callback (float): Порог медленного обратного вызова в секундах (0 - не отслеживать)
+		interval (float): Интервал замеров задержки в секундах
+		window (float): Окно перцентилей задержки в секундах
+		publish_interval (float): Интервал публикации метрик в секундах
+		slow_callbacks (Deque[SlowCallback]): Последние медленные обратные вызовы
+		watchdog (Optional[LoopWatchdog]): Измеритель задержки (пока монитор запущен)
+	"""
+
+	def __init__(
+		self,
+		slow_callback: Optional[float] = None,
+		interval: Optional[float] = None,
+		window: Optional[float] = None,
+		publish_interval: float = 10,
+		history: int = 50,
+	):
+		"""
+		Инициализирует монитор. Не заданные параметры берутся из Config.
+
+		Args:
+			slow_callback (Optional[float]): Порог медленного обратного вызова в секундах
+			interval (Optional[float]): Интервал замеров задержки в секундах
+			window (Optional[float]): Окно перцентилей задержки в секундах
+			publish_interval (float): Интервал публикации метрик в секундах
+			history (int): Количество хранимых медленных обратных вызовов
+		"""
+		self.slow_callback = Config.LOOP_SLOW_CALLBACK if slow_callback is None else slow_callback
+		self.interval = interval or Config.LOOP_LAG_INTERVAL
+		self.window = window or Config.LOOP_LAG_WINDOW
+		self.publish_interval = publish_interval
+		self.slow_callbacks: Deque[SlowCallback] = deque(maxlen=history)
+		self.watchdog: Optional[LoopWatchdog] = None
+		self._publisher: Optional[asyncio.Task] = None
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._factory: Optional[Callable[..., asyncio.Future]] = None
+		self._previous_factory: Optional[Callable[..., asyncio.Future]] = None
+
+	@staticmethod
+	def describe(task: Optional[asyncio.Task]) -> str:
+		"""
+		Описывает задачу: имя задачи и ее корутины.
+
+		Args:
+			task (Optional[asyncio.Task]): Задача
+
+		Returns:
+			str: Описание
+		"""
+		if task is None:
+			return '<no task>'
+		coro = task.get_coro()
+		return f'{task.get_name()} ({getattr(coro, "__qualname__", coro)})'
+
+	def _check(self, started: float) -> None:
+		"""Записывает шаг задачи, если он длился дольше порога (вызывается в контексте задачи)."""
+		duration = time.monotonic() - started
+		if duration >= self.slow_callback:
+			self._record(started, duration)
+
+	def _record(self, started: float, duration: float) -> None:
+		"""Сохраняет и пишет в лог медленный шаг текущей задачи."""
+		context = dict(log_context.get())
+		stack = ''
+		last_stack = self.watchdog.last_stack if self.watchdog is not None else None
+		if last_stack is not None and last_stack[0] >= started:
+			stack = last_stack[1]
+			# Первый кадр - _TimedCoroutine.send/throw (две строки), он не нужен
+			if stack.startswith(_WRAPPER_FRAME):
+				stack = stack.split('\n', 2)[-1]
+		slow = SlowCallback(time.time() - duration, duration, self.describe(asyncio.current_task()), context, stack)
+		self.slow_callbacks.append(slow)
+		metrics.inc('loop.slow_callbacks')
+		logger.warning(
+			'Slow callback blocked the event loop for %.0f ms in %s%s',
+			duration * 1000, slow.callback, f'\n{stack.rstrip()}' if stack else '',
+			extra=context,
+		)
+
+	def _install(self, loop: asyncio.AbstractEventLoop) -> None:
+		"""Устанавливает фабрику задач, оборачивающую корутины (поверх уже заданной фабрики)."""
+		if self._factory is not None or not self.slow_callback:
+			return
+		previous = loop.get_task_factory()
+
+		def factory(loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any) -> asyncio.Future:
+			if isinstance(coro, types.CoroutineType):
+				coro = _TimedCoroutine(coro, self)
+			if previous is not None:
+				return previous(loop, coro, **kwargs)
+			return asyncio.Task(coro, loop=loop, **kwargs)
+
+		loop.set_task_factory(factory)
+		self._loop, self._factory, self._previous_factory = loop, factory, previous
+
+	def _uninstall(self) -> None:
+		"""Возвращает прежнюю фабрику задач, если ее с тех пор никто не заменил."""
+		if self._factory is None:
+			return
+		if self._loop.get_task_factory() is self._factory:
+			self._loop.set_task_factory(self._previous_factory)
+		else:
+			logger.warning("Task factory was replaced while the loop monitor was running, leaving it in place")
+		self._loop = self._factory = self._previous_factory = None
+
+	def publish(self) -> None:
+		"""Публикует перцентили задержки и число блокировок в метриках."""
+		if self.watchdog is None or not self.watchdog.lags:
+			return
+		for q in (50, 90, 99):
+			metrics.set(f'loop.lag.p{q}', round(self.watchdog.percentile(q), 4))
+		metrics.set('loop.lag.max', round(max(self.watchdog.lags), 4))
+		metrics.set('loop.stalls', self.watchdog.stall_count)
+
+	async def _publish_forever(self) -> None:
+		"""Периодически публикует метрики."""
+		while True:
+			await asyncio.sleep(self.publish_interval)
+			self.publish()
+
+	async def start(self) -> None:
+		"""
+		Запускает замеры задержки и отслеживание медленных обратных вызовов.
+
+		Вызывается при старте диспетчера.
+		"""
+		if not Config.LOOP_MONITOR or self.watchdog is not None:
+			return
+		self.watchdog = LoopWatchdog(
+			interval=self.interval,
+			window=max(1, int(self.window / self.interval)),
+		)
+		self.watchdog.start()
+		self._install(asyncio.get_running_loop())
+		self._publisher = asyncio.create_task(self._publish_forever())
+
+	async def close(self) -> None:
+		"""
+		Останавливает монитор и публикует последние значения.
+
+		Вызывается при остановке диспетчера.
+		"""
+		if self._publisher is not None:
+			self._publisher.cancel()
+			with suppress(asyncio.CancelledError):
+				await self._publisher
+			self._publisher = None
+		self._uninstall()
+		if self.watchdog is not None:
+			await asyncio.to_thread(self.watchdog.stop)
+			self.publish()
+			self.watchdog = None
+
+	def report(self) -> str:
+		"""
+		Форматирует отчет: задержка за окно и последние медленные обратные вызовы.
+
+		Returns:
+			str: Отчет (пусто, если монитор не запущен)
+		"""
+		if self.watchdog is None:
+			return ''
+		lines = [f'Монитор за {self.window:g} с: {self.watchdog.report().splitlines()[0]}']
+		lines.append(
+			f'Медленных шагов задач (дольше {self.slow_callback * 1000:.0f} мс): '
+			f'{int(metrics.get("loop.slow_callbacks"))}'
+		)
+		for slow in reversed(self.slow_callbacks):
+			stamp = time.strftime('%H:%M:%S', time.localtime(slow.started))
+			fields = ', '.join(f'{name}={value}' for name, value in slow.context.items())
+			lines.append('')
+			lines.append(f'{stamp} {slow.duration * 1000:.1f} мс: {slow.callback} {fields}'.rstrip())
+			if slow.stack:
+				lines.append(slow.stack.rstrip())
+		return '\n'.join(lines) + '\n'
+
+
+loop_monitor = LoopMonitor()
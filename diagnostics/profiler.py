@@ -0,0 +1,141 @@
+"""
+Модуль сэмплирующего профилировщика цикла событий.
+
+Содержит:
+- StackSampler: Снимает стек потока цикла событий с заданным интервалом
+- format_profile: Отчет: собственное и общее время функций и свернутые стеки
+
+Профилировщик работает в отдельном потоке и читает стек потока цикла
+событий через sys._current_frames(), поэтому бот не останавливается
+и не замедляется заметно (в отличие от cProfile, который трассирует
+каждый вызов). Образцы, в которых цикл ждет событий в selectors,
+считаются простоем.
+
+Свернутые стеки ("f1;f2;f3 N") совместимы с flamegraph.pl и speedscope.
+
+Зависимости:
+- config: Интервал сэмплирования
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Optional
+
+from config import Config
+
+# Функции, в которых цикл событий ждет ввода-вывода
+_IDLE_FRAMES = ('select (selectors.py', 'poll (selectors.py', 'control (selectors.py')
+
+
+class StackSampler:
+	"""
+	Сэмплирующий профилировщик одного потока.
+
+	Attributes:
+		thread_id (int): Идентификатор профилируемого потока
+		interval (float): Интервал между образцами в секундах
+	"""
+
+	def __init__(self, thread_id: Optional[int] = None, interval: Optional[float] = None):
+		"""
+		Инициализирует профилировщик.
+
+		Args:
+			thread_id (Optional[int]): Поток (по умолчанию - текущий, т.е. поток цикла событий)
+			interval (Optional[float]): Интервал в секундах (по умолчанию Config.DIAG_SAMPLE_INTERVAL)
+		"""
+		self.thread_id = thread_id or threading.get_ident()
+		self.interval = interval or Config.DIAG_SAMPLE_INTERVAL
+
+	@staticmethod
+	def collapse(frame: Optional[FrameType]) -> str:
+		"""
+		Сворачивает стек в строку "внешняя;...;внутренняя".
+
+		Args:
+			frame (Optional[FrameType]): Верхний кадр стека
+
+		Returns:
+			str: Свернутый стек
+		"""
+		names = []
+		while frame is not None:
+			code = frame.f_code
+			names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+			frame = frame.f_back
+		return ';'.join(reversed(names))
+
+	def sample(self, duration: float) -> Counter:
+		"""
+		Собирает образцы стека в течение duration секунд (блокирует вызывающий поток).
+
+		Args:
+			duration (float): Длительность в секундах
+
+		Returns:
+			Counter: Число образцов по свернутому стеку
+		"""
+		stacks: Counter = Counter()
+		deadline = time.monotonic() + duration
+		while time.monotonic() < deadline:
+			frame = sys._current_frames().get(self.thread_id)
+			if frame is not None:
+				stacks[self.collapse(frame)] += 1
+			del frame
+			time.sleep(self.interval)
+		return stacks
+
+	async def profile(self, duration: float) -> Counter:
+		"""
+		Собирает образцы в отдельном потоке, не блокируя цикл событий.
+
+		Args:
+			duration (float): Длительность в секундах
+
+		Returns:
+			Counter: Число образцов по свернутому стеку
+		"""
+		return await asyncio.to_thread(self.sample, duration)
+
+
+def format_profile(stacks: Counter, top: int = 25) -> str:
+	"""
+	Форматирует отчет профилировщика.
+
+	Args:
+		stacks (Counter): Образцы по свернутому стеку
+		top (int): Количество функций в таблицах
+
+	Returns:
+		str: Сводка, таблицы собственного и общего времени и свернутые стеки
+	"""
+	total = sum(stacks.values())
+	if not total:
+		return 'Нет образцов\n'
+	own: Counter = Counter()
+	inclusive: Counter = Counter()
+	idle = 0
+	for stack, count in stacks.items():
+		frames = stack.split(';')
+		if frames[-1].startswith(_IDLE_FRAMES):
+			idle += count
+			continue
+		own[frames[-1]] += count
+		for name in set(frames):
+			inclusive[name] += count
+
+	busy = total - idle
+	lines = [f'Образцов: {total}, цикл событий занят: {100 * busy / total:.1f}%', '']
+	for title, counter in (('Собственное время', own), ('Общее время', inclusive)):
+		lines.append(f'{title} (доля от занятых образцов):')
+		for name, count in counter.most_common(top):
+			lines.append(f'{100 * count / max(busy, 1):6.1f}%  {count:6d}  {name}')
+		lines.append('')
+	lines.append('Свернутые стеки:')
+	lines.extend(f'{stack} {count}' for stack, count in stacks.most_common())
+	return '\n'.join(lines) + '\n'
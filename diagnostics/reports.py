@@ -0,0 +1,36 @@
+"""
+Модуль записи отчетов диагностики на диск.
+
+Содержит:
+- write_report: Записывает текст отчета в Config.DIAGNOSTICS_DIR
+
+Зависимости:
+- config: Каталог отчетов
+"""
+
+import os
+import time
+
+from config import Config
+
+
+def write_report(kind: str, text: str) -> str:
+	"""
+	Записывает отчет в файл <kind>-<дата>-<время>.txt.
+
+	Выполняет блокирующую запись: из цикла событий вызывайте
+	через asyncio.to_thread.
+
+	Args:
+		kind (str): Вид отчета (profile, memory, lag)
+		text (str): Текст отчета
+
+	Returns:
+		str: Путь к файлу
+	"""
+	os.makedirs(Config.DIAGNOSTICS_DIR, exist_ok=True)
+	stamp = time.strftime('%Y%m%d-%H%M%S')
+	path = os.path.join(Config.DIAGNOSTICS_DIR, f'{kind}-{stamp}.txt')
+	with open(path, 'w', encoding='UTF-8') as file:
+		file.write(text)
+	return path
@@ -0,0 +1,202 @@
+"""
+Модуль обнаружения блокировок цикла событий.
+
+Содержит:
+- LoopWatchdog: Фоновый поток, измеряющий задержку цикла событий
+- Stall: Блокировка цикла событий со стеком потока цикла
+
+Поток периодически ставит в цикл событий пустой обратный вызов
+(call_soon_threadsafe) и ждет его выполнения. Время ожидания - задержка
+цикла: сколько любое готовое событие ждет своей очереди. Если ожидание
+дольше порога, поток снимает стек потока цикла событий: в этот момент
+там выполняется код, который цикл блокирует.
+
+Зависимости:
+- config: Порог блокировки
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from asyncio import events
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Tuple
+
+from config import Config
+
+_EVENTS_FILE = events.__file__
+
+
+@dataclass
+class Stall:
+	"""
+	Блокировка цикла событий.
+
+	Attributes:
+		started (float): Время постановки обратного вызова (time.time())
+		lag (float): Задержка в секундах
+		stack (str): Стек потока цикла событий после превышения порога
+	"""
+	started: float
+	lag: float
+	stack: str
+
+
+class LoopWatchdog:
+	"""
+	Измеритель задержки цикла событий.
+
+	Создается в потоке цикла событий.
+
+	Attributes:
+		threshold (float): Порог блокировки в секундах
+		interval (float): Пауза между замерами в секундах
+		lags (Deque[float]): Последние замеры задержки в секундах
+		stalls (Deque[Stall]): Последние блокировки дольше порога
+		stall_count (int): Всего блокировок дольше порога
+		last_stack (Optional[Tuple[float, str]]): Время (time.monotonic()) и стек последней блокировки,
+			сохраняются сразу после снятия, до освобождения цикла событий
+	"""
+
+	def __init__(
+		self,
+		loop: Optional[asyncio.AbstractEventLoop] = None,
+		threshold: Optional[float] = None,
+		interval: float = 0.05,
+		window: int = 10000,
+	):
+		"""
+		Инициализирует измеритель.
+
+		Args:
+			loop (Optional[asyncio.AbstractEventLoop]): Цикл событий (по умолчанию - текущий)
+			threshold (Optional[float]): Порог блокировки (по умолчанию Config.LOOP_STALL_THRESHOLD)
+			interval (float): Пауза между замерами в секундах
+			window (int): Количество хранимых замеров (блокировок - в 100 раз меньше)
+		"""
+		self.loop = loop or asyncio.get_running_loop()
+		self.threshold = Config.LOOP_STALL_THRESHOLD if threshold is None else threshold
+		self.interval = interval
+		self.lags: Deque[float] = deque(maxlen=window)
+		self.stalls: Deque[Stall] = deque(maxlen=max(1, window // 100))
+		self.stall_count = 0
+		self.last_stack: Optional[Tuple[float, str]] = None
+		self._loop_thread = threading.get_ident()
+		self._stopped = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+
+	def _loop_stack(self) -> str:
+		"""Возвращает текущий стек потока цикла событий начиная с выполняемого обратного вызова."""
+		frame = sys._current_frames().get(self._loop_thread)
+		if frame is None:
+			return ''
+		stack = traceback.extract_stack(frame)
+		del frame
+		# Кадры самого цикла событий (run_forever, _run_once, Handle._run) не нужны
+		for index in range(len(stack) - 1, -1, -1):
+			if stack[index].name == '_run' and stack[index].filename == _EVENTS_FILE:
+				stack = stack[index + 1:]
+				break
+		return ''.join(traceback.format_list(stack))
+
+	def measure(self) -> Optional[float]:
+		"""
+		Выполняет один замер (блокирует вызывающий поток).
+
+		Returns:
+			Optional[float]: Задержка в секундах или None, если измеритель остановлен
+		"""
+		done = threading.Event()
+		started, wall = time.monotonic(), time.time()
+		try:
+			self.loop.call_soon_threadsafe(done.set)
+		except RuntimeError:
+			# Цикл событий закрыт
+			return None
+		stack = None
+		if not done.wait(self.threshold):
+			stack = self._loop_stack()
+			self.last_stack = (time.monotonic(), stack)
+			while not done.wait(self.interval):
+				if self._stopped.is_set():
+					return None
+		lag = time.monotonic() - started
+		self.lags.append(lag)
+		if stack is not None:
+			self.stall_count += 1
+			self.stalls.append(Stall(wall, lag, stack))
+		return lag
+
+	def _run(self) -> None:
+		"""Цикл замеров фонового потока."""
+		while not self._stopped.is_set():
+			self.measure()
+			self._stopped.wait(self.interval)
+
+	def start(self) -> None:
+		"""Запускает фоновый поток замеров."""
+		if self._thread is not None:
+			return
+		self._stopped.clear()
+		self._thread = threading.Thread(target=self._run, name='loop-watchdog', daemon=True)
+		self._thread.start()
+
+	def stop(self) -> None:
+		"""Останавливает фоновый поток замеров."""
+		self._stopped.set()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+	async def watch(self, duration: float) -> None:
+		"""
+		Выполняет замеры в течение duration секунд.
+
+		Args:
+			duration (float): Длительность в секундах
+		"""
+		self.start()
+		try:
+			await asyncio.sleep(duration)
+		finally:
+			await asyncio.to_thread(self.stop)
+
+	def percentile(self, q: float) -> Optional[float]:
+		"""
+		Возвращает перцентиль задержки по хранимым замерам.
+
+		Args:
+			q (float): Перцентиль от 0 до 100
+
+		Returns:
+			Optional[float]: Задержка в секундах или None, если замеров нет
+		"""
+		if not self.lags:
+			return None
+		ordered = sorted(self.lags)
+		return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+	def report(self) -> str:
+		"""
+		Форматирует отчет: перцентили задержки и стеки блокировок.
+
+		Returns:
+			str: Отчет
+		"""
+		if not self.lags:
+			return 'Нет замеров\n'
+		lines = [
+			f'Замеров: {len(self.lags)}, задержка цикла событий, мс: '
+			f'p50 {self.percentile(50) * 1000:.1f}, p99 {self.percentile(99) * 1000:.1f}, '
+			f'максимум {max(self.lags) * 1000:.1f}',
+			f'Блокировок дольше {self.threshold * 1000:.0f} мс: {len(self.stalls)}',
+		]
+		for stall in sorted(self.stalls, key=lambda item: item.lag, reverse=True):
+			stamp = time.strftime('%H:%M:%S', time.localtime(stall.started))
+			lines.append('')
+			lines.append(f'{stamp} заблокирован на {stall.lag * 1000:.1f} мс:')
+			lines.append(stall.stack.rstrip())
+		return '\n'.join(lines) + '\n'
@@ -5,6 +5,8 @@
 - GPTError: Базовое исключение для ошибок, связанных с GPT
 - FileOperationError: Исключение для ошибок файловой операции
 - APIConnectionError: Исключение для ошибок подключения к API
+- BackendUnavailableError: Исключение для сбоев и перегрузки сервиса API
+- CircuitOpenError: Исключение для запросов, отклоненных предохранителем
 - ConfigurationError: Исключение, вызванное ошибками конфигурации
 - log_exception: Функция для логирования ошибок
 """
@@ -29,6 +31,16 @@ class APIConnectionError(GPTError):
     pass
 
 
+class BackendUnavailableError(APIConnectionError):
+    """Исключение для сбоев и перегрузки сервиса API (таймауты, 429, 5xx)."""
+    pass
+
+
+class CircuitOpenError(BackendUnavailableError):
+    """Исключение для запросов, отклоненных разомкнутым предохранителем."""
+    pass
+
+
 class ConfigurationError(GPTError):
     """Исключение, вызванное ошибками конфигурации."""
     pass
@@ -36,13 +48,17 @@ class ConfigurationError(GPTError):
 
 def log_exception(error: Exception, context: str = ""):
     """
-    Логирует ошибку с дополнительным контекстом.
+    Логирует ошибку с дополнительным контекстом и трассировкой.
+    
+    Трассировка передается в запись без форматирования (его выполняет
+    фоновый поток логирования, см. common.logs), контекст - отдельным
+    полем context, по которому прореживаются повторяющиеся ошибки.
     
     Args:
         error (Exception): Исключение для логирования
         context (str): Описание места возникновения ошибки
     """
     if context:
-        logger.error(f"{context}: {str(error)}")
+        logger.error("%s: %s", context, error, exc_info=error, extra={'context': context})
     else:
-        logger.error(str(error)) 
\ No newline at end of file
+        logger.error("%s", error, exc_info=error) 
\ No newline at end of file
@@ -9,6 +9,7 @@
 - commands_router: Обработчик команд бота
 - callback_router: Обработчик inline кнопок
 - messages_router: Обработчик текстовых сообщений
+- diagnostics_router: Команды диагностики для администраторов
 
 Основные возможности:
 - Обработка команд пользователя
@@ -21,10 +22,12 @@
 """
 
 from commands import commands_router
+from diagnostics import diagnostics_router
 from .callback_handlers import callback_router
 from .message_handler import messages_router
 
 routers = [
+	diagnostics_router,
 	messages_router,
 	commands_router,
 	callback_router,
@@ -16,26 +16,30 @@
 - commands: Команды бота
 - utils: Вспомогательные функции
 - exception: Обработка исключений
+- storage: Отклоненные рекомендации, заданные вопросы и банк вопросов викторины
 """
 
-from aiogram import Router, F, Bot
+from aiogram import Router, F, Bot, flags
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, FSInputFile, InputMediaPhoto, InputFileUnion, Message
 import logging
-from typing import cast, Optional, Dict, Any, TypedDict
+from typing import cast, Optional, Dict, Any, List, Tuple, TypedDict, Union
 import asyncio
 
-from models import ChatGpt, GPTMessage, GPTRole, MediaData, CelebrityData, QuizData, TranslatorData, QuizStateData, MediaStateData, Button
-from common import Resource
+from models import (
+	gpt_client, GPTMessage, GPTRole, MediaData, CelebrityData, QuizData, TranslatorData, QuizStateData, MediaStateData, Button,
+	parse_media_response, media_response_format, MEDIA_CORRECTION_PROMPT,
+)
+from common import Resource, metrics
 from keyboards import ikb_media_genres, ikb_media_actions
 from handlers.state_handlers import MediaRecommendation, CelebrityTalk, Quiz, Translator
 from commands import cmd_start, cmd_quiz
-from utils import bot_thinking
+from utils import bot_thinking, send_answer, escape_markdown
 from exception import APIConnectionError, log_exception
+from storage import preferences, quiz_bank, MEDIA_DISLIKE, QUIZ_QUESTION
 
 logger = logging.getLogger(__name__)
 callback_router = Router()
-gpt_client = ChatGpt()
 
 
 @callback_router.callback_query(CelebrityData.filter(F.button == 'select_celebrity'))
@@ -59,7 +63,38 @@ async def celebrity_callbacks(callback: CallbackQuery, callback_data: CelebrityD
 		await callback.answer("Произошла ошибка. Попробуйте еще раз.", show_alert=True)
 
 
+async def ask_quiz_question(user_id: int, topic: str, messages: GPTMessage) -> str:
+	"""
+	Выбирает следующий вопрос викторины и добавляет его в диалог.
+	
+	Сначала ищется вопрос из общего банка темы, который пользователь
+	еще не видел; GPT вызывается только если банк исчерпан, и его
+	вопрос пополняет банк. Вопрос добавляется в историю как ответ
+	ассистента, чтобы GPT мог проверить ответ пользователя.
+	
+	Args:
+		user_id (int): Идентификатор пользователя
+		topic (str): Тема викторины (quiz_prog, quiz_math, quiz_biology)
+		messages (GPTMessage): Диалог, последнее сообщение - запрос вопроса
+		
+	Returns:
+		str: Текст вопроса
+		
+	Raises:
+		APIConnectionError: При сбое запроса к API
+	"""
+	question = quiz_bank.pick(topic, await preferences.digests(user_id, QUIZ_QUESTION))
+	if question is None:
+		question = await preferences.first_unseen(
+			user_id, QUIZ_QUESTION, lambda attempt: gpt_client.request(messages)
+		)
+		await quiz_bank.add(topic, question)
+	messages.update(GPTRole.ASSISTANT, question)
+	return question
+
+
 @callback_router.callback_query(QuizData.filter(F.button == 'select_topic'))
+@flags.throttling('gpt')
 async def quiz_callbacks(callback: CallbackQuery, callback_data: QuizData, bot: Bot, state: FSMContext):
 	try:
 		photo = Resource('quiz').photo
@@ -70,17 +105,19 @@ async def quiz_callbacks(callback: CallbackQuery, callback_data: QuizData, bot:
 		request_message.update(GPTRole.USER, callback_data.topic)
 		
 		try:
-			response = await gpt_client.request(request_message)
+			response = await ask_quiz_question(callback.from_user.id, callback_data.topic, request_message)
 		except APIConnectionError as e:
 			log_exception(e, "API error in quiz_callbacks")
 			await callback.answer("Извините, произошла ошибка при загрузке вопроса. Попробуйте позже.", show_alert=True)
 			return
 			
-		await bot.send_photo(
-			chat_id=callback.from_user.id,
+		await send_answer(
+			bot,
+			callback.from_user.id,
+			response,
 			photo=photo,
-			caption=response,
 		)
+		await preferences.add(callback.from_user.id, QUIZ_QUESTION, response)
 		await state.set_state(Quiz.wait_for_answer)
 		await state.set_data({'messages': request_message, 'photo': photo, 'score': 0, 'callback': callback_data})
 	except Exception as e:
@@ -89,6 +126,7 @@ async def quiz_callbacks(callback: CallbackQuery, callback_data: QuizData, bot:
 
 
 @callback_router.callback_query(Quiz.wait_press_button, QuizData.filter(F.button == 'next_question'))
+@flags.throttling('gpt')
 async def quiz_next_question(callback: CallbackQuery, state: FSMContext) -> None:
 	try:
 		await callback.answer()
@@ -96,25 +134,26 @@ async def quiz_next_question(callback: CallbackQuery, state: FSMContext) -> None
 		
 		data = cast(QuizStateData, await state.get_data())
 		messages = cast(GPTMessage, data['messages'])
+		callback_data = cast(QuizData, data['callback'])
 		messages.update(GPTRole.USER, 'quiz_more')
 		
 		try:
-			response = await gpt_client.request(messages)
+			response = await ask_quiz_question(callback.from_user.id, callback_data.topic, messages)
 		except APIConnectionError as e:
 			log_exception(e, "API error in quiz_next_question")
 			await callback.answer("Извините, произошла ошибка при загрузке следующего вопроса. Попробуйте позже.", show_alert=True)
 			return
 			
-		messages.update(GPTRole.ASSISTANT, response)
-		photo = cast(FSInputFile, data['photo'])
-		callback_data = cast(QuizData, data['callback'])
+		photo = data['photo']
 		
-		await callback.bot.send_photo(
-			chat_id=callback.from_user.id,
+		await send_answer(
+			callback.bot,
+			callback.from_user.id,
+			response,
 			photo=cast(InputFileUnion, photo),
-			caption=response,
 			parse_mode=None,
 		)
+		await preferences.add(callback.from_user.id, QUIZ_QUESTION, response)
 		await callback.answer(
 			text=f'Продолжаем тему {callback_data.topic_name}'
 		)
@@ -171,13 +210,107 @@ async def translator_direction_callback(callback: CallbackQuery, callback_data:
 		await callback.answer("Произошла ошибка. Попробуйте еще раз.", show_alert=True)
 
 
-def get_media_photo() -> Optional[FSInputFile]:
-	"""Вспомогательная функция для получения фотографии в виде FSInputFile"""
-	resource = Resource('media')
-	photo = resource.photo
-	if photo and isinstance(photo, FSInputFile):
-		return photo
-	return None
+async def request_media_recommendation(gpt_message: GPTMessage) -> Dict[str, str]:
+	"""
+	Запрашивает рекомендацию в структурированном виде и разбирает ответ.
+	
+	Повторный уточняющий запрос отправляется только если ответ
+	не удалось разобрать. Неразобранные ответы учитываются в метриках
+	media.wasted / media.requests.
+	
+	Args:
+		gpt_message (GPTMessage): Диалог с запросом рекомендации
+		
+	Returns:
+		Dict[str, str]: Рекомендация с ключами 'title' и 'desc'
+		
+	Raises:
+		APIConnectionError: При сбое запроса к API
+	"""
+	response_format = media_response_format(gpt_client.router.resolve(gpt_message.prompt_name).model)
+	# Неразбираемый ответ не попадает в кэш, иначе он вызывал бы уточняющий запрос при каждой выдаче
+	response = await gpt_client.request(
+		gpt_message,
+		response_format=response_format,
+		accept=lambda text: parse_media_response(text) is not None,
+	)
+	metrics.inc('media.requests')
+	rec = parse_media_response(response)
+	if rec is None:
+		metrics.inc('media.wasted')
+		logger.warning(
+			"Media reply could not be parsed, re-asking (wasted rate %.1f%%)",
+			metrics.ratio('media.wasted', 'media.requests') * 100,
+		)
+		gpt_message.update(GPTRole.ASSISTANT, response)
+		gpt_message.update(GPTRole.USER, MEDIA_CORRECTION_PROMPT)
+		response = await gpt_client.request(gpt_message, response_format=response_format)
+		metrics.inc('media.requests')
+		rec = parse_media_response(response)
+		if rec is None:
+			metrics.inc('media.wasted')
+			return {'title': '', 'desc': response.strip()}
+	gpt_message.update(GPTRole.ASSISTANT, response)
+	return rec
+
+
+async def recommend_unseen(
+	user_id: int,
+	category: str,
+	genre: str,
+	disliked: List[str],
+) -> Tuple[Dict[str, str], GPTMessage]:
+	"""
+	Запрашивает рекомендацию, которую пользователь не отклонял раньше.
+	
+	Названия, отклоненные в текущей сессии, перечисляются в запросе.
+	Если GPT предложил название, отклоненное в прошлых сессиях
+	(см. PreferenceStore), оно добавляется в запрос и рекомендация
+	запрашивается заново.
+	
+	Args:
+		user_id (int): Идентификатор пользователя
+		category (str): Категория медиа
+		genre (str): Жанр
+		disliked (List[str]): Названия, отклоненные в текущей сессии
+		
+	Returns:
+		Tuple[Dict[str, str], GPTMessage]: Рекомендация и диалог с запросом
+		
+	Raises:
+		APIConnectionError: При сбое запроса к API
+	"""
+	excluded = list(disliked)
+	rejected: Optional[str] = None
+	
+	async def produce(attempt: int) -> Tuple[Dict[str, str], GPTMessage]:
+		nonlocal rejected
+		if rejected:
+			excluded.append(rejected)
+		user_query = f'Категория: {category}\nЖанр: {genre}'
+		if excluded:
+			user_query += f"\nНе предлагай: {', '.join(excluded)}"
+		gpt_message = GPTMessage('media')
+		gpt_message.update(GPTRole.USER, user_query)
+		rec = await request_media_recommendation(gpt_message)
+		rejected = rec['title']
+		return rec, gpt_message
+	
+	return await preferences.first_unseen(user_id, MEDIA_DISLIKE, produce, text_of=lambda result: result[0]['title'])
+
+
+def format_media_caption(rec: Dict[str, str]) -> str:
+	"""Формирует подпись к рекомендации с экранированием текста от GPT."""
+	title = escape_markdown(rec['title'])
+	desc = escape_markdown(rec['desc'])
+	if not title:
+		return desc
+	return f"*{title}*\n_{desc}_" if desc else f"*{title}*"
+
+
+def get_media_photo() -> Optional[Union[FSInputFile, str]]:
+	"""Вспомогательная функция для получения фотографии (файл или file_id)"""
+	return Resource('media').photo
 
 @callback_router.callback_query(MediaRecommendation.select_category, MediaData.filter(F.button == 'select_category'))
 async def media_select_category(callback: CallbackQuery, callback_data: MediaData, state: FSMContext):
@@ -211,6 +344,7 @@ async def media_select_category(callback: CallbackQuery, callback_data: MediaDat
 		await callback.answer("Произошла ошибка. Попробуйте еще раз.", show_alert=True)
 
 @callback_router.callback_query(MediaRecommendation.select_genre, MediaData.filter(F.button == 'select_genre'))
+@flags.throttling('gpt')
 async def media_select_genre(callback: CallbackQuery, callback_data: MediaData, state: FSMContext):
 	"""
 	Обрабатывает выбор жанра и отправляет запрос рекомендации.
@@ -220,23 +354,16 @@ async def media_select_genre(callback: CallbackQuery, callback_data: MediaData,
 		await state.set_state(MediaRecommendation.wait_for_recommendation)
 		data: Dict[str, Any] = await state.get_data()
 		
-		# Формируем запрос к ChatGPT
-		user_query = f'Категория: {callback_data.category}\nЖанр: {callback_data.genre}'
-		if data.get('disliked'):
-			user_query += f"\nНе предлагай: {', '.join(data['disliked'])}"
-			
-		gpt_message = GPTMessage('media')
-		gpt_message.update(GPTRole.USER, user_query)
-		
 		try:
-			response = await gpt_client.request(gpt_message)
+			rec, gpt_message = await recommend_unseen(
+				callback.from_user.id, callback_data.category, callback_data.genre, data.get('disliked', [])
+			)
 		except APIConnectionError as e:
 			log_exception(e, "API error in media_select_genre")
 			await callback.answer("Извините, произошла ошибка при получении рекомендации. Попробуйте позже.", show_alert=True)
 			return
 			
-		# Парсим ответ и сохраняем данные
-		rec = parse_media_response(response)
+		# Сохраняем данные
 		photo = get_media_photo()
 		if photo and callback.message:
 			state_data: MediaStateData = {
@@ -252,7 +379,7 @@ async def media_select_genre(callback: CallbackQuery, callback_data: MediaData,
 			# Отправляем рекомендацию
 			message = cast(Message, callback.message)
 			await message.delete()
-			caption = f"*{rec['title']}*\n_{rec['desc']}_"
+			caption = format_media_caption(rec)
 			
 			await message.answer_photo(
 				photo=cast(InputFileUnion, photo),
@@ -262,7 +389,7 @@ async def media_select_genre(callback: CallbackQuery, callback_data: MediaData,
 		elif callback.message:
 			message = cast(Message, callback.message)
 			await message.answer(
-				text=f"*{rec['title']}*\n_{rec['desc']}_",
+				text=format_media_caption(rec),
 				reply_markup=ikb_media_actions(callback_data.category, callback_data.genre)
 			)
 	except Exception as e:
@@ -270,6 +397,7 @@ async def media_select_genre(callback: CallbackQuery, callback_data: MediaData,
 		await callback.answer("Произошла ошибка. Попробуйте еще раз.", show_alert=True)
 
 @callback_router.callback_query(MediaRecommendation.wait_for_recommendation, MediaData.filter(F.button == 'dislike'))
+@flags.throttling('gpt')
 async def media_dislike(callback: CallbackQuery, callback_data: MediaData, state: FSMContext):
 	"""
 	Обрабатывает нажатие кнопки "Не нравится" и предлагает новую рекомендацию.
@@ -278,29 +406,24 @@ async def media_dislike(callback: CallbackQuery, callback_data: MediaData, state
 		await callback.answer('Генерирую новую рекомендацию...')
 		data = cast(MediaStateData, await state.get_data())
 		
-		# Добавляем текущую рекомендацию в список нежелательных
+		# Добавляем текущую рекомендацию в список нежелательных (и в постоянные предпочтения)
 		disliked = data['disliked']
 		last_rec = data['last_rec']
 		if last_rec.get('title'):
 			disliked.append(last_rec['title'])
+			await preferences.add(callback.from_user.id, MEDIA_DISLIKE, last_rec['title'])
 		
 		# Запрашиваем новую рекомендацию
-		user_query = f'Категория: {callback_data.category}\nЖанр: {callback_data.genre}'
-		if disliked:
-			user_query += f"\nНе предлагай: {', '.join(disliked)}"
-			
-		gpt_message = GPTMessage('media')
-		gpt_message.update(GPTRole.USER, user_query)
-		
 		try:
-			response = await gpt_client.request(gpt_message)
+			rec, gpt_message = await recommend_unseen(
+				callback.from_user.id, callback_data.category, callback_data.genre, disliked
+			)
 		except APIConnectionError as e:
 			log_exception(e, "API error in media_dislike")
 			await callback.answer("Извините, произошла ошибка при получении новой рекомендации. Попробуйте позже.", show_alert=True)
 			return
 			
 		# Обновляем данные и отправляем новую рекомендацию
-		rec = parse_media_response(response)
 		photo = get_media_photo()
 		if photo and callback.message:
 			state_data: MediaStateData = {
@@ -315,7 +438,7 @@ async def media_dislike(callback: CallbackQuery, callback_data: MediaData, state
 			
 			message = cast(Message, callback.message)
 			await message.delete()
-			caption = f"*{rec['title']}*\n_{rec['desc']}_"
+			caption = format_media_caption(rec)
 			
 			await message.answer_photo(
 				photo=cast(InputFileUnion, photo),
@@ -325,7 +448,7 @@ async def media_dislike(callback: CallbackQuery, callback_data: MediaData, state
 		elif callback.message:
 			message = cast(Message, callback.message)
 			await message.answer(
-				text=f"*{rec['title']}*\n_{rec['desc']}_",
+				text=format_media_caption(rec),
 				reply_markup=ikb_media_actions(callback_data.category, callback_data.genre)
 			)
 	except Exception as e:
@@ -347,20 +470,3 @@ async def media_finish(callback: CallbackQuery, state: FSMContext):
 	except Exception as e:
 		log_exception(e, "Error in media_finish")
 		await callback.answer("Произошла ошибка. Попробуйте еще раз.", show_alert=True)
-
-def parse_media_response(response: str) -> Dict[str, str]:
-	"""
-	Парсит ответ от ChatGPT в формате:
-	Название: ...
-	Описание: ...
-	"""
-	lines = response.strip().split('\n')
-	result: Dict[str, str] = {'title': '', 'desc': ''}
-	
-	for line in lines:
-		if line.startswith('Название:'):
-			result['title'] = line.replace('Название:', '').strip()
-		elif line.startswith('Описание:'):
-			result['desc'] = line.replace('Описание:', '').strip()
-			
-	return result
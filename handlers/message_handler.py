@@ -23,12 +23,12 @@
 - exception: Обработка исключений
 """
 
-from aiogram import Router, F
+from aiogram import Router, F, flags
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 import logging
 
-from models import gpt_client, GPTMessage, QuizData
+from models import gpt_client, summarizer, GPTMessage, QuizData
 from common import Resource, GPTRole, MESSAGES
 from exception import APIConnectionError, log_exception
 
@@ -36,7 +36,7 @@ from .state_handlers import CelebrityTalk, ChatGPTRequests, Quiz, Translator
 
 from keyboards import kb_end_talk, ikb_quiz_next, kb_end_gpt
 from commands import cmd_start
-from utils import bot_thinking
+from utils import bot_thinking, send_answer
 
 logger = logging.getLogger(__name__)
 messages_router = Router()
@@ -60,6 +60,7 @@ async def end_talk_handler(message: Message, state: FSMContext):
 
 
 @messages_router.message(CelebrityTalk.wait_for_answer)
+@flags.throttling('gpt')
 async def talk_handler(message: Message, state: FSMContext):
 	"""
 	Обрабатывает сообщения пользователя во время разговора со знаменитостью.
@@ -80,13 +81,16 @@ async def talk_handler(message: Message, state: FSMContext):
 			await message.answer("Извините, произошла ошибка при обработке вашего запроса. Попробуйте позже.")
 			return
 			
-		await message.answer_photo(
+		await send_answer(
+			message.bot,
+			message.chat.id,
+			response,
 			photo=data['photo'],
-			caption=response,
 			reply_markup=kb_end_talk(),
 		)
 		data['messages'].update(GPTRole.ASSISTANT, response)
 		await state.update_data(data)
+		summarizer.schedule(data['messages'])
 	except Exception as e:
 		log_exception(e, "Error in talk_handler")
 		await message.answer("Произошла ошибка при обработке вашего сообщения. Попробуйте еще раз.")
@@ -110,6 +114,7 @@ async def end_gpt_handler(message: Message, state: FSMContext):
 
 
 @messages_router.message(ChatGPTRequests.wait_for_request)
+@flags.throttling('gpt')
 async def wait_for_gpt_handler(message: Message, state: FSMContext):
 	"""
 	Обрабатывает сообщения, ожидая ответ от ChatGPT. Устанавливает состояние ожидания и обновляет данные состояния.
@@ -141,17 +146,21 @@ async def wait_for_gpt_handler(message: Message, state: FSMContext):
 		data['messages'].update(GPTRole.ASSISTANT, response)
 		
 		await state.update_data(data)
-		await message.answer_photo(
+		await send_answer(
+			message.bot,
+			message.chat.id,
+			response,
 			photo=photo,
-			caption=response,
 			reply_markup=kb_end_gpt(),
 		)
+		summarizer.schedule(data['messages'])
 	except Exception as e:
 		log_exception(e, "Error in wait_for_gpt_handler")
 		await message.answer("Произошла ошибка при обработке вашего сообщения. Попробуйте еще раз.")
 
 
 @messages_router.message(Quiz.wait_for_answer)
+@flags.throttling('gpt')
 async def quiz_answer(message: Message, state: FSMContext):
 	"""
 	Обрабатывает ответ на вопрос викторины, обновляет состояние и отправляет пользователю результат.
@@ -180,9 +189,11 @@ async def quiz_answer(message: Message, state: FSMContext):
 		data['messages'].update(GPTRole.ASSISTANT, response)
 		await state.update_data(data)
 		
-		await message.answer_photo(
+		await send_answer(
+			message.bot,
+			message.chat.id,
+			f"Ваш счет: {data['score']}\n{response}",
 			photo=data['photo'],
-			caption=f'Ваш счет: {data['score']}\n{response}',
 			reply_markup=ikb_quiz_next(data['callback']),
 			parse_mode=None,
 		)
@@ -194,6 +205,7 @@ async def quiz_answer(message: Message, state: FSMContext):
 
 
 @messages_router.message(Translator.wait_for_text)
+@flags.throttling('gpt')
 async def translator_text_handler(message: Message, state: FSMContext):
 	"""
 	Обрабатывает текст для перевода и отправляет результат пользователю.
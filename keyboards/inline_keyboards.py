@@ -17,7 +17,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from common import MediaCategory, MediaGenre, MEDIA_CATEGORY_NAMES, MEDIA_GENRE_NAMES, MEDIA_GENRES_BY_CATEGORY
-from models import Button, Buttons, MEDIA_CATEGORIES, MEDIA_GENRES, CelebrityData, QuizData, TranslatorData, MediaData
+from models import Button, Buttons, celebrity_buttons, MEDIA_CATEGORIES, MEDIA_GENRES, CelebrityData, QuizData, TranslatorData, MediaData
 
 
 def ikb_celebrity() -> InlineKeyboardMarkup:
@@ -25,14 +25,13 @@ def ikb_celebrity() -> InlineKeyboardMarkup:
 	Создает клавиатуру для выбора знаменитости.
 	
 	Создает inline клавиатуру с кнопками для всех доступных знаменитостей,
-	загружая их из файлов промптов.
+	загруженных из файлов промптов при первом вызове.
 	
 	Returns:
 		InlineKeyboardMarkup: Клавиатура с кнопками знаменитостей
 	"""
 	keyboard = InlineKeyboardBuilder()
-	buttons = Buttons()
-	for button in buttons:
+	for button in celebrity_buttons():
 		keyboard.button(
 			text=button.name if button.name is not None else '',
 			callback_data=CelebrityData(
@@ -7,36 +7,49 @@
 
 Основные функции:
 - get_bot_token(): Получение токена бота из конфигурации
+- create_bot(): Создание экземпляра бота с настройками по умолчанию
+- create_dispatcher(): Создание диспетчера с подключенными роутерами
+- preupload_images(): Предзагрузка изображений до начала поллинга
 - start_bot(): Запуск и настройка бота с обработчиками
+- run_preupload(): Только предзагрузка изображений (python main.py preupload)
 - main(): Главная функция приложения
 
 Зависимости:
 - aiogram: Фреймворк для создания Telegram ботов
 - asyncio: Асинхронное программирование
 - logging: Система логирования
+- common: Логирование через очередь и фоновый поток
 - config: Конфигурация приложения
 - exception: Пользовательские исключения
 - handlers: Обработчики сообщений и команд
+- middlewares: Middleware бота и диспетчера
+- storage: Хранилище состояния сессий
+- diagnostics: Мониторинг задержки цикла событий
 """
 
 import asyncio
 import logging
+import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.exceptions import TelegramAPIError
 
 from handlers import routers
+from models import gpt_client, summarizer
+from middlewares import (
+    FileIdRecorder, InFlightTracker, LogContext, OutboundRateLimiter, UpdateDeduplicator, UserThrottle,
+    background_traffic,
+)
+from storage import SessionStorage, file_ids, preferences, quiz_bank
+from diagnostics import loop_monitor
+from common import setup_logging
 from config import Config
 from exception import ConfigurationError, log_exception
 
-# Настройка логирования
-logging_config = Config.get_logging_config()
-logging.basicConfig(
-    level=getattr(logging, logging_config['level']),
-    format=logging_config['format']
-)
 logger = logging.getLogger(__name__)
 
 
@@ -55,6 +68,116 @@ def get_bot_token() -> str:
     return Config.BOT_TOKEN
 
 
+def create_bot(token: str) -> Bot:
+    """
+    Создает экземпляр бота с настройками по умолчанию.
+    
+    Если в конфигурации задан TELEGRAM_API_URL, бот обращается
+    к указанному серверу Bot API вместо api.telegram.org.
+    Исходящие отправки проходят через OutboundRateLimiter, file_id
+    загруженных изображений запоминает FileIdRecorder.
+    
+    Args:
+        token (str): Токен бота
+        
+    Returns:
+        Bot: Настроенный экземпляр бота
+    """
+    session = None
+    if Config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(Config.TELEGRAM_API_URL))
+    bot = Bot(
+        token=token,
+        session=session,
+        default=DefaultBotProperties(
+            parse_mode=ParseMode.MARKDOWN,
+        )
+    )
+    bot.session.middleware(OutboundRateLimiter())
+    bot.session.middleware(FileIdRecorder(file_ids))
+    return bot
+
+
+async def preupload_images(bot: Bot) -> None:
+    """
+    Загружает изображения в служебный чат до начала поллинга.
+    
+    Выполняется, только если задан SERVICE_CHAT_ID; изображения,
+    содержимое которых уже загружалось, пропускаются. Ошибка
+    предзагрузки не мешает запуску: изображения загрузятся при
+    первой отправке пользователю.
+    
+    Args:
+        bot (Bot): Экземпляр бота
+    """
+    if not Config.SERVICE_CHAT_ID:
+        return
+    try:
+        with background_traffic():
+            await file_ids.preupload(bot)
+    except Exception as e:
+        log_exception(e, "Image pre-upload failed")
+
+
+def create_dispatcher() -> Dispatcher:
+    """
+    Создает диспетчер и подключает все роутеры.
+    
+    Повторно доставленные обновления отбрасываются UpdateDeduplicator
+    до роутеров, частота сообщений и нажатий одного пользователя
+    ограничивается UserThrottle, поля логов (чат, обработчик, режим)
+    заполняет LogContext. Состояние хранится в SessionStorage; фоновая очистка неактивных
+    сессий запускается и останавливается вместе с диспетчером.
+    При старте восстанавливается снимок сессий, открывается база
+    предпочтений пользователей, загружается банк вопросов викторины
+    и file_id изображений, создается клиент OpenAI, прогреваются
+    соединения и предзагружаются изображения (см. preupload_images).
+    
+    Остановка выполняется в следующем порядке:
+    1. ожидание начатых обработчиков (InFlightTracker.drain);
+    2. завершение фонового сжатия диалогов;
+    3. сохранение снимка сессий, закрытие базы предпочтений, банка вопросов
+       и file_id изображений;
+    4. закрытие пула соединений с OpenAI и хранилища дубликатов.
+    Сессию бота aiogram закрывает после обработчиков shutdown.
+    
+    Returns:
+        Dispatcher: Диспетчер с подключенными роутерами
+    """
+    storage = SessionStorage()
+    in_flight = InFlightTracker()
+    dedup = UpdateDeduplicator()
+    dp = Dispatcher(storage=storage)
+    # Обновление отмечается увиденным, только если InFlightTracker его принял:
+    # отклоненное при остановке обновление обработается после перезапуска
+    dp.update.outer_middleware(in_flight)
+    dp.update.outer_middleware(dedup)
+    throttle = UserThrottle()
+    dp.message.middleware(throttle)
+    dp.callback_query.middleware(throttle)
+    log_context = LogContext()
+    dp.message.middleware(log_context)
+    dp.callback_query.middleware(log_context)
+    dp.startup.register(loop_monitor.start)
+    dp.startup.register(storage.start)
+    dp.startup.register(preferences.start)
+    dp.startup.register(quiz_bank.start)
+    dp.startup.register(file_ids.start)
+    dp.startup.register(gpt_client.start)
+    dp.startup.register(preupload_images)
+    dp.shutdown.register(in_flight.drain)
+    dp.shutdown.register(summarizer.close)
+    dp.shutdown.register(storage.close)
+    dp.shutdown.register(preferences.close)
+    dp.shutdown.register(quiz_bank.close)
+    dp.shutdown.register(file_ids.close)
+    dp.shutdown.register(gpt_client.close)
+    dp.shutdown.register(dedup.close)
+    dp.shutdown.register(loop_monitor.close)
+    dp.include_routers(*routers)
+    return dp
+
+
 async def start_bot():
     """
     Запуск и настройка Telegram бота.
@@ -62,6 +185,10 @@ async def start_bot():
     Инициализирует бота с настройками по умолчанию, создает диспетчер,
     подключает все роутеры и запускает поллинг для получения обновлений.
     
+    По SIGTERM или SIGINT aiogram прекращает поллинг и вызывает
+    обработчики shutdown (см. create_dispatcher), после чего
+    закрывает сессию бота.
+    
     Raises:
         ConfigurationError: При ошибках конфигурации
         TelegramAPIError: При ошибках Telegram API
@@ -71,17 +198,11 @@ async def start_bot():
         # Валидация конфигурации
         Config.validate()
         
-        bot = Bot(
-            token=get_bot_token(),
-            default=DefaultBotProperties(
-                parse_mode=ParseMode.MARKDOWN,
-            )
-        )
-        dp = Dispatcher()
-        dp.include_routers(*routers)
+        bot = create_bot(get_bot_token())
+        dp = create_dispatcher()
         
         logger.info("Starting bot...")
-        await dp.start_polling(bot)
+        await dp.start_polling(bot, handle_signals=True, close_bot_session=True)
     except ConfigurationError as e:
         log_exception(e, "Configuration error")
         raise
@@ -93,14 +214,44 @@ async def start_bot():
         raise
 
 
+async def run_preupload() -> None:
+    """
+    Загружает изображения в служебный чат без запуска поллинга.
+    
+    Используется перед развертыванием (python main.py preupload),
+    чтобы запуск бота не ждал загрузки.
+    
+    Raises:
+        ConfigurationError: Если не задан токен бота или SERVICE_CHAT_ID
+    """
+    if not Config.SERVICE_CHAT_ID:
+        raise ConfigurationError("SERVICE_CHAT_ID environment variable is not set")
+    bot = create_bot(get_bot_token())
+    try:
+        await file_ids.start(bot)
+        with background_traffic():
+            await file_ids.preupload(bot)
+    finally:
+        await file_ids.close()
+        await bot.session.close()
+
+
 def main():
     """
     Главная функция приложения.
     
     Запускает бота в асинхронном режиме с обработкой различных типов ошибок
     и корректным завершением работы при получении сигнала прерывания.
+    Логи пишутся через очередь фоновым потоком (см. common.logs), который
+    при завершении дописывает оставшиеся записи.
+    Команда preupload (python main.py preupload) только загружает
+    изображения в служебный чат.
     """
+    log_listener = setup_logging()
     try:
+        if sys.argv[1:] == ['preupload']:
+            asyncio.run(run_preupload())
+            return
         asyncio.run(start_bot())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
@@ -112,6 +263,7 @@ def main():
         log_exception(e, "Unexpected error")
     finally:
         logger.info("Bot stopped")
+        log_listener.stop()
 
 
 if __name__ == '__main__':
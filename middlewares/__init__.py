@@ -0,0 +1,41 @@
+"""
+Пакет middleware для Telegram бота.
+
+Содержит промежуточные обработчики, которые подключаются к сессии бота
+или к диспетчеру в main.py.
+
+Содержит:
+- UpdateDeduplicator: Отбрасывание повторно доставленных обновлений
+- MemorySeenStore, SqliteSeenStore: Хранилища увиденных идентификаторов
+- UserThrottle: Ограничение частоты запросов одного пользователя
+- InFlightTracker: Учет обрабатываемых обновлений для корректной остановки
+- OutboundRateLimiter: Ограничение скорости исходящих отправок в Telegram
+- FileIdRecorder: Запоминание file_id загруженных изображений
+- LogContext: Поля логов (чат, обработчик, режим) на время обработчика
+- TokenBucket: Корзина токенов для сглаживания потока
+- background_traffic: Контекст для пометки фоновых отправок
+
+Экспортирует:
+- Все middleware для подключения в main.py
+"""
+
+from .dedup import MemorySeenStore, SqliteSeenStore, UpdateDeduplicator
+from .inflight import InFlightTracker
+from .throttling import THROTTLE_FLAG, UserThrottle
+from .rate_limit import OutboundRateLimiter, TokenBucket, background_traffic
+from .file_ids import FileIdRecorder
+from .log_context import LogContext
+
+__all__ = [
+	'UpdateDeduplicator',
+	'MemorySeenStore',
+	'SqliteSeenStore',
+	'InFlightTracker',
+	'UserThrottle',
+	'THROTTLE_FLAG',
+	'OutboundRateLimiter',
+	'TokenBucket',
+	'background_traffic',
+	'FileIdRecorder',
+	'LogContext',
+]
@@ -0,0 +1,234 @@
+"""
+Модуль отбрасывания повторно доставленных обновлений Telegram.
+
+Содержит:
+- MemorySeenStore: Ограниченное множество идентификаторов с окном по времени
+- SqliteSeenStore: Общее для нескольких процессов множество в файле SQLite
+- UpdateDeduplicator: Внешний middleware диспетчера, отбрасывающий дубликаты
+
+Telegram может повторно доставить обновление с тем же update_id (после
+перезапуска, сетевого сбоя или повтора webhook), а нажатие кнопки - с тем
+же идентификатором callback query. Дубликаты отбрасываются до роутеров,
+поэтому запросы к ChatGPT и ответы пользователю не повторяются.
+
+Обновление помечается увиденным при получении (не более одной обработки):
+если обработчик завершился ошибкой, повтор того же обновления тоже
+будет отброшен. Подключайте middleware после InFlightTracker, чтобы
+обновления, отклоненные при остановке, не помечались увиденными.
+
+По умолчанию множество хранится в файле Config.DEDUP_DB_PATH и переживает
+перезапуск: aiogram подтверждает последнюю пачку getUpdates только
+следующим запросом, и после перезапуска Telegram доставляет ее повторно.
+Пустой путь - множество только в памяти процесса.
+
+Зависимости:
+- aiogram: Базовый middleware и типы обновлений
+- sqlite3: Общее хранилище (стандартная библиотека)
+- config: Окно, размер множества и путь к базе
+- common: Метрики
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from common import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySeenStore:
+	"""
+	Множество идентификаторов в памяти с ограничением по времени и размеру.
+
+	Записи хранятся в порядке добавления, поэтому устаревшие удаляются
+	с начала за O(1) на запись.
+
+	Attributes:
+		ttl (float): Время хранения идентификатора в секундах
+		max_size (int): Максимальное количество идентификаторов
+	"""
+
+	def __init__(self, ttl: Optional[float] = None, max_size: Optional[int] = None):
+		"""
+		Инициализирует пустое множество. Не заданные параметры берутся из Config.
+
+		Args:
+			ttl (Optional[float]): Время хранения в секундах
+			max_size (Optional[int]): Максимальное количество идентификаторов
+		"""
+		self.ttl = Config.DEDUP_TTL if ttl is None else ttl
+		self.max_size = max_size or Config.DEDUP_MAX_ENTRIES
+		self._seen: 'OrderedDict[str, float]' = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._seen)
+
+	async def add(self, keys: List[str]) -> bool:
+		"""
+		Добавляет идентификаторы, если ни один из них еще не встречался.
+
+		Args:
+			keys (List[str]): Идентификаторы обновления
+
+		Returns:
+			bool: True, если обновление новое
+		"""
+		now = time.monotonic()
+		self._expire(now)
+		if any(key in self._seen for key in keys):
+			return False
+		for key in keys:
+			self._seen[key] = now + self.ttl
+		while len(self._seen) > self.max_size:
+			self._seen.popitem(last=False)
+		return True
+
+	def _expire(self, now: float) -> None:
+		"""Удаляет устаревшие идентификаторы с начала очереди."""
+		while self._seen:
+			key, expires = next(iter(self._seen.items()))
+			if expires > now:
+				break
+			del self._seen[key]
+
+	async def close(self) -> None:
+		"""Ничего не освобождает (для совместимости с SqliteSeenStore)."""
+
+
+class SqliteSeenStore:
+	"""
+	Множество идентификаторов в файле SQLite, общее для процессов на одной машине.
+
+	Запросы выполняются в отдельном потоке. Устаревшие записи удаляются
+	периодически, а до удаления считаются отсутствующими.
+
+	Attributes:
+		path (str): Путь к файлу базы
+		ttl (float): Время хранения идентификатора в секундах
+	"""
+
+	PURGE_EVERY = 1000
+
+	def __init__(self, path: str, ttl: Optional[float] = None):
+		"""
+		Открывает (или создает) базу.
+
+		Args:
+			path (str): Путь к файлу базы
+			ttl (Optional[float]): Время хранения в секундах (по умолчанию Config.DEDUP_TTL)
+		"""
+		self.path = path
+		self.ttl = Config.DEDUP_TTL if ttl is None else ttl
+		self._lock = threading.Lock()
+		self._inserts = 0
+		self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self._db.execute('PRAGMA journal_mode=WAL')
+		self._db.execute('PRAGMA busy_timeout=5000')
+		self._db.execute('CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, expires REAL NOT NULL)')
+
+	async def add(self, keys: List[str]) -> bool:
+		"""
+		Добавляет идентификаторы, если ни один из них еще не встречался.
+
+		Args:
+			keys (List[str]): Идентификаторы обновления
+
+		Returns:
+			bool: True, если обновление новое
+		"""
+		return await asyncio.to_thread(self._add, keys)
+
+	def _add(self, keys: List[str]) -> bool:
+		"""Выполняет проверку и вставку в одной транзакции."""
+		# Время на стене, а не monotonic: база общая для процессов и переживает перезапуск
+		now = time.time()
+		with self._lock:
+			self._db.execute('BEGIN IMMEDIATE')
+			try:
+				placeholders = ','.join('?' * len(keys))
+				seen = self._db.execute(
+					f'SELECT 1 FROM seen WHERE key IN ({placeholders}) AND expires > ? LIMIT 1',
+					(*keys, now),
+				).fetchone()
+				if seen is None:
+					self._db.executemany(
+						'INSERT OR REPLACE INTO seen (key, expires) VALUES (?, ?)',
+						[(key, now + self.ttl) for key in keys],
+					)
+					self._inserts += 1
+					if self._inserts % self.PURGE_EVERY == 0:
+						self._db.execute('DELETE FROM seen WHERE expires <= ?', (now,))
+				self._db.execute('COMMIT')
+			except BaseException:
+				self._db.execute('ROLLBACK')
+				raise
+		return seen is None
+
+	async def close(self) -> None:
+		"""Закрывает соединение с базой."""
+		with self._lock:
+			self._db.close()
+
+
+SeenStore = Union[MemorySeenStore, SqliteSeenStore]
+
+
+class UpdateDeduplicator(BaseMiddleware):
+	"""
+	Middleware, отбрасывающий повторно доставленные обновления.
+
+	Ключи: update_id (вместе с идентификатором бота) и, для нажатий
+	кнопок, идентификатор callback query.
+
+	Attributes:
+		store (SeenStore): Множество увиденных идентификаторов
+	"""
+
+	def __init__(self, store: Optional[SeenStore] = None):
+		"""
+		Инициализирует middleware.
+
+		Args:
+			store (Optional[SeenStore]): Хранилище идентификаторов
+				(по умолчанию SQLite в Config.DEDUP_DB_PATH, при пустом пути - память)
+		"""
+		if store is None:
+			store = SqliteSeenStore(Config.DEDUP_DB_PATH) if Config.DEDUP_DB_PATH else MemorySeenStore()
+		self.store = store
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: Dict[str, Any],
+	) -> Any:
+		if not isinstance(event, Update):
+			return await handler(event, data)
+		bot = data.get('bot')
+		keys = [f'u:{bot.id if bot else 0}:{event.update_id}']
+		if event.callback_query is not None:
+			keys.append(f'c:{event.callback_query.id}')
+		try:
+			is_new = await self.store.add(keys)
+		except Exception as e:
+			# Сбой хранилища не должен останавливать обработку
+			logger.warning("Update deduplication failed: %s", e)
+			is_new = True
+		if not is_new:
+			metrics.inc('updates.duplicate')
+			logger.info("Dropped duplicate update %s", event.update_id)
+			return None
+		return await handler(event, data)
+
+	async def close(self) -> None:
+		"""Закрывает хранилище (вызывается при остановке диспетчера)."""
+		await self.store.close()
@@ -0,0 +1,85 @@
+"""
+Модуль запоминания file_id загруженных изображений.
+
+Содержит:
+- FileIdRecorder: Middleware сессии бота, сохраняющий file_id после загрузки
+
+После каждой загрузки изображения ресурсов (sendPhoto, editMessageMedia)
+file_id из ответа сохраняется в FileIdStore по хешу содержимого файла,
+и следующие отправки того же изображения идут по file_id без загрузки.
+Если Telegram отклоняет сохраненный file_id, он удаляется, и следующая
+отправка снова загружает файл.
+
+Зависимости:
+- aiogram: Middleware сессии и методы Bot API
+- common: Пути ресурсов и хеш содержимого
+- storage: Хранилище file_id
+"""
+
+import os
+from typing import Any, Optional, Union
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageMedia, Response, SendPhoto, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import FSInputFile, InputMediaPhoto, Message
+
+from common import ResourcePath
+from common.assets import file_digest
+from storage import FileIdStore
+
+_IMAGES_DIR = os.path.abspath(ResourcePath.IMAGES.value)
+
+
+class FileIdRecorder(BaseRequestMiddleware):
+	"""
+	Middleware сессии бота для запоминания file_id изображений ресурсов.
+
+	Attributes:
+		store (FileIdStore): Хранилище file_id
+	"""
+
+	def __init__(self, store: FileIdStore):
+		"""
+		Инициализирует middleware.
+
+		Args:
+			store (FileIdStore): Хранилище file_id
+		"""
+		self.store = store
+
+	@staticmethod
+	def _photo(method: TelegramMethod[Any]) -> Optional[Union[FSInputFile, str]]:
+		"""Возвращает изображение метода отправки фото или None для остальных методов."""
+		if isinstance(method, SendPhoto):
+			return method.photo
+		if isinstance(method, EditMessageMedia) and isinstance(method.media, InputMediaPhoto):
+			return method.media.media
+		return None
+
+	async def __call__(
+		self,
+		make_request: NextRequestMiddlewareType[TelegramType],
+		bot: Any,
+		method: TelegramMethod[TelegramType],
+	) -> Response[TelegramType]:
+		photo = self._photo(method)
+		if photo is None:
+			return await make_request(bot, method)
+
+		try:
+			result = await make_request(bot, method)
+		except TelegramBadRequest as e:
+			if isinstance(photo, str) and 'file identifier' in str(e):
+				await self.store.forget(photo)
+			raise
+
+		if (
+			isinstance(photo, FSInputFile)
+			and os.path.dirname(os.path.abspath(photo.path)).startswith(_IMAGES_DIR)
+			and isinstance(result, Message)
+			and result.photo
+		):
+			await self.store.remember(file_digest(photo.path), result.photo[-1].file_id)
+		return result
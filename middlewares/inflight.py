@@ -0,0 +1,98 @@
+"""
+Модуль учета обрабатываемых обновлений для корректной остановки бота.
+
+Содержит:
+- InFlightTracker: Внешний middleware диспетчера, считающий незавершенные обработчики
+
+При остановке (SIGTERM/SIGINT) aiogram прекращает поллинг, но уже
+запущенные обработчики продолжают работу. InFlightTracker.drain()
+регистрируется первым обработчиком shutdown: он перестает пропускать
+новые обновления и ждет завершения начатых (ответы уже оплаченных
+запросов к ChatGPT доставляются пользователям), но не дольше
+Config.SHUTDOWN_DRAIN_TIMEOUT секунд.
+
+Зависимости:
+- aiogram: Базовый middleware
+- config: Время ожидания обработчиков
+- common: Метрики
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from common import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightTracker(BaseMiddleware):
+	"""
+	Middleware, отслеживающий обновления в обработке.
+
+	Attributes:
+		accepting (bool): Пропускаются ли новые обновления
+	"""
+
+	def __init__(self):
+		"""Инициализирует счетчик обработчиков."""
+		self.accepting = True
+		self._active = 0
+		self._idle = asyncio.Event()
+		self._idle.set()
+
+	@property
+	def active(self) -> int:
+		"""Возвращает количество обновлений в обработке."""
+		return self._active
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: Dict[str, Any],
+	) -> Any:
+		if not self.accepting:
+			metrics.inc('updates.rejected_on_shutdown')
+			return None
+		self._active += 1
+		self._idle.clear()
+		metrics.set('updates.in_flight', self._active)
+		try:
+			return await handler(event, data)
+		finally:
+			self._active -= 1
+			metrics.set('updates.in_flight', self._active)
+			if not self._active:
+				self._idle.set()
+
+	async def drain(self, timeout: Optional[float] = None) -> bool:
+		"""
+		Прекращает прием обновлений и ждет завершения начатых обработчиков.
+
+		Args:
+			timeout (Optional[float]): Время ожидания в секундах
+				(по умолчанию Config.SHUTDOWN_DRAIN_TIMEOUT)
+
+		Returns:
+			bool: True, если все обработчики завершились вовремя
+		"""
+		self.accepting = False
+		if not self._active:
+			return True
+		timeout = Config.SHUTDOWN_DRAIN_TIMEOUT if timeout is None else timeout
+		logger.info("Waiting up to %.0f s for %d update(s) in progress", timeout, self._active)
+		started = time.monotonic()
+		try:
+			await asyncio.wait_for(self._idle.wait(), timeout)
+		except asyncio.TimeoutError:
+			logger.warning("Shutdown drain timed out, %d update(s) abandoned", self._active)
+			metrics.inc('updates.abandoned_on_shutdown', self._active)
+			return False
+		logger.info("All updates finished in %.2f s", time.monotonic() - started)
+		return True
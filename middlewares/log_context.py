@@ -0,0 +1,55 @@
+"""
+Модуль контекста логирования для обработчиков.
+
+Содержит:
+- LogContext: Middleware, заполняющий поля логов на время обработчика
+
+Записи логов, сделанные внутри обработчика (и в запущенных им задачах),
+получают поля update_id, chat_id, user_id, handler (имя функции
+обработчика) и mode (группа состояний FSM). Поля пишет JsonFormatter
+(см. common.logs).
+
+Зависимости:
+- aiogram: Middleware диспетчера
+- common: Контекст логирования
+"""
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from common import log_context
+
+
+class LogContext(BaseMiddleware):
+	"""
+	Внутренний middleware, задающий log_context на время обработчика.
+
+	Подключается к dp.message и dp.callback_query, чтобы знать
+	выбранный обработчик и состояние пользователя.
+	"""
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: Dict[str, Any],
+	) -> Any:
+		update = data.get('event_update')
+		chat = data.get('event_chat')
+		user = data.get('event_from_user')
+		handler_object = data.get('handler')
+		raw_state = data.get('raw_state')
+		fields = {
+			'update_id': update.update_id if update else None,
+			'chat_id': chat.id if chat else None,
+			'user_id': user.id if user else None,
+			'handler': getattr(handler_object.callback, '__name__', None) if handler_object else None,
+			'mode': raw_state.split(':', 1)[0] if raw_state else None,
+		}
+		token = log_context.set({name: value for name, value in fields.items() if value is not None})
+		try:
+			return await handler(event, data)
+		finally:
+			log_context.reset(token)
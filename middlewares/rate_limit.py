@@ -0,0 +1,270 @@
+"""
+Модуль ограничения скорости исходящих запросов к Telegram Bot API.
+
+Содержит:
+- TokenBucket: Корзина токенов для сглаживания потока запросов
+- OutboundRateLimiter: Middleware сессии бота с глобальным и початовым лимитами
+- background_traffic: Контекст для пометки фоновых отправок
+
+Основные возможности:
+- Глобальный лимит отправок в секунду на весь бот (~30 msg/s у Telegram)
+- Лимит на один чат (1 msg/s для личных чатов, 20 msg/min для групп)
+- Автоматический повтор после TelegramRetryAfter с блокировкой чата
+- Приоритет интерактивных ответов над фоновыми рассылками
+
+Зависимости:
+- aiogram: Middleware сессии и исключения Bot API
+- config: Параметры лимитов
+- common: Метрики и число повторов
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, SendChatAction, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from common import LIMITS, metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_traffic_priority: ContextVar[int] = ContextVar('traffic_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def background_traffic() -> Iterator[None]:
+	"""
+	Помечает отправки внутри блока как фоновые.
+
+	Фоновые отправки пропускают вперед интерактивные ответы пользователям.
+
+	Пример использования:
+		with background_traffic():
+			await bot.send_photo(...)
+	"""
+	token = _traffic_priority.set(BACKGROUND)
+	try:
+		yield
+	finally:
+		_traffic_priority.reset(token)
+
+
+class TokenBucket:
+	"""
+	Корзина токенов.
+
+	Токены пополняются со скоростью rate в секунду до capacity.
+	Каждая отправка забирает один токен.
+
+	Attributes:
+		rate (float): Скорость пополнения в токенах в секунду
+		capacity (float): Максимальное количество токенов (размер всплеска)
+	"""
+
+	__slots__ = ('rate', 'capacity', '_tokens', '_updated', '_blocked_until')
+
+	def __init__(self, rate: float, capacity: float):
+		"""
+		Инициализирует полную корзину.
+
+		Args:
+			rate (float): Скорость пополнения в токенах в секунду
+			capacity (float): Максимальное количество токенов
+		"""
+		self.rate = rate
+		self.capacity = capacity
+		self._tokens = capacity
+		self._updated = time.monotonic()
+		self._blocked_until = 0.0
+
+	def try_acquire(self, now: Optional[float] = None) -> float:
+		"""
+		Пытается забрать токен.
+
+		Args:
+			now (Optional[float]): Текущее время по time.monotonic()
+
+		Returns:
+			float: 0.0, если токен получен, иначе время ожидания в секундах
+		"""
+		now = time.monotonic() if now is None else now
+		if now < self._blocked_until:
+			return self._blocked_until - now
+		self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+		self._updated = now
+		if self._tokens >= 1:
+			self._tokens -= 1
+			return 0.0
+		return (1 - self._tokens) / self.rate
+
+	def block(self, seconds: float) -> None:
+		"""
+		Блокирует корзину на заданное время (после ответа 429).
+
+		Args:
+			seconds (float): Длительность блокировки в секундах
+		"""
+		self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+		self._tokens = 0
+
+	@property
+	def is_idle(self) -> bool:
+		"""Возвращает True, если корзина полна и не заблокирована."""
+		now = time.monotonic()
+		tokens = self._tokens + (now - self._updated) * self.rate
+		return tokens >= self.capacity and now >= self._blocked_until
+
+
+class OutboundRateLimiter(BaseRequestMiddleware):
+	"""
+	Middleware сессии бота для сглаживания исходящих отправок.
+
+	Ограничивает только отправку и редактирование сообщений в чатах;
+	служебные методы (getUpdates, answerCallbackQuery, sendChatAction)
+	проходят без задержки.
+
+	Attributes:
+		global_bucket (TokenBucket): Общий лимит бота
+		max_retries (int): Максимум повторов после TelegramRetryAfter
+	"""
+
+	# Сколько самых давних корзин просматривается в поисках простаивающей
+	_EVICT_SCAN = 16
+
+	def __init__(
+		self,
+		global_rate: Optional[float] = None,
+		chat_rate: Optional[float] = None,
+		group_rate: Optional[float] = None,
+		chat_burst: Optional[float] = None,
+		max_chat_buckets: Optional[int] = None,
+		max_retries: Optional[int] = None,
+	):
+		"""
+		Инициализирует ограничитель. Не заданные параметры берутся из Config.
+
+		Args:
+			global_rate (Optional[float]): Отправок в секунду на весь бот
+			chat_rate (Optional[float]): Отправок в секунду в личный чат
+			group_rate (Optional[float]): Отправок в секунду в групповой чат
+			chat_burst (Optional[float]): Допустимый всплеск в одном чате
+			max_chat_buckets (Optional[int]): Максимум отслеживаемых чатов
+			max_retries (Optional[int]): Максимум повторов после 429
+		"""
+		global_rate = global_rate or Config.TG_GLOBAL_RATE
+		self.global_bucket = TokenBucket(global_rate, global_rate)
+		self._chat_rate = chat_rate or Config.TG_CHAT_RATE
+		self._group_rate = group_rate or Config.TG_GROUP_RATE
+		self._chat_burst = chat_burst or Config.TG_CHAT_BURST
+		self._max_chat_buckets = max_chat_buckets or Config.TG_MAX_CHAT_BUCKETS
+		self.max_retries = LIMITS['MAX_RETRIES'] if max_retries is None else max_retries
+		self._chat_buckets: 'OrderedDict[Any, TokenBucket]' = OrderedDict()
+		self._interactive_waiting = 0
+
+	@staticmethod
+	def _is_shaped(method: TelegramMethod[Any]) -> bool:
+		"""Проверяет, относится ли метод к отправке сообщений в чат."""
+		if isinstance(method, SendChatAction) or getattr(method, 'chat_id', None) is None:
+			return False
+		name = type(method).__name__
+		return name.startswith(('Send', 'Edit', 'Copy', 'Forward'))
+
+	def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+		"""Возвращает корзину чата, вытесняя самые давние при переполнении."""
+		bucket = self._chat_buckets.get(chat_id)
+		if bucket is not None:
+			self._chat_buckets.move_to_end(chat_id)
+			return bucket
+		is_group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+		rate = self._group_rate if is_group else self._chat_rate
+		while len(self._chat_buckets) >= self._max_chat_buckets:
+			self._evict()
+		bucket = TokenBucket(rate, self._chat_burst)
+		self._chat_buckets[chat_id] = bucket
+		return bucket
+
+	def _evict(self) -> None:
+		"""
+		Удаляет одну корзину: первую простаивающую среди _EVICT_SCAN самых давних.
+
+		Если все они заняты, удаляется самая давняя: словарь не растет
+		сверх max_chat_buckets, а чат лишь теряет накопленное ограничение.
+		"""
+		for index, (chat_id, bucket) in enumerate(self._chat_buckets.items()):
+			if index >= self._EVICT_SCAN:
+				break
+			if bucket.is_idle:
+				del self._chat_buckets[chat_id]
+				return
+		self._chat_buckets.popitem(last=False)
+
+	@staticmethod
+	async def _wait(bucket: TokenBucket) -> None:
+		"""Ожидает токен корзины."""
+		while True:
+			wait = bucket.try_acquire()
+			if not wait:
+				return
+			await asyncio.sleep(wait)
+
+	async def _acquire_global(self, priority: int) -> None:
+		"""
+		Ожидает токен общей корзины; фоновые запросы ждут, пока ее ждут интерактивные.
+
+		Учитываются только ожидающие общую корзину: интерактивный ответ,
+		ждущий корзину своего чата (например, после 429), фоновые отправки
+		в другие чаты не задерживает.
+		"""
+		if priority == INTERACTIVE:
+			self._interactive_waiting += 1
+		try:
+			while True:
+				if priority == BACKGROUND and self._interactive_waiting:
+					await asyncio.sleep(1 / self.global_bucket.rate)
+					continue
+				wait = self.global_bucket.try_acquire()
+				if not wait:
+					return
+				await asyncio.sleep(wait)
+		finally:
+			if priority == INTERACTIVE:
+				self._interactive_waiting -= 1
+
+	async def __call__(
+		self,
+		make_request: NextRequestMiddlewareType[TelegramType],
+		bot: Any,
+		method: TelegramMethod[TelegramType],
+	) -> Response[TelegramType]:
+		if not self._is_shaped(method):
+			return await make_request(bot, method)
+
+		priority = _traffic_priority.get()
+		chat_bucket = self._chat_bucket(getattr(method, 'chat_id'))
+		attempt = 0
+		while True:
+			await self._wait(chat_bucket)
+			await self._acquire_global(priority)
+			try:
+				return await make_request(bot, method)
+			except TelegramRetryAfter as e:
+				attempt += 1
+				metrics.inc('telegram.retry_after')
+				chat_bucket.block(e.retry_after)
+				if attempt > self.max_retries:
+					raise
+				logger.warning(
+					"Flood control on %s, retrying in %s s (attempt %d/%d)",
+					type(method).__name__, e.retry_after, attempt, self.max_retries,
+				)
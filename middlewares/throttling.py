@@ -0,0 +1,126 @@
+"""
+Модуль ограничения частоты запросов одного пользователя.
+
+Содержит:
+- UserThrottle: Middleware с корзинами токенов на пользователя
+- THROTTLE_FLAG: Имя флага обработчика с классом ограничения
+
+Обработчики, обращающиеся к ChatGPT, помечаются флагом:
+
+	@router.message(...)
+	@flags.throttling('gpt')
+	async def handler(...): ...
+
+Для класса 'gpt' действуют Config.THROTTLE_GPT_RATE и THROTTLE_GPT_BURST,
+для остальных обработчиков - Config.THROTTLE_RATE и THROTTLE_BURST.
+Превысивший лимит пользователь получает одно предупреждение, следующие
+сообщения отбрасываются молча до первого пропущенного. Нажатия кнопок
+всегда получают короткий ответ, чтобы у кнопки не висел индикатор загрузки.
+Пользователи из Config.ADMIN_IDS не ограничиваются.
+
+Зависимости:
+- aiogram: Базовый middleware, флаги обработчиков и типы событий
+- config: Лимиты и список администраторов
+- common: Тексты сообщений и метрики
+"""
+
+import logging
+import math
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject, User
+
+from common import MESSAGES, metrics
+from config import Config
+
+from .rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_FLAG = 'throttling'
+DEFAULT_CLASS = 'default'
+GPT_CLASS = 'gpt'
+
+ThrottleKey = Tuple[int, str]
+
+
+class UserThrottle(BaseMiddleware):
+	"""
+	Middleware, ограничивающий частоту сообщений и нажатий одного пользователя.
+
+	Подключается как внутренний middleware к message и callback_query,
+	чтобы флаги обработчика были доступны.
+
+	Attributes:
+		limits (Dict[str, Tuple[float, float]]): Скорость и всплеск по классу обработчика
+		admin_ids (FrozenSet[int]): Пользователи без ограничений
+		max_users (int): Максимум отслеживаемых корзин
+	"""
+
+	def __init__(
+		self,
+		limits: Optional[Dict[str, Tuple[float, float]]] = None,
+		admin_ids: Optional[FrozenSet[int]] = None,
+		max_users: Optional[int] = None,
+	):
+		"""
+		Инициализирует ограничитель. Не заданные параметры берутся из Config.
+
+		Args:
+			limits (Optional[Dict[str, Tuple[float, float]]]): Скорость в секунду
+				и всплеск по классу обработчика
+			admin_ids (Optional[FrozenSet[int]]): Идентификаторы администраторов
+			max_users (Optional[int]): Максимум отслеживаемых корзин
+		"""
+		self.limits = limits or {
+			DEFAULT_CLASS: (Config.THROTTLE_RATE, Config.THROTTLE_BURST),
+			GPT_CLASS: (Config.THROTTLE_GPT_RATE, Config.THROTTLE_GPT_BURST),
+		}
+		self.admin_ids = Config.ADMIN_IDS if admin_ids is None else admin_ids
+		self.max_users = max_users or Config.THROTTLE_MAX_USERS
+		self._buckets: 'OrderedDict[ThrottleKey, TokenBucket]' = OrderedDict()
+		self._notified: Set[ThrottleKey] = set()
+
+	def _bucket(self, key: ThrottleKey) -> TokenBucket:
+		"""Возвращает корзину пользователя, вытесняя самые давние при переполнении."""
+		bucket = self._buckets.get(key)
+		if bucket is not None:
+			self._buckets.move_to_end(key)
+			return bucket
+		rate, burst = self.limits.get(key[1]) or self.limits[DEFAULT_CLASS]
+		bucket = self._buckets[key] = TokenBucket(rate, burst)
+		while len(self._buckets) > self.max_users:
+			# Вытесненный пользователь получит полную корзину - это дешевле неограниченной памяти
+			oldest, _ = self._buckets.popitem(last=False)
+			self._notified.discard(oldest)
+		return bucket
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: Dict[str, Any],
+	) -> Any:
+		user: Optional[User] = data.get('event_from_user')
+		if user is None or user.id in self.admin_ids:
+			return await handler(event, data)
+
+		throttle_class = get_flag(data, THROTTLE_FLAG, default=DEFAULT_CLASS)
+		key = (user.id, throttle_class)
+		wait = self._bucket(key).try_acquire()
+		if not wait:
+			self._notified.discard(key)
+			return await handler(event, data)
+
+		metrics.inc(f'throttle.dropped.{throttle_class}')
+		text = MESSAGES['THROTTLED'].format(seconds=math.ceil(wait))
+		if isinstance(event, CallbackQuery):
+			await event.answer(text)
+		elif key not in self._notified and isinstance(event, Message):
+			self._notified.add(key)
+			logger.info("Throttling user %s (%s handlers)", user.id, throttle_class)
+			await event.answer(text)
+		return None
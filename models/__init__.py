@@ -3,11 +3,14 @@
 
 Содержит все основные классы и структуры данных приложения:
 - ChatGpt: Основной класс для работы с ChatGPT API
+- GPTClientPool, ModelRouter, ModelRoute: Маршрутизация запросов по режимам
 - GPTMessage: Класс для управления сообщениями GPT
 - GPTRole: Класс для работы с ролью GPT
-- gpt_client: Глобальный экземпляр клиента ChatGPT
-- Button, Buttons: Классы для работы с кнопками
+- gpt_client: Глобальный пул клиентов ChatGPT
+- HistorySummarizer, summarizer: Фоновое сжатие длинных диалогов
+- Button, Buttons, celebrity_buttons: Классы для работы с кнопками и кэш кнопок знаменитостей
 - MEDIA_CATEGORIES, MEDIA_GENRES: Коллекции кнопок
+- parse_media_response, media_response_format: Разбор структурированных рекомендаций медиа
 - CelebrityData, QuizData, TranslatorData, MediaData: Callback-данные
 - QuizStateData, MediaStateData, CelebrityStateData, GPTStateData: Типы состояний FSM
 
@@ -17,17 +20,24 @@
 """
 
 from .chat_gpt import ChatGpt, GPTMessage, GPTRole
-from .buttons import Button, Buttons, MEDIA_CATEGORIES, MEDIA_GENRES
+from .buttons import Button, Buttons, MEDIA_CATEGORIES, MEDIA_GENRES, celebrity_buttons
+from .routing import GPTClientPool, ModelRouter, ModelRoute
+from .summarizer import HistorySummarizer
+from .media import parse_media_response, media_response_format, MEDIA_CORRECTION_PROMPT
 from .callback_data import (
 	CelebrityData, QuizData, TranslatorData, MediaData,
 	QuizStateData, MediaStateData, CelebrityStateData, GPTStateData
 )
 
-gpt_client = ChatGpt()
+gpt_client = GPTClientPool()
+summarizer = HistorySummarizer(gpt_client)
 
 __all__ = [
 	'ChatGpt', 'GPTMessage', 'GPTRole', 'gpt_client',
-	'Button', 'Buttons', 'MEDIA_CATEGORIES', 'MEDIA_GENRES',
+	'GPTClientPool', 'ModelRouter', 'ModelRoute',
+	'HistorySummarizer', 'summarizer',
+	'Button', 'Buttons', 'MEDIA_CATEGORIES', 'MEDIA_GENRES', 'celebrity_buttons',
+	'parse_media_response', 'media_response_format', 'MEDIA_CORRECTION_PROMPT',
 	'CelebrityData', 'QuizData', 'TranslatorData', 'MediaData',
 	'QuizStateData', 'MediaStateData', 'CelebrityStateData', 'GPTStateData'
 ]
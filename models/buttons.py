@@ -6,6 +6,7 @@
 - Buttons: Коллекция кнопок с итерацией
 - MEDIA_CATEGORIES: Предопределенные кнопки категорий медиа
 - MEDIA_GENRES: Предопределенные кнопки жанров для каждой категории
+- celebrity_buttons: Кэшированные кнопки знаменитостей
 
 Основные возможности:
 - Создание кнопок с именами и callback-данными
@@ -20,8 +21,9 @@
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Union, Optional, List
+from typing import Union, Optional, List, Tuple
 
 from common import ResourcePath, Extensions, MediaCategory, MediaGenre, MEDIA_CATEGORY_NAMES, MEDIA_GENRE_NAMES, MEDIA_GENRES_BY_CATEGORY
 
@@ -166,6 +168,19 @@ class Buttons:
 		return buttons
 
 
+@lru_cache(maxsize=1)
+def celebrity_buttons() -> Tuple[Button, ...]:
+	"""
+	Возвращает кнопки знаменитостей.
+	
+	Файлы промптов читаются при первом вызове, дальше используется кэш.
+	
+	Returns:
+		Tuple[Button, ...]: Кнопки знаменитостей
+	"""
+	return tuple(Buttons._read_buttons())
+
+
 def create_media_category_buttons() -> List[Button]:
 	"""
 	Создает кнопки для категорий медиа.
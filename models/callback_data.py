@@ -28,7 +28,7 @@ Callback данные:
 """
 
 from aiogram.filters.callback_data import CallbackData
-from typing import TypedDict, Dict
+from typing import TypedDict, Dict, Union
 from aiogram.types import FSInputFile
 from .chat_gpt import GPTMessage
 
@@ -105,7 +105,7 @@ class QuizStateData(TypedDict):
 	- callback: Данные callback для навигации
 	"""
 	messages: GPTMessage
-	photo: FSInputFile
+	photo: Union[FSInputFile, str]
 	score: int
 	callback: QuizData
 
@@ -127,7 +127,7 @@ class MediaStateData(TypedDict):
 	last_rec: Dict[str, str]
 	disliked: list[str]
 	messages: GPTMessage
-	photo: FSInputFile
+	photo: Union[FSInputFile, str]
 
 
 class CelebrityStateData(TypedDict):
@@ -139,7 +139,7 @@ class CelebrityStateData(TypedDict):
 	- photo: Фотография знаменитости
 	"""
 	messages: GPTMessage
-	photo: FSInputFile
+	photo: Union[FSInputFile, str]
 
 
 class GPTStateData(TypedDict):
@@ -151,5 +151,5 @@ class GPTStateData(TypedDict):
 	- photo: Фотография для отображения
 	"""
 	messages: GPTMessage
-	photo: FSInputFile
+	photo: Union[FSInputFile, str]
 
@@ -3,30 +3,57 @@
 
 Содержит классы для взаимодействия с OpenAI API:
 - GPTMessage: Класс для управления сообщениями GPT
-- ChatGpt: Синглтон-класс для работы с ChatGPT API
+- ChatGpt: Класс для работы с ChatGPT API
 
 Основные возможности:
-- Загрузка промптов из файлов
-- Управление диалогом с ChatGPT
+- Загрузка и кэширование промптов из файлов
+- Компактное хранение истории диалога
 - Асинхронные запросы к OpenAI API
 - Поддержка прокси и обработка ошибок
+- Предохранитель на каждую модель для быстрого отказа при сбоях API
+- Адаптивные таймауты и дублирующие запросы для сокращения хвоста задержек
+- Кэш ответов на одинаковые короткие запросы
+- Объединение одновременных одинаковых запросов
 
 Зависимости:
-- openai: Клиент для OpenAI API
-- httpx: HTTP клиент для прокси
+- openai: Клиент для OpenAI API (импортируется при создании клиента)
+- httpx: HTTP клиент для прокси (импортируется при создании клиента)
 - os: Работа с переменными окружения
 - common: Основные компоненты приложения
 - config: Конфигурация приложения
 - exception: Пользовательские исключения
 """
 
+import asyncio
 import os
-import openai
-import httpx
-from typing import Optional, List, Dict
-from common import GPTRole, Extensions, ResourcePath
-from exception import FileOperationError, ConfigurationError, APIConnectionError
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, List, Dict, Tuple
+from urllib.parse import urlsplit
+from common import GPTRole, Extensions, ResourcePath, metrics
+from exception import (
+	FileOperationError, ConfigurationError, APIConnectionError,
+	BackendUnavailableError, CircuitOpenError,
+)
 from config import Config
+from .circuit_breaker import CircuitBreaker, CircuitState
+from .latency import HedgeBudget, LatencyKey, LatencyTracker
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+
+if TYPE_CHECKING:
+	import httpx
+
+
+def _backend_errors() -> Tuple[type, ...]:
+	"""Возвращает ошибки, говорящие о сбое или перегрузке сервиса, а не о некорректном запросе."""
+	import httpx
+	import openai
+	return (
+		openai.APIConnectionError,
+		openai.RateLimitError,
+		openai.InternalServerError,
+		httpx.RequestError,
+	)
 
 
 class GPTMessage:
@@ -36,11 +63,25 @@ class GPTMessage:
 	Предоставляет функциональность для загрузки промптов из файлов
 	и управления диалогом с ChatGPT.
 	
+	История хранится компактно: роли - байтами в bytearray, тексты -
+	в отдельном списке, а системный промпт - общей для всех сессий
+	строкой из кэша. Список словарей для API собирается только
+	при обращении к message_list.
+	
 	Attributes:
 		prompt_file (str): Имя файла промпта с расширением
 		message_list (list): Список сообщений для отправки в API
 	"""
 	
+	__slots__ = ('prompt_file', '_system', '_roles', '_contents')
+	# Системный промпт общий для всех сообщений режима (_prompt_cache),
+	# в объем сессии он не входит (см. storage.session.estimate_size)
+	_SHARED_SLOTS = ('_system',)
+	
+	_ROLES = (GPTRole.SYSTEM.value, GPTRole.USER.value, GPTRole.ASSISTANT.value)
+	_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+	_prompt_cache: Dict[str, str] = {}
+	
 	def __init__(self, prompt: str):
 		"""
 		Инициализирует объект GPTMessage.
@@ -49,20 +90,21 @@ class GPTMessage:
 			prompt (str): Имя промпта без расширения
 		"""
 		self.prompt_file = prompt + Extensions.TXT.value
-		self.message_list = self._init_message()
+		self._system = self._init_message()
+		self._roles = bytearray()
+		self._contents: List[str] = []
 	
-	def _init_message(self) -> List[Dict[str, str]]:
+	def _init_message(self) -> str:
 		"""
-		Инициализирует список сообщений с системным промптом.
+		Возвращает системный промпт из кэша, загружая его при первом обращении.
 		
 		Returns:
-			List[Dict[str, str]]: Список сообщений с системным промптом
+			str: Текст системного промпта
 		"""
-		message = {
-			'role': GPTRole.SYSTEM.value,
-			'content': self._load_prompt(),
-		}
-		return [message]
+		prompt = self._prompt_cache.get(self.prompt_file)
+		if prompt is None:
+			prompt = self._prompt_cache[self.prompt_file] = self._load_prompt()
+		return prompt
 	
 	def _load_prompt(self) -> str:
 		"""
@@ -86,6 +128,51 @@ class GPTMessage:
 		except Exception as e:
 			raise FileOperationError(f"Error reading prompt file: {str(e)}")
 	
+	@property
+	def prompt_name(self) -> str:
+		"""Возвращает имя промпта без расширения (режим диалога)."""
+		return self.prompt_file[:-len(Extensions.TXT.value)]
+	
+	@property
+	def message_list(self) -> List[Dict[str, str]]:
+		"""
+		Собирает список сообщений для отправки в API.
+		
+		Returns:
+			List[Dict[str, str]]: Системный промпт и история диалога
+		"""
+		roles = self._ROLES
+		messages = [{'role': GPTRole.SYSTEM.value, 'content': self._system}]
+		messages.extend(
+			{'role': roles[code], 'content': content}
+			for code, content in zip(self._roles, self._contents)
+		)
+		return messages
+	
+	def __len__(self) -> int:
+		"""Возвращает количество сообщений вместе с системным промптом."""
+		return len(self._contents) + 1
+	
+	def compact(self, count: int, summary: str) -> None:
+		"""
+		Заменяет первые count сообщений истории одним сообщением с их кратким содержанием.
+		
+		Сообщения, добавленные после count, сохраняются без изменений.
+		
+		Args:
+			count (int): Количество сжимаемых сообщений истории
+			summary (str): Краткое содержание этих сообщений
+			
+		Raises:
+			ValueError: Если count больше длины истории или summary пустое
+		"""
+		if count > len(self._contents):
+			raise ValueError("Cannot compact more messages than the history holds")
+		if not summary.strip():
+			raise ValueError("Summary cannot be empty")
+		self._roles[:count] = bytes((self._ROLE_CODES[GPTRole.SYSTEM.value],))
+		self._contents[:count] = [summary]
+	
 	def update(self, role: GPTRole, message: str):
 		"""
 		Добавляет новое сообщение в диалог.
@@ -99,42 +186,54 @@ class GPTMessage:
 		"""
 		if not message.strip():
 			raise ValueError("Message cannot be empty")
-		message_dict = {
-			'role': role.value,
-			'content': message,
-		}
-		self.message_list.append(message_dict)
+		self._roles.append(self._ROLE_CODES[role.value])
+		self._contents.append(message)
 
 
 class ChatGpt:
 	"""
-	Синглтон-класс для работы с ChatGPT API.
+	Класс для работы с ChatGPT API.
 	
 	Предоставляет асинхронные методы для отправки запросов к OpenAI API
-	с поддержкой прокси и обработкой ошибок.
+	с поддержкой прокси и обработкой ошибок. Несколько экземпляров
+	(для разных endpoint) могут использовать общий HTTP-клиент.
 	
 	Attributes:
 		_gpt_token (str): Токен для доступа к OpenAI API
 		_proxy (Optional[str]): Прокси-сервер (опционально)
 		_model (str): Модель GPT для использования
+		_base_url (Optional[str]): Адрес OpenAI-совместимого API
 		_client (AsyncOpenAI): Клиент OpenAI
+		_breakers (Dict[str, CircuitBreaker]): Предохранители по моделям
+		latency (LatencyTracker): Распределение задержек по режиму и модели
+		hedge_budget (HedgeBudget): Бюджет дублирующих запросов
+		cache (ResponseCache): Кэш ответов для детерминированных запросов
+		in_flight (SingleFlight): Выполняющиеся запросы по ключу
+		_limiter (asyncio.Semaphore): Ограничение одновременных HTTP-запросов
 	"""
 	
-	_instance = None
-	
-	def __new__(cls, *args, **kwargs):
-		"""Реализует паттерн Singleton."""
-		if cls._instance is None:
-			cls._instance = super().__new__(cls)
-		return cls._instance
-	
-	def __init__(self, model: Optional[str] = None):
+	def __init__(
+		self,
+		model: Optional[str] = None,
+		base_url: Optional[str] = None,
+		http_client: Optional['httpx.AsyncClient'] = None,
+		cache: Optional[ResponseCache] = None,
+		limiter: Optional[asyncio.Semaphore] = None,
+	):
 		"""
 		Инициализирует клиент ChatGPT.
 		
 		Args:
 			model (str, optional): Модель GPT для использования. 
 								 Если не указана, используется из конфигурации.
+			base_url (str, optional): Адрес API. По умолчанию Config.GPT_BASE_URL.
+			http_client (httpx.AsyncClient, optional): Общий HTTP-клиент с пулом соединений.
+								 Если не указан, создается собственный.
+			cache (ResponseCache, optional): Общий кэш ответов.
+								 Если не указан, создается собственный.
+			limiter (asyncio.Semaphore, optional): Общее ограничение одновременных
+								 HTTP-запросов (по размеру пула соединений). Если не указано,
+								 создается собственное на Config.GPT_MAX_CONCURRENCY.
 			
 		Raises:
 			ConfigurationError: Если не установлен GPT_TOKEN
@@ -142,26 +241,56 @@ class ChatGpt:
 		self._gpt_token = Config.GPT_TOKEN
 		self._proxy = Config.PROXY
 		self._model = model or Config.GPT_MODEL
+		self._base_url = base_url or Config.GPT_BASE_URL
 		
 		if not self._gpt_token:
 			raise ConfigurationError("GPT_TOKEN environment variable is not set")
 		
-		self._client = self._create_client()
+		self._client = self._create_client(http_client)
+		self._breakers: Dict[str, CircuitBreaker] = {}
+		self.latency = LatencyTracker()
+		self.hedge_budget = HedgeBudget()
+		self.cache = cache or ResponseCache()
+		self.in_flight = SingleFlight('gpt')
+		self._limiter = limiter or asyncio.Semaphore(Config.GPT_MAX_CONCURRENCY)
 	
-	def _create_client(self):
+	def breaker(self, model: str) -> CircuitBreaker:
+		"""
+		Возвращает предохранитель для модели.
+		
+		Args:
+			model (str): Модель
+			
+		Returns:
+			CircuitBreaker: Предохранитель
+		"""
+		breaker = self._breakers.get(model)
+		if breaker is None:
+			name = model if not self._base_url else f"{model}@{urlsplit(self._base_url).hostname}"
+			breaker = self._breakers[model] = CircuitBreaker(name)
+		return breaker
+	
+	def _create_client(self, http_client: Optional['httpx.AsyncClient'] = None):
 		"""
 		Создает экземпляр клиента AsyncOpenAI.
 		
+		Args:
+			http_client (Optional[httpx.AsyncClient]): Общий HTTP-клиент
+		
 		Returns:
 			AsyncOpenAI: Экземпляр клиента OpenAI
 			
 		Raises:
 			APIConnectionError: При сбое создания клиента
 		"""
+		import httpx
+		import openai
+		
 		try:
 			gpt_client = openai.AsyncClient(
 				api_key=self._gpt_token,
-				http_client=httpx.AsyncClient(
+				base_url=self._base_url,
+				http_client=http_client or httpx.AsyncClient(
 					timeout=Config.REQUEST_TIMEOUT,
 					proxy=self._proxy
 				)
@@ -170,33 +299,176 @@ class ChatGpt:
 		except Exception as e:
 			raise APIConnectionError(f"Failed to create OpenAI client: {str(e)}")
 	
-	async def request(self, message: GPTMessage) -> str:
+	async def warmup(self) -> None:
+		"""
+		Открывает соединение с API легким запросом, не влияющим на предохранитель.
+		
+		Raises:
+			openai.APIError: Если соединение установить не удалось
+		"""
+		import httpx
+		
+		await self._client.get('/models', cast_to=httpx.Response)
+	
+	async def request(
+		self,
+		message: GPTMessage,
+		response_format: Optional[Dict[str, Any]] = None,
+		model: Optional[str] = None,
+		max_tokens: Optional[int] = None,
+		temperature: Optional[float] = None,
+		hedge: bool = False,
+		cache: int = 0,
+		accept: Optional[Callable[[str], bool]] = None,
+	) -> str:
 		"""
 		Отправляет запрос к ChatGPT API.
 		
+		Таймаут запроса вычисляется по распределению задержек для режима
+		и модели. Если hedge включен и бюджет позволяет, то после
+		перцентиля Config.GPT_HEDGE_PERCENTILE отправляется дублирующий
+		запрос; используется первый ответ, второй запрос отменяется.
+		
+		Если cache больше нуля и история короткая, ответ берется из кэша
+		(см. ResponseCache); при разомкнутом предохранителе кэш продолжает
+		отвечать. Одновременные одинаковые запросы объединяются в один
+		(см. SingleFlight) независимо от кэша.
+		
 		Args:
 			message (GPTMessage): Объект с сообщениями для отправки
+			response_format (Optional[Dict[str, Any]]): Формат структурированного ответа
+				(например, JSON-схема). Если не указан, ответ - свободный текст.
+			model (Optional[str]): Модель для этого запроса вместо модели клиента
+			max_tokens (Optional[int]): Ограничение длины ответа в токенах
+			temperature (Optional[float]): Температура генерации
+			hedge (bool): Разрешить дублирующий запрос (только для идемпотентных режимов)
+			cache (int): Число кэшируемых вариантов ответа (0 - без кэша)
+			accept (Optional[Callable[[str], bool]]): Проверка ответа перед сохранением
+				в кэш (непригодный ответ возвращается, но не кэшируется)
 			
 		Returns:
 			str: Ответ от ChatGPT
 			
 		Raises:
-			APIConnectionError: При сбое запроса к API
+			CircuitOpenError: Если предохранитель модели разомкнут
+			BackendUnavailableError: При сбое или перегрузке сервиса API
+			APIConnectionError: При прочих ошибках запроса к API
 		"""
-		try:
-			response = await self._client.chat.completions.create(
-				messages=message.message_list,
-				model=self._model,
+		model = model or self._model
+		key = (message.prompt_name, model)
+		params: Dict[str, Any] = {
+			'messages': message.message_list,
+			'model': model,
+		}
+		if response_format is not None:
+			params['response_format'] = response_format
+		if max_tokens is not None:
+			params['max_tokens'] = max_tokens
+		if temperature is not None:
+			params['temperature'] = temperature
+		
+		request_key = ResponseCache.make_key(params)
+		
+		def load() -> Awaitable[str]:
+			return self.in_flight.do(request_key, lambda: self._complete(key, params, hedge))
+		
+		if cache and self.cache.accepts(params):
+			return await self.cache.fetch(message.prompt_name, request_key, cache, load, accept)
+		return await load()
+	
+	async def _complete(self, key: LatencyKey, params: Dict[str, Any], hedge: bool) -> str:
+		"""Выполняет запрос через предохранитель модели и возвращает текст ответа."""
+		import openai
+		
+		breaker = self.breaker(key[1])
+		if not breaker.allow():
+			raise CircuitOpenError(
+				f"Circuit for {breaker.name} is open, retry in {breaker.retry_after:.0f} s"
 			)
-			if not response.choices:
-				raise APIConnectionError("No response received from the API")
-			content = response.choices[0].message.content
-			if content is None:
-				raise APIConnectionError("Empty response content from the API")
-			return content
+		params = dict(params, timeout=self.latency.timeout(key))
+		
+		started = time.monotonic()
+		try:
+			if hedge and breaker.state is CircuitState.CLOSED:
+				response = await self._hedged(key, params)
+			else:
+				response = await self._create(key, params)
+		except _backend_errors() as e:
+			breaker.record_failure()
+			raise BackendUnavailableError(f"OpenAI API unavailable: {str(e)}")
 		except openai.APIError as e:
+			breaker.release()
 			raise APIConnectionError(f"OpenAI API error: {str(e)}")
-		except httpx.RequestError as e:
-			raise APIConnectionError(f"Network error: {str(e)}")
+		except asyncio.CancelledError:
+			breaker.release()
+			raise
 		except Exception as e:
+			breaker.release()
 			raise APIConnectionError(f"Unexpected error during API request: {str(e)}")
+		breaker.record_success(time.monotonic() - started)
+		
+		if not response.choices:
+			raise APIConnectionError("No response received from the API")
+		content = response.choices[0].message.content
+		if content is None:
+			raise APIConnectionError("Empty response content from the API")
+		return content
+	
+	async def _create(self, key: LatencyKey, params: Dict[str, Any]) -> Any:
+		"""
+		Выполняет один HTTP-запрос и учитывает его задержку.
+		
+		Слот ограничения занимается на каждый вызов API, поэтому дублирующий
+		запрос тоже ждет свободного соединения здесь, а не в пуле httpx.
+		Ожидание слота в задержку не входит.
+		"""
+		import openai
+		
+		async with self._limiter:
+			started = time.monotonic()
+			try:
+				response = await self._client.chat.completions.create(**params)
+			except openai.APITimeoutError:
+				# Таймаут - нижняя граница задержки, без него распределение занижается
+				self.latency.record(key, time.monotonic() - started)
+				raise
+			self.latency.record(key, time.monotonic() - started)
+			return response
+	
+	async def _hedged(self, key: LatencyKey, params: Dict[str, Any]) -> Any:
+		"""Выполняет запрос с дублем после перцентиля задержки."""
+		self.hedge_budget.earn()
+		primary = asyncio.create_task(self._create(key, params))
+		delay = self.latency.percentile(key, Config.GPT_HEDGE_PERCENTILE)
+		if delay is None:
+			return await primary
+		secondary: Optional[asyncio.Task] = None
+		try:
+			done, _ = await asyncio.wait({primary}, timeout=delay)
+			if done or not self.hedge_budget.try_spend():
+				return await primary
+			
+			metrics.inc('gpt.hedged')
+			secondary = asyncio.create_task(self._create(key, params))
+			pending = {primary, secondary}
+			error: Optional[BaseException] = None
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					# Попытку могли отменить извне: exception() бросил бы CancelledError
+					if task.cancelled():
+						error = error or asyncio.CancelledError()
+						continue
+					if task.exception() is None:
+						if task is secondary:
+							metrics.inc('gpt.hedge_won')
+						return task.result()
+					error = task.exception()
+			raise error
+		finally:
+			# Проигравшую попытку отменяем и дожидаемся, чтобы она не осталась висеть
+			losers = [task for task in (primary, secondary) if task is not None and not task.done()]
+			for task in losers:
+				task.cancel()
+			if losers:
+				await asyncio.gather(*losers, return_exceptions=True)
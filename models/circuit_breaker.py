@@ -0,0 +1,161 @@
+"""
+Модуль предохранителя (circuit breaker) для запросов к OpenAI.
+
+Содержит:
+- CircuitState: Состояния предохранителя
+- CircuitBreaker: Предохранитель по доле ошибок и медленных ответов
+
+Работа предохранителя:
+- CLOSED: запросы проходят, результаты последних запросов учитываются в окне
+- OPEN: доля ошибок (включая ответы медленнее порога) превысила порог -
+  запросы сразу отклоняются в течение open_seconds
+- HALF_OPEN: после паузы пропускается один пробный запрос; успех замыкает
+  предохранитель, ошибка снова размыкает его
+
+Переходы между состояниями пишутся в лог и в метрики
+(circuit.<имя>.state и счетчики circuit.<имя>.<состояние>).
+
+Зависимости:
+- common: Метрики
+- config: Пороги предохранителя
+"""
+
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Deque, Optional
+
+from common import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+	"""Перечисление состояний предохранителя."""
+	CLOSED = 0
+	HALF_OPEN = 1
+	OPEN = 2
+
+
+class CircuitBreaker:
+	"""
+	Предохранитель по доле неудачных запросов в скользящем окне.
+
+	Attributes:
+		name (str): Имя предохранителя для логов и метрик
+		state (CircuitState): Текущее состояние
+		failure_rate (float): Доля ошибок, при которой предохранитель размыкается
+		min_requests (int): Минимум запросов в окне для принятия решения
+		slow_call_seconds (float): Ответ дольше этого времени считается ошибкой
+		open_seconds (float): Пауза перед пробным запросом
+	"""
+
+	def __init__(
+		self,
+		name: str,
+		failure_rate: Optional[float] = None,
+		min_requests: Optional[int] = None,
+		window: Optional[int] = None,
+		slow_call_seconds: Optional[float] = None,
+		open_seconds: Optional[float] = None,
+	):
+		"""
+		Инициализирует замкнутый предохранитель. Не заданные параметры берутся из Config.
+
+		Args:
+			name (str): Имя предохранителя
+			failure_rate (Optional[float]): Пороговая доля ошибок
+			min_requests (Optional[int]): Минимум запросов в окне
+			window (Optional[int]): Размер окна в запросах
+			slow_call_seconds (Optional[float]): Порог медленного ответа в секундах
+			open_seconds (Optional[float]): Пауза в разомкнутом состоянии в секундах
+		"""
+		self.name = name
+		self.state = CircuitState.CLOSED
+		self.failure_rate = failure_rate or Config.CIRCUIT_FAILURE_RATE
+		self.min_requests = min_requests or Config.CIRCUIT_MIN_REQUESTS
+		self.slow_call_seconds = slow_call_seconds or Config.CIRCUIT_SLOW_CALL_SECONDS
+		self.open_seconds = open_seconds or Config.CIRCUIT_OPEN_SECONDS
+		self._results: Deque[bool] = deque(maxlen=window or Config.CIRCUIT_WINDOW)
+		self._opened_at = 0.0
+		self._probe_in_flight = False
+
+	def allow(self) -> bool:
+		"""
+		Проверяет, можно ли отправить запрос.
+
+		Returns:
+			bool: True, если запрос разрешен
+		"""
+		if self.state is CircuitState.CLOSED:
+			return True
+		if self.state is CircuitState.OPEN:
+			if time.monotonic() - self._opened_at < self.open_seconds:
+				return False
+			self._transition(CircuitState.HALF_OPEN)
+		if self._probe_in_flight:
+			return False
+		self._probe_in_flight = True
+		return True
+
+	@property
+	def retry_after(self) -> float:
+		"""Возвращает время до следующего пробного запроса в секундах."""
+		if self.state is not CircuitState.OPEN:
+			return 0.0
+		return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+	def record_success(self, latency: float) -> None:
+		"""
+		Учитывает успешный запрос.
+
+		Args:
+			latency (float): Время ответа в секундах
+		"""
+		if latency > self.slow_call_seconds:
+			metrics.inc(f'circuit.{self.name}.slow_calls')
+			self._record(False)
+		else:
+			self._record(True)
+
+	def record_failure(self) -> None:
+		"""Учитывает неудачный запрос."""
+		self._record(False)
+
+	def release(self) -> None:
+		"""Освобождает разрешение без учета результата (запрос отменен или отклонен клиентом)."""
+		if self.state is CircuitState.HALF_OPEN:
+			self._probe_in_flight = False
+
+	def _record(self, ok: bool) -> None:
+		"""Обновляет окно и состояние по результату запроса."""
+		if self.state is CircuitState.HALF_OPEN:
+			self._probe_in_flight = False
+			self._transition(CircuitState.CLOSED if ok else CircuitState.OPEN)
+			return
+		self._results.append(ok)
+		if self.state is CircuitState.CLOSED and len(self._results) >= self.min_requests:
+			failures = self._results.count(False)
+			if failures / len(self._results) >= self.failure_rate:
+				self._transition(CircuitState.OPEN)
+
+	def _transition(self, state: CircuitState) -> None:
+		"""Переводит предохранитель в новое состояние и сообщает об этом."""
+		if state is self.state:
+			return
+		previous, self.state = self.state, state
+		if state is CircuitState.OPEN:
+			self._opened_at = time.monotonic()
+			logger.warning(
+				"Circuit %s opened (was %s), failing fast for %.0f s",
+				self.name, previous.name, self.open_seconds,
+			)
+		elif state is CircuitState.CLOSED:
+			self._results.clear()
+			logger.info("Circuit %s closed", self.name)
+		else:
+			logger.info("Circuit %s half-open, probing", self.name)
+		metrics.inc(f'circuit.{self.name}.{state.name.lower()}')
+		metrics.set(f'circuit.{self.name}.state', state.value)
@@ -0,0 +1,138 @@
+"""
+Модуль учета задержек ответов ChatGPT.
+
+Содержит:
+- LatencyTracker: Скользящее распределение задержек по режиму и модели
+- HedgeBudget: Ограничение доли дублирующих (hedged) запросов
+
+По распределению задержек вычисляются:
+- адаптивный таймаут: p99 * Config.GPT_TIMEOUT_MULTIPLIER в пределах
+  [Config.GPT_MIN_TIMEOUT, Config.REQUEST_TIMEOUT];
+- момент отправки дублирующего запроса: перцентиль Config.GPT_HEDGE_PERCENTILE.
+
+Пока образцов меньше Config.GPT_LATENCY_MIN_SAMPLES, используется
+фиксированный Config.REQUEST_TIMEOUT и дублирование не выполняется.
+
+Зависимости:
+- common: Метрики
+- config: Параметры окна, таймаутов и бюджета
+"""
+
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from common import metrics
+from config import Config
+
+LatencyKey = Tuple[str, str]
+
+
+class LatencyTracker:
+	"""
+	Скользящее распределение задержек по ключу (режим, модель).
+
+	Attributes:
+		window (int): Количество последних образцов на ключ
+		min_samples (int): Минимум образцов для вычисления перцентилей
+	"""
+
+	def __init__(self, window: Optional[int] = None, min_samples: Optional[int] = None):
+		"""
+		Инициализирует пустой трекер. Не заданные параметры берутся из Config.
+
+		Args:
+			window (Optional[int]): Размер окна в образцах
+			min_samples (Optional[int]): Минимум образцов для перцентилей
+		"""
+		self.window = window or Config.GPT_LATENCY_WINDOW
+		self.min_samples = min_samples or Config.GPT_LATENCY_MIN_SAMPLES
+		self._samples: Dict[LatencyKey, Deque[float]] = {}
+
+	def record(self, key: LatencyKey, latency: float) -> None:
+		"""
+		Добавляет образец задержки.
+
+		Args:
+			key (LatencyKey): Режим и модель
+			latency (float): Задержка в секундах
+		"""
+		samples = self._samples.get(key)
+		if samples is None:
+			samples = self._samples[key] = deque(maxlen=self.window)
+		samples.append(latency)
+
+	def percentile(self, key: LatencyKey, q: float) -> Optional[float]:
+		"""
+		Возвращает перцентиль задержки.
+
+		Args:
+			key (LatencyKey): Режим и модель
+			q (float): Перцентиль от 0 до 100
+
+		Returns:
+			Optional[float]: Задержка в секундах или None, если образцов мало
+		"""
+		samples = self._samples.get(key)
+		if samples is None or len(samples) < self.min_samples:
+			return None
+		ordered = sorted(samples)
+		return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+	def timeout(self, key: LatencyKey) -> float:
+		"""
+		Возвращает адаптивный таймаут запроса.
+
+		Args:
+			key (LatencyKey): Режим и модель
+
+		Returns:
+			float: Таймаут в секундах
+		"""
+		p99 = self.percentile(key, 99)
+		if p99 is None:
+			return Config.REQUEST_TIMEOUT
+		timeout = min(Config.REQUEST_TIMEOUT, max(Config.GPT_MIN_TIMEOUT, p99 * Config.GPT_TIMEOUT_MULTIPLIER))
+		metrics.set(f'gpt.timeout.{key[0]}.{key[1]}', round(timeout, 3))
+		return timeout
+
+
+class HedgeBudget:
+	"""
+	Бюджет дублирующих запросов.
+
+	Каждый обычный запрос пополняет бюджет на ratio, каждый дублирующий
+	расходует единицу, поэтому доля дублей не превышает ratio
+	(с запасом не больше burst).
+
+	Attributes:
+		ratio (float): Допустимая доля дублирующих запросов
+		burst (float): Максимальный накопленный бюджет
+	"""
+
+	def __init__(self, ratio: Optional[float] = None, burst: float = 5.0):
+		"""
+		Инициализирует пустой бюджет.
+
+		Args:
+			ratio (Optional[float]): Доля дублей (по умолчанию Config.GPT_HEDGE_BUDGET)
+			burst (float): Максимальный накопленный бюджет
+		"""
+		self.ratio = Config.GPT_HEDGE_BUDGET if ratio is None else ratio
+		self.burst = burst
+		self._tokens = 0.0
+
+	def earn(self) -> None:
+		"""Пополняет бюджет за обычный запрос."""
+		self._tokens = min(self.burst, self._tokens + self.ratio)
+
+	def try_spend(self) -> bool:
+		"""
+		Пытается потратить бюджет на дублирующий запрос.
+
+		Returns:
+			bool: True, если дубль разрешен
+		"""
+		if self._tokens < 1:
+			return False
+		self._tokens -= 1
+		return True
@@ -0,0 +1,178 @@
+"""
+Модуль разбора структурированных ответов с рекомендациями медиа.
+
+Содержит:
+- MediaRecommendationReply: Pydantic-модель ответа ChatGPT
+- media_response_format: Параметр response_format для запроса к API
+- parse_media_response: Разбор ответа с быстрым и толерантным путями
+- MEDIA_CORRECTION_PROMPT: Уточняющий запрос при неразобранном ответе
+
+Порядок разбора:
+1. Строгая валидация JSON через pydantic (быстрый путь)
+2. JSON, обернутый в markdown-блок или окруженный текстом
+3. Обрезанный JSON: извлечение полей регулярными выражениями
+4. Старый текстовый формат "Название: ... / Описание: ..."
+
+Зависимости:
+- pydantic: Валидация JSON
+- config: Выбор формата структурированного ответа
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+from config import Config
+
+
+class MediaRecommendationReply(BaseModel):
+	"""
+	Ответ ChatGPT с рекомендацией.
+
+	Attributes:
+		title (str): Название произведения
+		desc (str): Краткое описание
+	"""
+	title: str = Field(min_length=1)
+	desc: str = ''
+
+
+MEDIA_CORRECTION_PROMPT = (
+	'Ответ не удалось разобрать. Повтори рекомендацию строго одним JSON-объектом '
+	'вида {"title": "...", "desc": "..."} без пояснений и разметки.'
+)
+
+MEDIA_JSON_SCHEMA: Dict[str, Any] = {
+	'name': 'media_recommendation',
+	'strict': True,
+	'schema': {
+		'type': 'object',
+		'properties': {
+			'title': {'type': 'string'},
+			'desc': {'type': 'string'},
+		},
+		'required': ['title', 'desc'],
+		'additionalProperties': False,
+	},
+}
+
+# Модели без поддержки response_format типа json_schema (structured outputs)
+_NO_JSON_SCHEMA_PREFIXES = ('gpt-3.5', 'gpt-4-', 'gpt-4o-2024-05-13')
+
+
+def supports_json_schema(model: str) -> bool:
+	"""
+	Проверяет, принимает ли модель response_format типа json_schema.
+
+	Args:
+		model (str): Имя модели
+
+	Returns:
+		bool: False для gpt-3.5, gpt-4 и первой версии gpt-4o
+	"""
+	return model != 'gpt-4' and not model.startswith(_NO_JSON_SCHEMA_PREFIXES)
+
+
+def media_response_format(model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+	"""
+	Возвращает параметр response_format для запроса рекомендации.
+
+	Режим задается Config.GPT_MEDIA_RESPONSE_FORMAT: auto (json_schema,
+	если модель маршрута его поддерживает, иначе json_object),
+	json_schema (строгая схема), json_object (любой JSON) или none.
+
+	Args:
+		model (Optional[str]): Модель маршрута media (для режима auto)
+
+	Returns:
+		Optional[Dict[str, Any]]: Значение response_format или None
+	"""
+	mode = Config.GPT_MEDIA_RESPONSE_FORMAT
+	if mode == 'auto':
+		mode = 'json_schema' if model is None or supports_json_schema(model) else 'json_object'
+	if mode == 'json_schema':
+		return {'type': 'json_schema', 'json_schema': MEDIA_JSON_SCHEMA}
+	if mode == 'json_object':
+		return {'type': 'json_object'}
+	return None
+
+
+_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)(?:```|$)', re.DOTALL | re.IGNORECASE)
+_FIELD_RE = {
+	field: re.compile(rf'"{field}"\s*:\s*"((?:[^"\\]|\\.)*)', re.DOTALL)
+	for field in ('title', 'desc')
+}
+
+
+def _validate(payload: str) -> Optional[Dict[str, str]]:
+	"""Строго валидирует JSON-строку, возвращает None при ошибке."""
+	try:
+		reply = MediaRecommendationReply.model_validate_json(payload)
+	except ValidationError:
+		return None
+	return {'title': reply.title.strip(), 'desc': reply.desc.strip()}
+
+
+def _unescape(value: str) -> str:
+	"""Раскодирует escape-последовательности JSON в обрезанной строке."""
+	try:
+		return json.loads(f'"{value}"')
+	except ValueError:
+		return value.replace('\\"', '"').replace('\\n', '\n')
+
+
+def _parse_partial_json(text: str) -> Optional[Dict[str, str]]:
+	"""Извлекает поля из неполного или поврежденного JSON."""
+	title = _FIELD_RE['title'].search(text)
+	if title is None or not title.group(1).strip():
+		return None
+	desc = _FIELD_RE['desc'].search(text)
+	return {
+		'title': _unescape(title.group(1)).strip(),
+		'desc': _unescape(desc.group(1)).strip() if desc else '',
+	}
+
+
+def _parse_legacy(text: str) -> Optional[Dict[str, str]]:
+	"""Разбирает старый текстовый формат "Название: ... / Описание: ..."."""
+	result: Dict[str, str] = {'title': '', 'desc': ''}
+	for line in text.split('\n'):
+		line = line.strip().lstrip('*_ ').replace('**', '')
+		if line.startswith('Название:'):
+			result['title'] = line[len('Название:'):].strip()
+		elif line.startswith('Описание:'):
+			result['desc'] = line[len('Описание:'):].strip()
+	return result if result['title'] else None
+
+
+def parse_media_response(response: str) -> Optional[Dict[str, str]]:
+	"""
+	Разбирает ответ ChatGPT с рекомендацией.
+
+	Args:
+		response (str): Текст ответа
+
+	Returns:
+		Optional[Dict[str, str]]: Словарь с ключами 'title' и 'desc'
+			или None, если название извлечь не удалось
+	"""
+	text = response.strip()
+	if text.startswith('{'):
+		result = _validate(text)
+		if result is not None:
+			return result
+
+	fenced = _FENCE_RE.search(text)
+	candidate = fenced.group(1) if fenced else text
+	start, end = candidate.find('{'), candidate.rfind('}')
+	if start != -1 and end > start:
+		result = _validate(candidate[start:end + 1])
+		if result is not None:
+			return result
+	if start != -1:
+		result = _parse_partial_json(candidate[start:])
+		if result is not None:
+			return result
+	return _parse_legacy(text)
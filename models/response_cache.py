@@ -0,0 +1,198 @@
+"""
+Модуль кэша ответов ChatGPT для детерминированных запросов.
+
+Содержит:
+- ResponseCache: LRU-кэш ответов с TTL
+
+Ключ кэша - SHA-256 от модели, списка сообщений и параметров генерации
+(max_tokens, temperature, response_format). Кэш включается для режима
+полем ModelRoute.cache - числом хранимых вариантов ответа:
+- 1: одинаковый запрос получает тот же ответ (перевод);
+- N > 1: по ключу накапливается N ответов, затем выдается случайный
+  из них (факты: повторная кнопка "Хочу ещё факт" не возвращает один и
+  тот же факт). Повторяющиеся ответы тоже считаются: иначе ключ, по
+  которому модель почти всегда отвечает одинаково, никогда не набрал бы
+  N вариантов, а частые ответы выдаются с той же частотой, что и от API.
+
+Кэшируются только короткие истории (не длиннее Config.GPT_CACHE_MAX_MESSAGES
+сообщений вместе с системным): длинные диалоги не повторяются.
+
+Одновременные одинаковые запросы при промахе объединяет ChatGpt
+(см. SingleFlight), поэтому к API уходит один запрос.
+
+Вызывающий код может передать проверку ответа (accept): ответ, который
+он не сможет использовать (например, неразбираемый JSON рекомендации),
+возвращается, но не сохраняется в кэш. Отклоненные ответы учитываются
+в gpt.cache.<режим>.rejected.
+
+Показатели: gpt.cache.<режим>.hit / .miss / .requests и общие
+gpt.cache.hit / gpt.cache.requests, доля попаданий - hit_rate().
+
+Зависимости:
+- common: Метрики
+- config: Размер кэша, TTL и ограничение длины истории
+"""
+
+import hashlib
+import json
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from common import metrics
+from config import Config
+
+CACHED_PARAMS = ('model', 'messages', 'max_tokens', 'temperature', 'response_format')
+
+
+class ResponseCache:
+	"""
+	LRU-кэш ответов ChatGPT с ограничением времени жизни.
+
+	Attributes:
+		max_entries (int): Максимальное количество ключей
+		ttl (float): Время жизни записи в секундах
+		max_messages (int): Максимальная длина кэшируемой истории
+	"""
+
+	def __init__(
+		self,
+		max_entries: Optional[int] = None,
+		ttl: Optional[float] = None,
+		max_messages: Optional[int] = None,
+	):
+		"""
+		Инициализирует пустой кэш. Не заданные параметры берутся из Config.
+
+		Args:
+			max_entries (Optional[int]): Максимальное количество ключей
+			ttl (Optional[float]): Время жизни записи в секундах
+			max_messages (Optional[int]): Максимальная длина кэшируемой истории
+		"""
+		self.max_entries = max_entries or Config.GPT_CACHE_MAX_ENTRIES
+		self.ttl = Config.GPT_CACHE_TTL if ttl is None else ttl
+		self.max_messages = max_messages or Config.GPT_CACHE_MAX_MESSAGES
+		self._entries: 'OrderedDict[str, Tuple[float, List[str]]]' = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	@staticmethod
+	def make_key(params: Dict[str, Any]) -> str:
+		"""
+		Вычисляет ключ кэша по параметрам запроса.
+
+		Args:
+			params (Dict[str, Any]): Параметры chat.completions.create
+
+		Returns:
+			str: Шестнадцатеричный SHA-256
+		"""
+		payload = {name: params.get(name) for name in CACHED_PARAMS}
+		raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+		return hashlib.sha256(raw.encode()).hexdigest()
+
+	def accepts(self, params: Dict[str, Any]) -> bool:
+		"""
+		Проверяет, подходит ли запрос для кэширования по длине истории.
+
+		Args:
+			params (Dict[str, Any]): Параметры запроса
+
+		Returns:
+			bool: True, если история достаточно короткая
+		"""
+		return len(params['messages']) <= self.max_messages
+
+	def get(self, key: str, variants: int = 1) -> Optional[str]:
+		"""
+		Возвращает ответ из кэша, если накоплено нужное число вариантов.
+
+		Args:
+			key (str): Ключ кэша
+			variants (int): Число вариантов ответа для ключа
+
+		Returns:
+			Optional[str]: Ответ или None
+		"""
+		entry = self._entries.get(key)
+		if entry is None:
+			return None
+		expires, responses = entry
+		if expires <= time.monotonic():
+			del self._entries[key]
+			return None
+		if len(responses) < variants:
+			return None
+		self._entries.move_to_end(key)
+		return responses[0] if variants == 1 else random.choice(responses)
+
+	def put(self, key: str, response: str, variants: int = 1) -> None:
+		"""
+		Сохраняет ответ в кэш.
+
+		Args:
+			key (str): Ключ кэша
+			response (str): Ответ
+			variants (int): Число вариантов ответа для ключа
+		"""
+		entry = self._entries.get(key)
+		if entry is None or entry[0] <= time.monotonic():
+			self._entries[key] = (time.monotonic() + self.ttl, [response])
+		elif len(entry[1]) < variants:
+			entry[1].append(response)
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+
+	async def fetch(
+		self,
+		mode: str,
+		key: str,
+		variants: int,
+		load: Callable[[], Awaitable[str]],
+		accept: Optional[Callable[[str], bool]] = None,
+	) -> str:
+		"""
+		Возвращает ответ из кэша или загружает и сохраняет его.
+
+		Args:
+			mode (str): Режим (имя промпта) для показателей
+			key (str): Ключ кэша (см. make_key)
+			variants (int): Число вариантов ответа для ключа
+			load (Callable[[], Awaitable[str]]): Выполняет запрос к API
+			accept (Optional[Callable[[str], bool]]): Проверка ответа перед сохранением в кэш
+
+		Returns:
+			str: Ответ ChatGPT
+		"""
+		metrics.inc('gpt.cache.requests')
+		metrics.inc(f'gpt.cache.{mode}.requests')
+		cached = self.get(key, variants)
+		if cached is not None:
+			metrics.inc('gpt.cache.hit')
+			metrics.inc(f'gpt.cache.{mode}.hit')
+			return cached
+		metrics.inc(f'gpt.cache.{mode}.miss')
+
+		response = await load()
+		if accept is None or accept(response):
+			self.put(key, response, variants)
+		else:
+			metrics.inc(f'gpt.cache.{mode}.rejected')
+		return response
+
+	@staticmethod
+	def hit_rate(mode: Optional[str] = None) -> float:
+		"""
+		Возвращает долю попаданий в кэш.
+
+		Args:
+			mode (Optional[str]): Режим или None для всех режимов
+
+		Returns:
+			float: Доля попаданий от 0 до 1
+		"""
+		prefix = 'gpt.cache' if mode is None else f'gpt.cache.{mode}'
+		return metrics.ratio(f'{prefix}.hit', f'{prefix}.requests')
@@ -0,0 +1,332 @@
+"""
+Модуль маршрутизации запросов к ChatGPT по режимам.
+
+Содержит:
+- ModelRoute: Параметры запроса для режима (модель, max_tokens, temperature, endpoint)
+- ModelRouter: Таблица маршрутов по имени промпта
+- GPTClientPool: Пул клиентов ChatGPT с общим HTTP-клиентом
+- DEFAULT_ROUTES: Маршруты по умолчанию
+
+Ключ маршрута - имя промпта GPTMessage (eng_rus, quiz, media, random, gpt...).
+Ключ, оканчивающийся на '*', задает префикс: 'talk_*' подходит для всех
+знаменитостей. Точное совпадение приоритетнее префикса, более длинный
+префикс - более короткого. Для остальных промптов используется маршрут '*'.
+
+Маршруты по умолчанию переопределяются JSON-объектом в GPT_ROUTES,
+например: {"quiz": {"model": "gpt-4o-mini", "max_tokens": 300}}.
+Не указанные поля берутся из маршрута, который подошел бы этому ключу
+без переопределения (например, 'talk_queen' наследует поля 'talk_*').
+
+Для режимов с полем cache ответы на одинаковые короткие запросы
+кэшируются (общий ResponseCache для всех клиентов пула); отключить кэш
+для режима можно через GPT_ROUTES, например {"random": {"cache": 0}}.
+
+Если задан GPT_FALLBACK_MODEL или GPT_FALLBACK_BASE_URL, запрос, не
+выполненный из-за сбоя сервиса или разомкнутого предохранителя,
+повторяется на резервной модели (endpoint).
+
+Зависимости:
+- httpx: Общий пул соединений (импортируется при первом запросе или при старте)
+- h2: HTTP/2 для пула соединений (необязательно, pip install httpx[http2])
+- common: Метрики
+- config: Модели и таблица маршрутов
+- exception: Ошибки конфигурации
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, fields, replace
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from common import metrics
+from config import Config
+from exception import BackendUnavailableError, ConfigurationError
+
+from .chat_gpt import ChatGpt, GPTMessage
+from .response_cache import ResponseCache
+
+if TYPE_CHECKING:
+	import httpx
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+	"""
+	Параметры запроса к ChatGPT для режима.
+
+	Attributes:
+		model (str): Модель
+		max_tokens (Optional[int]): Ограничение длины ответа в токенах
+		temperature (Optional[float]): Температура генерации
+		base_url (Optional[str]): Адрес API, если отличается от Config.GPT_BASE_URL
+		hedge (bool): Разрешены ли дублирующие запросы (для коротких идемпотентных режимов)
+		cache (int): Число кэшируемых вариантов ответа (0 - без кэша, см. ResponseCache)
+	"""
+	model: str
+	max_tokens: Optional[int] = None
+	temperature: Optional[float] = None
+	base_url: Optional[str] = None
+	hedge: bool = False
+	cache: int = 0
+
+
+DEFAULT_ROUTES: Dict[str, ModelRoute] = {
+	'*': ModelRoute(Config.GPT_MODEL),
+	'gpt': ModelRoute(Config.GPT_MODEL, max_tokens=1000, temperature=0.7),
+	'talk_*': ModelRoute(Config.GPT_MODEL, max_tokens=800, temperature=0.9),
+	'eng_rus': ModelRoute(Config.GPT_FAST_MODEL, max_tokens=1000, temperature=0.2, hedge=True, cache=1),
+	'rus_eng': ModelRoute(Config.GPT_FAST_MODEL, max_tokens=1000, temperature=0.2, hedge=True, cache=1),
+	'quiz': ModelRoute(Config.GPT_FAST_MODEL, max_tokens=300, temperature=0.5),
+	'random': ModelRoute(Config.GPT_FAST_MODEL, max_tokens=300, temperature=1.0, hedge=True, cache=10),
+	'media': ModelRoute(Config.GPT_FAST_MODEL, max_tokens=300, temperature=0.8, hedge=True, cache=5),
+	'summary': ModelRoute(Config.GPT_SUMMARY_MODEL, max_tokens=500, temperature=0.3),
+}
+
+
+class ModelRouter:
+	"""
+	Таблица маршрутов по имени промпта.
+
+	Attributes:
+		routes (Dict[str, ModelRoute]): Маршруты по ключу
+	"""
+
+	def __init__(self, routes: Optional[Dict[str, ModelRoute]] = None, overrides: Optional[str] = None):
+		"""
+		Инициализирует таблицу.
+
+		Args:
+			routes (Optional[Dict[str, ModelRoute]]): Базовые маршруты (по умолчанию DEFAULT_ROUTES)
+			overrides (Optional[str]): JSON с переопределениями (по умолчанию Config.GPT_ROUTES)
+
+		Raises:
+			ConfigurationError: Если переопределения заданы некорректно
+		"""
+		self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+		self.routes.update(self._parse_overrides(Config.GPT_ROUTES if overrides is None else overrides))
+		self._cache: Dict[str, ModelRoute] = {}
+
+	def _parse_overrides(self, raw: str) -> Dict[str, ModelRoute]:
+		"""Разбирает JSON с переопределениями маршрутов."""
+		if not raw.strip():
+			return {}
+		try:
+			payload = json.loads(raw)
+		except ValueError as e:
+			raise ConfigurationError(f"GPT_ROUTES is not valid JSON: {e}")
+		if not isinstance(payload, dict):
+			raise ConfigurationError("GPT_ROUTES must be a JSON object")
+
+		allowed = {field.name for field in fields(ModelRoute)}
+		result: Dict[str, ModelRoute] = {}
+		for key, values in payload.items():
+			if isinstance(values, str):
+				values = {'model': values}
+			if not isinstance(values, dict) or not set(values) <= allowed:
+				raise ConfigurationError(f"Invalid GPT_ROUTES entry for '{key}': {values}")
+			base = self._match(key.rstrip('*') or '*')
+			result[key] = replace(base, **values)
+		return result
+
+	def resolve(self, prompt_name: str) -> ModelRoute:
+		"""
+		Возвращает маршрут для промпта.
+
+		Args:
+			prompt_name (str): Имя промпта без расширения
+
+		Returns:
+			ModelRoute: Параметры запроса
+		"""
+		route = self._cache.get(prompt_name)
+		if route is None:
+			route = self._cache[prompt_name] = self._match(prompt_name)
+		return route
+
+	def _match(self, prompt_name: str) -> ModelRoute:
+		"""Ищет маршрут: точное совпадение, самый длинный префикс, затем '*'."""
+		route = self.routes.get(prompt_name)
+		if route is not None:
+			return route
+		prefixes = [key[:-1] for key in self.routes if key.endswith('*') and key != '*']
+		matching = [prefix for prefix in prefixes if prompt_name.startswith(prefix)]
+		if matching:
+			return self.routes[max(matching, key=len) + '*']
+		return self.routes.get('*') or ModelRoute(Config.GPT_MODEL)
+
+
+class GPTClientPool:
+	"""
+	Пул клиентов ChatGPT, выбирающий параметры запроса по режиму.
+
+	Для каждого endpoint создается один клиент; все клиенты используют
+	общий httpx.AsyncClient и, следовательно, общий пул соединений.
+	Число одновременных HTTP-запросов (включая дублирующие) ограничено
+	общим семафором, который клиенты занимают на время каждого вызова
+	API, а размер пула соединений равен этому ограничению, поэтому
+	запросы не ждут свободного соединения внутри httpx. Если установлен пакет h2,
+	соединения используют HTTP/2.
+
+	HTTP-клиент и клиенты ChatGPT (вместе с импортом openai и httpx)
+	создаются при первом запросе или в start(), а не при импорте модуля.
+
+	Attributes:
+		router (ModelRouter): Таблица маршрутов
+		fallback (Optional[ModelRoute]): Резервный маршрут при сбоях
+		cache (ResponseCache): Общий кэш ответов
+	"""
+
+	def __init__(self, router: Optional[ModelRouter] = None, fallback: Optional[ModelRoute] = None):
+		"""
+		Инициализирует пул.
+
+		Args:
+			router (Optional[ModelRouter]): Таблица маршрутов (по умолчанию из Config)
+			fallback (Optional[ModelRoute]): Резервный маршрут (по умолчанию из Config)
+		"""
+		self.router = router or ModelRouter()
+		if fallback is None and (Config.GPT_FALLBACK_MODEL or Config.GPT_FALLBACK_BASE_URL):
+			fallback = ModelRoute(
+				Config.GPT_FALLBACK_MODEL or Config.GPT_MODEL,
+				base_url=Config.GPT_FALLBACK_BASE_URL,
+			)
+		self.fallback = fallback
+		self.cache = ResponseCache()
+		self.http2 = Config.GPT_HTTP2 and find_spec('h2') is not None
+		self._semaphore = asyncio.Semaphore(Config.GPT_MAX_CONCURRENCY)
+		self._http_client: Optional['httpx.AsyncClient'] = None
+		self._clients: Dict[Optional[str], ChatGpt] = {}
+
+	def _create_http_client(self) -> 'httpx.AsyncClient':
+		"""Создает общий HTTP-клиент с настроенным пулом соединений."""
+		import httpx
+
+		return httpx.AsyncClient(
+			timeout=httpx.Timeout(Config.REQUEST_TIMEOUT, connect=Config.GPT_CONNECT_TIMEOUT),
+			limits=httpx.Limits(
+				max_connections=Config.GPT_MAX_CONCURRENCY,
+				max_keepalive_connections=Config.GPT_MAX_CONCURRENCY,
+				keepalive_expiry=Config.GPT_KEEPALIVE_EXPIRY,
+			),
+			http2=self.http2,
+			proxy=Config.PROXY,
+		)
+
+	def client_for(self, route: ModelRoute) -> ChatGpt:
+		"""
+		Возвращает клиент для endpoint маршрута.
+
+		Args:
+			route (ModelRoute): Маршрут
+
+		Returns:
+			ChatGpt: Клиент ChatGPT
+		"""
+		client = self._clients.get(route.base_url)
+		if client is None:
+			if self._http_client is None:
+				self._http_client = self._create_http_client()
+			client = ChatGpt(
+				route.model,
+				base_url=route.base_url,
+				http_client=self._http_client,
+				cache=self.cache,
+				limiter=self._semaphore,
+			)
+			self._clients[route.base_url] = client
+		return client
+
+	async def request(
+		self,
+		message: GPTMessage,
+		response_format: Optional[Dict[str, Any]] = None,
+		model: Optional[str] = None,
+		use_cache: bool = True,
+		accept: Optional[Callable[[str], bool]] = None,
+	) -> str:
+		"""
+		Отправляет запрос с параметрами маршрута для режима сообщения.
+
+		Args:
+			message (GPTMessage): Объект с сообщениями для отправки
+			response_format (Optional[Dict[str, Any]]): Формат структурированного ответа
+			model (Optional[str]): Модель вместо модели маршрута
+			use_cache (bool): Использовать кэш ответов режима (False - получить новый ответ)
+			accept (Optional[Callable[[str], bool]]): Проверка ответа перед сохранением в кэш
+
+		Returns:
+			str: Ответ от ChatGPT
+
+		Raises:
+			APIConnectionError: При сбое запроса к API
+		"""
+		route = self.router.resolve(message.prompt_name)
+		params: Dict[str, Any] = {
+			'response_format': response_format,
+			'max_tokens': route.max_tokens,
+			'temperature': route.temperature,
+			'cache': route.cache if use_cache else 0,
+			'accept': accept,
+		}
+		try:
+			return await self.client_for(route).request(
+				message, model=model or route.model, hedge=route.hedge, **params
+			)
+		except BackendUnavailableError as e:
+			if self.fallback is None:
+				raise
+			logger.warning("Falling back to %s for %s: %s", self.fallback.model, message.prompt_name, e)
+			metrics.inc('gpt.fallback')
+			return await self.client_for(self.fallback).request(message, model=self.fallback.model, **params)
+
+	async def warmup(self, connections: Optional[int] = None) -> None:
+		"""
+		Заранее открывает соединения (TCP и TLS) с endpoint основного маршрута.
+
+		Открытые соединения остаются в пуле, поэтому первые запросы
+		пользователей не тратят время на установку соединения.
+		Ошибки только логируются.
+
+		Args:
+			connections (Optional[int]): Количество соединений
+				(по умолчанию Config.GPT_WARMUP_CONNECTIONS, для HTTP/2 - одно)
+		"""
+		count = 1 if self.http2 else (connections or Config.GPT_WARMUP_CONNECTIONS)
+		client = self.client_for(self.router.resolve('*'))
+		started = time.monotonic()
+		results = await asyncio.gather(
+			*(client.warmup() for _ in range(min(count, Config.GPT_MAX_CONCURRENCY))),
+			return_exceptions=True,
+		)
+		failed = [r for r in results if isinstance(r, Exception)]
+		if failed:
+			logger.warning("OpenAI warmup: %d of %d connections failed: %s", len(failed), len(results), failed[0])
+		else:
+			logger.info(
+				"OpenAI warmup: %d connection(s) ready in %.2f s (http2=%s)",
+				len(results), time.monotonic() - started, self.http2,
+			)
+
+	async def start(self) -> None:
+		"""
+		Создает клиент основного endpoint и прогревает соединения.
+
+		Вызывается при старте диспетчера, до начала поллинга.
+
+		Raises:
+			ConfigurationError: Если не установлен GPT_TOKEN
+		"""
+		self.client_for(self.router.resolve('*'))
+		await self.warmup()
+
+	async def close(self) -> None:
+		"""Закрывает общий HTTP-клиент."""
+		if self._http_client is not None:
+			await self._http_client.aclose()
+			self._http_client = None
+			self._clients.clear()
@@ -0,0 +1,104 @@
+"""
+Модуль объединения одновременных одинаковых запросов (single-flight).
+
+Содержит:
+- SingleFlight: Карта выполняющихся запросов по ключу
+
+Когда несколько пользователей одновременно вызывают один и тот же запрос
+(популярная тема викторины, жанр рекомендаций), выполняется только первый
+вызов, остальные ждут его результата или ошибки. Ожидающие учитываются
+счетчиком ссылок: отмена одного из них (например, при остановке бота или
+отключении пользователя) не отменяет общий запрос, пока его ждет кто-то
+еще. Запрос отменяется, только когда ушли все ожидающие.
+
+Зависимости:
+- common: Метрики
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from common import metrics
+
+T = TypeVar('T')
+
+
+class _Call:
+	"""Выполняющийся запрос и число его ожидающих."""
+
+	__slots__ = ('task', 'waiters')
+
+	def __init__(self, task: asyncio.Task):
+		self.task = task
+		self.waiters = 0
+
+
+class SingleFlight:
+	"""
+	Объединяет одновременные вызовы с одинаковым ключом в один.
+
+	Attributes:
+		name (str): Префикс показателей (<name>.coalesced)
+	"""
+
+	def __init__(self, name: str = 'single_flight'):
+		"""
+		Инициализирует пустую карту запросов.
+
+		Args:
+			name (str): Префикс показателей
+		"""
+		self.name = name
+		self._calls: Dict[Hashable, _Call] = {}
+
+	def __len__(self) -> int:
+		return len(self._calls)
+
+	async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+		"""
+		Выполняет запрос или присоединяется к уже выполняющемуся.
+
+		Args:
+			key (Hashable): Ключ запроса
+			factory (Callable[[], Awaitable[T]]): Создает корутину запроса
+
+		Returns:
+			T: Результат общего запроса
+
+		Raises:
+			Exception: Ошибка общего запроса (получают все ожидающие)
+		"""
+		call = self._calls.get(key)
+		if call is None or call.task.cancelled():
+			# Отмененный запрос, еще не убранный из карты, не подходит: начинаем новый
+			call = _Call(asyncio.create_task(factory()))
+			self._calls[key] = call
+			call.task.add_done_callback(lambda task: self._finish(key, call))
+		else:
+			metrics.inc(f'{self.name}.coalesced')
+
+		call.waiters += 1
+		try:
+			# shield: отмена ожидающего не передается в общий запрос
+			return await asyncio.shield(call.task)
+		except asyncio.CancelledError:
+			if call.waiters == 1 and not call.task.done():
+				call.task.cancel()
+				# Сразу убираем из карты: следующий вызов начнет новый запрос,
+				# а не получит CancelledError отмененного
+				self._forget(key, call)
+			raise
+		finally:
+			call.waiters -= 1
+
+	def _forget(self, key: Hashable, call: _Call) -> None:
+		"""Убирает запрос из карты, если ключ еще указывает на него."""
+		if self._calls.get(key) is call:
+			del self._calls[key]
+
+	def _finish(self, key: Hashable, call: _Call) -> None:
+		"""Убирает завершенный запрос из карты."""
+		self._forget(key, call)
+		if not call.task.cancelled():
+			# Ошибка считается полученной, даже если все ожидающие ушли
+			call.task.exception()
@@ -0,0 +1,145 @@
+"""
+Модуль фонового сжатия длинных диалогов.
+
+Содержит:
+- HistorySummarizer: Планировщик кратких содержаний истории GPTMessage
+
+Когда история диалога превышает Config.SUMMARY_THRESHOLD сообщений,
+старые сообщения (кроме последних Config.SUMMARY_KEEP_LAST) пересказываются
+более дешевой моделью и заменяются одним системным сообщением.
+Сжатие выполняется в фоновой задаче между репликами пользователя,
+поэтому не увеличивает задержку ответа.
+
+Зависимости:
+- chat_gpt: GPTMessage
+- routing: Пул клиентов ChatGPT
+- common: Роли сообщений и метрики
+- config: Модель и пороги сжатия
+- exception: Обработка ошибок API
+"""
+
+import asyncio
+import logging
+from typing import Optional, Set
+
+from common import GPTRole, metrics
+from config import Config
+from exception import APIConnectionError
+
+from .chat_gpt import GPTMessage
+from .routing import GPTClientPool
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = 'Краткое содержание предыдущей части диалога:\n'
+
+_SPEAKERS = {
+	GPTRole.SYSTEM.value: 'Контекст',
+	GPTRole.USER.value: 'Пользователь',
+	GPTRole.ASSISTANT.value: 'Ассистент',
+}
+
+
+class HistorySummarizer:
+	"""
+	Планировщик фонового сжатия истории диалогов.
+
+	Attributes:
+		threshold (int): Длина истории, после которой запускается сжатие
+		keep_last (int): Количество последних сообщений, которые не сжимаются
+		model (str): Модель для составления краткого содержания
+	"""
+
+	def __init__(
+		self,
+		client: GPTClientPool,
+		model: Optional[str] = None,
+		threshold: Optional[int] = None,
+		keep_last: Optional[int] = None,
+	):
+		"""
+		Инициализирует планировщик. Не заданные параметры берутся из Config.
+
+		Args:
+			client (GPTClientPool): Пул клиентов ChatGPT
+			model (Optional[str]): Модель для кратких содержаний
+			threshold (Optional[int]): Порог длины истории в сообщениях
+			keep_last (Optional[int]): Количество последних сообщений без сжатия
+		"""
+		self._client = client
+		self.model = model or Config.GPT_SUMMARY_MODEL
+		self.threshold = Config.SUMMARY_THRESHOLD if threshold is None else threshold
+		self.keep_last = Config.SUMMARY_KEEP_LAST if keep_last is None else keep_last
+		self._pending: Set[int] = set()
+		self._tasks: Set[asyncio.Task] = set()
+
+	def schedule(self, message: GPTMessage) -> None:
+		"""
+		Запускает сжатие истории в фоне, если она превысила порог.
+
+		Повторный вызов для диалога, который уже сжимается, ничего не делает.
+
+		Args:
+			message (GPTMessage): Диалог пользователя
+		"""
+		if self.threshold <= 0 or len(message) - 1 <= self.threshold or id(message) in self._pending:
+			return
+		self._pending.add(id(message))
+		task = asyncio.create_task(self.summarize(message))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+		task.add_done_callback(lambda _: self._pending.discard(id(message)))
+
+	async def summarize(self, message: GPTMessage) -> bool:
+		"""
+		Сжимает старую часть истории диалога.
+
+		Args:
+			message (GPTMessage): Диалог пользователя
+
+		Returns:
+			bool: True, если история была сжата
+		"""
+		history = message.message_list[1:]
+		count = len(history) - self.keep_last
+		if count < 2:
+			return False
+
+		transcript = '\n\n'.join(
+			f"{_SPEAKERS.get(item['role'], item['role'])}: {item['content']}"
+			for item in history[:count]
+		)
+		request = GPTMessage('summary')
+		request.update(GPTRole.USER, transcript)
+		try:
+			summary = await self._client.request(request, model=self.model)
+		except APIConnectionError as e:
+			metrics.inc('summary.failed')
+			logger.warning("Failed to summarize %d messages: %s", count, e)
+			return False
+		if not summary.strip():
+			return False
+
+		# Пока шел запрос, в конец истории могли добавиться новые сообщения;
+		# они сохраняются, заменяются только уже пересказанные
+		message.compact(count, SUMMARY_PREFIX + summary.strip())
+		metrics.inc('summary.compacted')
+		metrics.inc('summary.messages', count)
+		logger.info("Summarized %d messages into %d chars", count, len(summary))
+		return True
+
+	async def close(self, timeout: float = 5.0) -> None:
+		"""
+		Дожидается начатых задач сжатия, затем отменяет оставшиеся.
+
+		Запросы за уже начатые краткие содержания оплачиваются в любом случае,
+		поэтому при остановке им дается timeout секунд на завершение.
+
+		Args:
+			timeout (float): Время ожидания в секундах
+		"""
+		if self._tasks and timeout > 0:
+			await asyncio.wait(list(self._tasks), timeout=timeout)
+		for task in list(self._tasks):
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,37 @@
+"""
+Пакет хранилищ состояния Telegram бота.
+
+Содержит:
+- SessionStorage: Хранилище FSM с вытеснением неактивных сессий
+- estimate_size: Оценка объема памяти, занимаемого объектом
+- PreferenceStore, preferences: Постоянные предпочтения пользователей и общий экземпляр
+- MEDIA_DISLIKE, FACT, QUIZ_QUESTION: Виды записей предпочтений
+- QuestionBank, quiz_bank: Общий банк вопросов викторины и его экземпляр
+- FileIdStore, file_ids: file_id загруженных изображений и общий экземпляр
+- normalize_text, text_digest: Нормализация и хеширование текстов
+
+Пример использования:
+	from storage import SessionStorage
+	dp = Dispatcher(storage=SessionStorage())
+"""
+
+from .session import SessionStorage, estimate_size
+from .preferences import (
+	PreferenceStore, MEDIA_DISLIKE, FACT, QUIZ_QUESTION, normalize_text, text_digest,
+)
+from .question_bank import QuestionBank
+from .file_ids import FileIdStore
+
+preferences = PreferenceStore()
+quiz_bank = QuestionBank()
+file_ids = FileIdStore()
+
+__all__ = [
+	'SessionStorage',
+	'estimate_size',
+	'PreferenceStore', 'preferences',
+	'MEDIA_DISLIKE', 'FACT', 'QUIZ_QUESTION',
+	'QuestionBank', 'quiz_bank',
+	'FileIdStore', 'file_ids',
+	'normalize_text', 'text_digest',
+]
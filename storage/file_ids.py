@@ -0,0 +1,198 @@
+"""
+Модуль хранения file_id изображений, загруженных в Telegram.
+
+Содержит:
+- FileIdStore: file_id по хешу содержимого изображения с хранением в SQLite
+
+file_id привязан к боту, поэтому записи хранятся по идентификатору бота
+и при старте загружаются в Resource.file_ids только для текущего бота.
+Запись пополняется после каждой загрузки изображения (см.
+middlewares.FileIdRecorder) и при предзагрузке (preupload): при старте
+все изображения, содержимое которых еще не загружалось, отправляются
+в служебный чат, и первый пользователь после развертывания получает
+их уже по file_id.
+
+Зависимости:
+- aiogram: Отправка изображений при предзагрузке
+- sqlite3: Хранение на диске (стандартная библиотека)
+- config: Путь к базе, служебный чат и число одновременных загрузок
+- common: Изображения ресурсов и метрики
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import suppress
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+
+from common import Resource, metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class FileIdStore:
+	"""
+	file_id изображений по хешу содержимого.
+
+	Attributes:
+		path (Optional[str]): Путь к базе или None (только память)
+		bot_id (Optional[int]): Идентификатор бота, для которого загружены записи
+	"""
+
+	def __init__(self, path: Optional[str] = None):
+		"""
+		Инициализирует хранилище. Не заданный путь берется из Config.
+
+		Args:
+			path (Optional[str]): Путь к базе SQLite
+		"""
+		self.path = path or Config.FILE_IDS_DB_PATH or None
+		self.bot_id: Optional[int] = None
+		self._db: Optional[sqlite3.Connection] = None
+		self._lock = threading.Lock()
+
+	async def start(self, bot: Bot) -> None:
+		"""
+		Открывает базу и загружает file_id бота (вызывается при старте диспетчера).
+
+		Args:
+			bot (Bot): Экземпляр бота
+		"""
+		self.bot_id = bot.id
+		if not self.path or self._db is not None:
+			return
+		rows = await asyncio.to_thread(self._open, bot.id)
+		Resource.file_ids.update(rows)
+		if rows:
+			logger.info("Loaded %d image file_ids", len(rows))
+
+	async def close(self) -> None:
+		"""Закрывает базу (вызывается при остановке диспетчера)."""
+		if self._db is not None:
+			with self._lock:
+				self._db.close()
+				self._db = None
+
+	def _open(self, bot_id: int) -> List[Tuple[str, str]]:
+		"""Открывает базу, создает таблицу и возвращает file_id бота."""
+		with self._lock:
+			db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+			db.execute('PRAGMA journal_mode=WAL')
+			db.execute(
+				'CREATE TABLE IF NOT EXISTS file_ids ('
+				'bot_id INTEGER NOT NULL, digest TEXT NOT NULL, file_id TEXT NOT NULL, '
+				'created REAL NOT NULL, PRIMARY KEY (bot_id, digest)) WITHOUT ROWID'
+			)
+			self._db = db
+			return db.execute('SELECT digest, file_id FROM file_ids WHERE bot_id = ?', (bot_id,)).fetchall()
+
+	def _execute(self, sql: str, params: Tuple = ()) -> None:
+		"""Выполняет запрос под блокировкой соединения."""
+		with self._lock:
+			if self._db is not None:
+				self._db.execute(sql, params)
+
+	async def remember(self, digest: str, file_id: str) -> None:
+		"""
+		Сохраняет file_id загруженного изображения.
+
+		Args:
+			digest (str): Хеш содержимого изображения
+			file_id (str): file_id из ответа Telegram
+		"""
+		if Resource.file_ids.get(digest) == file_id:
+			return
+		Resource.file_ids[digest] = file_id
+		metrics.set('assets.file_ids', len(Resource.file_ids))
+		if not self.path or self.bot_id is None:
+			return
+		try:
+			await asyncio.to_thread(
+				self._execute,
+				'INSERT OR REPLACE INTO file_ids (bot_id, digest, file_id, created) VALUES (?, ?, ?, ?)',
+				(self.bot_id, digest, file_id, time.time()),
+			)
+		except sqlite3.Error as e:
+			logger.warning("Failed to store file_id for %s: %s", digest, e)
+
+	async def forget(self, file_id: str) -> None:
+		"""
+		Удаляет file_id, который Telegram больше не принимает.
+
+		Args:
+			file_id (str): Отклоненный file_id
+		"""
+		digests = [digest for digest, known in Resource.file_ids.items() if known == file_id]
+		for digest in digests:
+			del Resource.file_ids[digest]
+			logger.warning("Telegram rejected cached file_id for %s, will upload again", digest)
+			if self.path and self.bot_id is not None:
+				with suppress(sqlite3.Error):
+					await asyncio.to_thread(
+						self._execute,
+						'DELETE FROM file_ids WHERE bot_id = ? AND digest = ?',
+						(self.bot_id, digest),
+					)
+
+	async def preupload(self, bot: Bot, chat_id: Optional[int] = None, concurrency: Optional[int] = None) -> int:
+		"""
+		Загружает в служебный чат изображения, которых еще нет в хранилище.
+
+		Одинаковые по содержимому изображения загружаются один раз.
+		Загрузки выполняются параллельно, темп задает OutboundRateLimiter
+		бота (лимит служебного чата); отправленные сообщения удаляются.
+
+		Args:
+			bot (Bot): Экземпляр бота
+			chat_id (Optional[int]): Служебный чат (по умолчанию Config.SERVICE_CHAT_ID)
+			concurrency (Optional[int]): Максимум одновременных загрузок
+
+		Returns:
+			int: Количество загруженных изображений
+		"""
+		chat_id = chat_id or Config.SERVICE_CHAT_ID
+		if not chat_id:
+			return 0
+		if self.bot_id is None:
+			await self.start(bot)
+
+		pending: Dict[str, Resource] = {}
+		for name in Resource.images():
+			resource = Resource(name)
+			digest = resource.digest
+			if digest and digest not in Resource.file_ids:
+				pending.setdefault(digest, resource)
+		if not pending:
+			logger.info("All images are already uploaded, skipping pre-upload")
+			return 0
+
+		semaphore = asyncio.Semaphore(concurrency or Config.PREUPLOAD_CONCURRENCY)
+
+		async def upload(digest: str, resource: Resource) -> bool:
+			async with semaphore:
+				try:
+					message = await bot.send_photo(chat_id=chat_id, photo=resource.upload_file)
+				except TelegramAPIError as e:
+					logger.warning("Failed to pre-upload image %s: %s", resource.upload_file.filename, e)
+					return False
+				if message.photo:
+					await self.remember(digest, message.photo[-1].file_id)
+				with suppress(TelegramAPIError):
+					await bot.delete_message(chat_id=chat_id, message_id=message.message_id)
+				return bool(message.photo)
+
+		started = time.monotonic()
+		results = await asyncio.gather(*(upload(digest, resource) for digest, resource in pending.items()))
+		uploaded = sum(results)
+		metrics.inc('assets.preuploaded', uploaded)
+		logger.info(
+			"Pre-uploaded %d of %d images in %.1f s",
+			uploaded, len(pending), time.monotonic() - started,
+		)
+		return uploaded
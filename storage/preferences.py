@@ -0,0 +1,261 @@
+"""
+Модуль постоянного хранилища пользовательских предпочтений.
+
+Содержит:
+- PreferenceStore: Отклоненные рекомендации, показанные факты и заданные вопросы
+- normalize_text: Нормализация текста перед хешированием
+- text_digest: 64-битный хеш нормализованного текста
+- MEDIA_DISLIKE, FACT, QUIZ_QUESTION: Виды записей
+
+Хранятся не тексты, а 64-битные хеши нормализованного текста: в SQLite
+(таблица без rowid) и в памяти - множество хешей на пользователя и вид
+с проверкой принадлежности за O(1). Записи пользователя загружаются
+из базы при первом обращении; в памяти держатся записи не более
+Config.PREFERENCES_MAX_USERS недавних пользователей. На пользователя
+и вид хранится не больше Config.PREFERENCES_MAX_ITEMS последних записей.
+
+Если Config.PREFERENCES_DB_PATH пуст, записи живут только в памяти.
+
+Зависимости:
+- sqlite3: Хранение на диске (стандартная библиотека)
+- config: Путь к базе и ограничения
+- common: Метрики
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Collection, Dict, Optional, Tuple, TypeVar
+
+from common import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MEDIA_DISLIKE = 'media_dislike'
+FACT = 'fact'
+QUIZ_QUESTION = 'quiz'
+
+T = TypeVar('T')
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_text(text: str) -> str:
+	"""
+	Нормализует текст для сравнения: регистр, 'ё', пунктуация и пробелы.
+
+	Args:
+		text (str): Исходный текст
+
+	Returns:
+		str: Нормализованный текст
+	"""
+	return _NON_WORD.sub(' ', text.lower().replace('ё', 'е')).strip()
+
+
+def text_digest(text: str) -> int:
+	"""
+	Вычисляет 64-битный хеш нормализованного текста.
+
+	Args:
+		text (str): Исходный текст
+
+	Returns:
+		int: Хеш как знаковое 64-битное целое (тип INTEGER в SQLite)
+	"""
+	digest = hashlib.blake2b(normalize_text(text).encode(), digest_size=8).digest()
+	return int.from_bytes(digest, 'big', signed=True)
+
+
+class PreferenceStore:
+	"""
+	Хешированные записи пользователей с постоянным хранением в SQLite.
+
+	Attributes:
+		path (Optional[str]): Путь к базе или None (только память)
+		max_items (int): Максимум записей на пользователя и вид
+		max_users (int): Максимум пользователей в памяти
+		max_retries (int): Максимум повторных запросов в first_unseen
+	"""
+
+	def __init__(
+		self,
+		path: Optional[str] = None,
+		max_items: Optional[int] = None,
+		max_users: Optional[int] = None,
+		max_retries: Optional[int] = None,
+	):
+		"""
+		Инициализирует хранилище. Не заданные параметры берутся из Config.
+
+		База открывается в start() или при первом обращении.
+
+		Args:
+			path (Optional[str]): Путь к базе SQLite
+			max_items (Optional[int]): Максимум записей на пользователя и вид
+			max_users (Optional[int]): Максимум пользователей в памяти
+			max_retries (Optional[int]): Максимум повторных запросов
+		"""
+		self.path = path or Config.PREFERENCES_DB_PATH or None
+		self.max_items = max_items or Config.PREFERENCES_MAX_ITEMS
+		self.max_users = max_users or Config.PREFERENCES_MAX_USERS
+		self.max_retries = Config.PREFERENCES_MAX_RETRIES if max_retries is None else max_retries
+		self._db: Optional[sqlite3.Connection] = None
+		self._lock = threading.Lock()
+		# Хеши по (пользователь, вид) в порядке добавления: dict сохраняет порядок для обрезки
+		self._items: 'OrderedDict[Tuple[int, str], Dict[int, None]]' = OrderedDict()
+
+	async def start(self) -> None:
+		"""Открывает базу (вызывается при старте диспетчера)."""
+		if self.path and self._db is None:
+			await asyncio.to_thread(self._open)
+
+	async def close(self) -> None:
+		"""Закрывает базу (вызывается при остановке диспетчера)."""
+		if self._db is not None:
+			with self._lock:
+				self._db.close()
+				self._db = None
+
+	def _open(self) -> None:
+		"""Открывает базу и создает таблицу."""
+		with self._lock:
+			if self._db is not None:
+				return
+			db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+			db.execute('PRAGMA journal_mode=WAL')
+			db.execute(
+				'CREATE TABLE IF NOT EXISTS preferences ('
+				'user_id INTEGER NOT NULL, kind TEXT NOT NULL, digest INTEGER NOT NULL, '
+				'created REAL NOT NULL, PRIMARY KEY (user_id, kind, digest)) WITHOUT ROWID'
+			)
+			self._db = db
+
+	async def _user_items(self, user_id: int, kind: str) -> Dict[int, None]:
+		"""Возвращает хеши пользователя, загружая их из базы при необходимости."""
+		key = (user_id, kind)
+		items = self._items.get(key)
+		if items is not None:
+			self._items.move_to_end(key)
+			return items
+		items = {}
+		if self.path:
+			if self._db is None:
+				await asyncio.to_thread(self._open)
+			rows = await asyncio.to_thread(
+				self._execute,
+				'SELECT digest FROM preferences WHERE user_id = ? AND kind = ? ORDER BY created',
+				(user_id, kind),
+			)
+			items = dict.fromkeys(row[0] for row in rows)
+		# Пока шла загрузка, запись могла появиться из другого обработчика
+		items = self._items.setdefault(key, items)
+		while len(self._items) > self.max_users:
+			self._items.popitem(last=False)
+		return items
+
+	def _execute(self, sql: str, params: Tuple = ()) -> list:
+		"""Выполняет запрос под блокировкой соединения."""
+		with self._lock:
+			if self._db is None:
+				return []
+			return self._db.execute(sql, params).fetchall()
+
+	async def digests(self, user_id: int, kind: str) -> Collection[int]:
+		"""
+		Возвращает хеши записей пользователя (только для чтения).
+
+		Args:
+			user_id (int): Идентификатор пользователя
+			kind (str): Вид записи
+
+		Returns:
+			Collection[int]: Хеши в порядке добавления (см. text_digest)
+		"""
+		return (await self._user_items(user_id, kind)).keys()
+
+	async def contains(self, user_id: int, kind: str, text: str) -> bool:
+		"""
+		Проверяет, есть ли запись у пользователя.
+
+		Args:
+			user_id (int): Идентификатор пользователя
+			kind (str): Вид записи
+			text (str): Текст записи
+
+		Returns:
+			bool: True, если запись есть
+		"""
+		return text_digest(text) in await self._user_items(user_id, kind)
+
+	async def add(self, user_id: int, kind: str, text: str) -> None:
+		"""
+		Добавляет запись пользователю.
+
+		Args:
+			user_id (int): Идентификатор пользователя
+			kind (str): Вид записи
+			text (str): Текст записи
+		"""
+		digest = text_digest(text)
+		items = await self._user_items(user_id, kind)
+		if digest in items:
+			return
+		items[digest] = None
+		trimmed = []
+		while len(items) > self.max_items:
+			oldest = next(iter(items))
+			del items[oldest]
+			trimmed.append(oldest)
+		if not self.path:
+			return
+		try:
+			await asyncio.to_thread(
+				self._execute,
+				'INSERT OR IGNORE INTO preferences (user_id, kind, digest, created) VALUES (?, ?, ?, ?)',
+				(user_id, kind, digest, time.time()),
+			)
+			for oldest in trimmed:
+				await asyncio.to_thread(
+					self._execute,
+					'DELETE FROM preferences WHERE user_id = ? AND kind = ? AND digest = ?',
+					(user_id, kind, oldest),
+				)
+		except sqlite3.Error as e:
+			logger.warning("Failed to store preference for user %s: %s", user_id, e)
+
+	async def first_unseen(
+		self,
+		user_id: int,
+		kind: str,
+		produce: Callable[[int], Awaitable[T]],
+		text_of: Callable[[T], str] = str,
+	) -> T:
+		"""
+		Запрашивает результат, пока он не окажется новым для пользователя.
+
+		Выполняет не больше 1 + max_retries попыток; если все результаты уже
+		есть у пользователя, возвращает последний.
+
+		Args:
+			user_id (int): Идентификатор пользователя
+			kind (str): Вид записи
+			produce (Callable[[int], Awaitable[T]]): Получает результат по номеру попытки
+			text_of (Callable[[T], str]): Текст результата для проверки
+
+		Returns:
+			T: Первый новый для пользователя результат
+		"""
+		for attempt in range(self.max_retries + 1):
+			result = await produce(attempt)
+			text = text_of(result)
+			if not text or not await self.contains(user_id, kind, text):
+				return result
+			metrics.inc(f'preferences.{kind}.filtered')
+		return result
@@ -0,0 +1,169 @@
+"""
+Модуль общего банка вопросов викторины.
+
+Содержит:
+- QuestionBank: Вопросы по темам, накопленные из ответов GPT
+
+Вопросы, сгенерированные GPT для одного пользователя, сохраняются в банк
+темы (без повторов по нормализованному тексту, см. text_digest) и выдаются
+другим пользователям, которые их еще не видели. GPT вызывается, только
+когда пользователь исчерпал банк темы; новый вопрос пополняет банк.
+
+Банк хранится в SQLite (по умолчанию в файле предпочтений) и целиком
+загружается в память при старте; размер темы ограничен
+Config.QUIZ_BANK_MAX_QUESTIONS.
+
+Зависимости:
+- sqlite3: Хранение на диске (стандартная библиотека)
+- config: Путь к базе и размер банка
+- common: Метрики
+"""
+
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from common import metrics
+from config import Config
+
+from .preferences import text_digest
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionBank:
+	"""
+	Банк вопросов викторины по темам.
+
+	Attributes:
+		path (Optional[str]): Путь к базе или None (только память)
+		max_questions (int): Максимум вопросов на тему
+	"""
+
+	def __init__(self, path: Optional[str] = None, max_questions: Optional[int] = None):
+		"""
+		Инициализирует пустой банк. Не заданные параметры берутся из Config.
+
+		Args:
+			path (Optional[str]): Путь к базе SQLite
+			max_questions (Optional[int]): Максимум вопросов на тему
+		"""
+		self.path = path or Config.QUIZ_BANK_DB_PATH or None
+		self.max_questions = max_questions or Config.QUIZ_BANK_MAX_QUESTIONS
+		self._db: Optional[sqlite3.Connection] = None
+		self._lock = threading.Lock()
+		self._questions: Dict[str, List[Tuple[int, str]]] = {}
+		self._digests: Dict[str, Set[int]] = {}
+
+	async def start(self) -> None:
+		"""Открывает базу и загружает вопросы (вызывается при старте диспетчера)."""
+		if not self.path or self._db is not None:
+			return
+		rows = await asyncio.to_thread(self._open)
+		for topic, digest, text in rows:
+			self._remember(topic, digest, text)
+		if rows:
+			logger.info("Loaded %d quiz questions for %d topics", len(rows), len(self._questions))
+
+	async def close(self) -> None:
+		"""Закрывает базу (вызывается при остановке диспетчера)."""
+		if self._db is not None:
+			with self._lock:
+				self._db.close()
+				self._db = None
+
+	def _open(self) -> List[Tuple[str, int, str]]:
+		"""Открывает базу, создает таблицу и возвращает сохраненные вопросы."""
+		with self._lock:
+			db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+			db.execute('PRAGMA journal_mode=WAL')
+			db.execute(
+				'CREATE TABLE IF NOT EXISTS quiz_questions ('
+				'topic TEXT NOT NULL, digest INTEGER NOT NULL, text TEXT NOT NULL, '
+				'created REAL NOT NULL, PRIMARY KEY (topic, digest)) WITHOUT ROWID'
+			)
+			self._db = db
+			return db.execute('SELECT topic, digest, text FROM quiz_questions ORDER BY created').fetchall()
+
+	def _remember(self, topic: str, digest: int, text: str) -> bool:
+		"""Добавляет вопрос в память, возвращает False для повтора или переполнения."""
+		digests = self._digests.setdefault(topic, set())
+		questions = self._questions.setdefault(topic, [])
+		if digest in digests or len(questions) >= self.max_questions:
+			return False
+		digests.add(digest)
+		questions.append((digest, text))
+		metrics.set(f'quiz.bank.{topic}.size', len(questions))
+		return True
+
+	def size(self, topic: str) -> int:
+		"""
+		Возвращает количество вопросов темы.
+
+		Args:
+			topic (str): Тема
+
+		Returns:
+			int: Количество вопросов
+		"""
+		return len(self._questions.get(topic, ()))
+
+	def pick(self, topic: str, seen: Collection[int]) -> Optional[str]:
+		"""
+		Выбирает вопрос темы, которого нет среди увиденных пользователем.
+
+		Поиск начинается со случайной позиции, чтобы пользователи
+		получали вопросы в разном порядке.
+
+		Args:
+			topic (str): Тема
+			seen (Collection[int]): Хеши вопросов, которые пользователь уже видел
+
+		Returns:
+			Optional[str]: Вопрос или None, если банк темы исчерпан
+		"""
+		metrics.inc('quiz.bank.requests')
+		questions = self._questions.get(topic)
+		if questions:
+			start = random.randrange(len(questions))
+			for index in range(len(questions)):
+				digest, text = questions[(start + index) % len(questions)]
+				if digest not in seen:
+					metrics.inc('quiz.bank.hit')
+					return text
+		metrics.inc('quiz.bank.miss')
+		return None
+
+	async def add(self, topic: str, text: str) -> bool:
+		"""
+		Добавляет вопрос в банк темы.
+
+		Args:
+			topic (str): Тема
+			text (str): Текст вопроса
+
+		Returns:
+			bool: True, если вопрос новый и сохранен
+		"""
+		digest = text_digest(text)
+		if not self._remember(topic, digest, text):
+			return False
+		if self.path and self._db is not None:
+			try:
+				await asyncio.to_thread(self._insert, topic, digest, text)
+			except sqlite3.Error as e:
+				logger.warning("Failed to store quiz question for %s: %s", topic, e)
+		return True
+
+	def _insert(self, topic: str, digest: int, text: str) -> None:
+		"""Записывает вопрос в базу."""
+		with self._lock:
+			if self._db is not None:
+				self._db.execute(
+					'INSERT OR IGNORE INTO quiz_questions (topic, digest, text, created) VALUES (?, ?, ?, ?)',
+					(topic, digest, text, time.time()),
+				)
@@ -0,0 +1,380 @@
+"""
+Модуль хранилища FSM с вытеснением неактивных сессий.
+
+Содержит:
+- SessionStorage: MemoryStorage с TTL, выгрузкой на диск и учетом памяти
+- estimate_size: Оценка объема памяти, занимаемого объектом
+
+Основные возможности:
+- Фоновая очистка сессий, неактивных дольше Config.SESSION_TTL
+- Необязательная выгрузка неактивных сессий на диск (pickle + zlib)
+  с прозрачным восстановлением при следующем обращении пользователя
+- Показатели session.bytes.<режим> с объемом состояния по режимам
+- Снимок всех сессий на диск при остановке и восстановление при старте
+
+Выгруженные файлы и снимок читаются через pickle, поэтому каталог выгрузки
+должен быть доступен только боту.
+
+Зависимости:
+- aiogram: Базовое хранилище FSM
+- config: TTL, интервал очистки, каталог выгрузки и путь снимка
+- common: Метрики
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import time
+import zlib
+from contextlib import suppress
+from typing import Any, Dict, Optional, Set, Tuple
+
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage, MemoryStorageRecord
+
+from common import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SPILL_EXTENSION = '.session'
+IDLE_MODE = 'idle'
+
+
+def estimate_size(obj: Any, seen: Optional[Set[int]] = None) -> int:
+	"""
+	Оценивает объем памяти объекта вместе с вложенными объектами.
+
+	Учитывает словари, последовательности, множества и атрибуты объектов
+	(__dict__ и __slots__). Общие объекты считаются один раз. Атрибуты из
+	_SHARED_SLOTS класса (общие для всех экземпляров, например системный
+	промпт GPTMessage) не учитываются: иначе их объем приписывается
+	каждой сессии.
+
+	Args:
+		obj (Any): Объект для оценки
+		seen (Optional[Set[int]]): Идентификаторы уже учтенных объектов
+
+	Returns:
+		int: Приблизительный объем в байтах
+	"""
+	seen = set() if seen is None else seen
+	if id(obj) in seen:
+		return 0
+	seen.add(id(obj))
+	size = sys.getsizeof(obj)
+	if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+		return size
+	if isinstance(obj, dict):
+		return size + sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in obj.items())
+	if isinstance(obj, (list, tuple, set, frozenset)):
+		return size + sum(estimate_size(item, seen) for item in obj)
+	if hasattr(obj, '__dict__'):
+		size += estimate_size(vars(obj), seen)
+	shared = getattr(type(obj), '_SHARED_SLOTS', ())
+	for slot in getattr(type(obj), '__slots__', ()):
+		if slot not in shared and hasattr(obj, slot):
+			size += estimate_size(getattr(obj, slot), seen)
+	return size
+
+
+class SessionStorage(MemoryStorage):
+	"""
+	Хранилище FSM в памяти с вытеснением неактивных сессий.
+
+	Attributes:
+		ttl (float): Время неактивности до вытеснения в секундах (0 - не вытеснять)
+		sweep_interval (float): Интервал фоновой очистки в секундах
+		spill_dir (Optional[str]): Каталог для выгрузки сессий или None
+		snapshot_path (Optional[str]): Файл снимка сессий или None
+	"""
+
+	def __init__(
+		self,
+		ttl: Optional[float] = None,
+		sweep_interval: Optional[float] = None,
+		spill_dir: Optional[str] = None,
+		snapshot_path: Optional[str] = None,
+	):
+		"""
+		Инициализирует хранилище. Не заданные параметры берутся из Config.
+
+		Args:
+			ttl (Optional[float]): Время неактивности до вытеснения в секундах
+			sweep_interval (Optional[float]): Интервал фоновой очистки в секундах
+			spill_dir (Optional[str]): Каталог для выгрузки сессий на диск
+			snapshot_path (Optional[str]): Файл снимка сессий при остановке
+		"""
+		super().__init__()
+		self.ttl = Config.SESSION_TTL if ttl is None else ttl
+		self.sweep_interval = Config.SESSION_SWEEP_INTERVAL if sweep_interval is None else sweep_interval
+		self.spill_dir = spill_dir or Config.SESSION_SPILL_DIR
+		self.snapshot_path = snapshot_path or Config.SESSION_SNAPSHOT_PATH or None
+		self._last_access: Dict[StorageKey, float] = {}
+		self._accounted: Dict[StorageKey, Tuple[str, int]] = {}
+		self._mode_bytes: Dict[str, int] = {}
+		self._spilled: Set[str] = set()
+		self._restoring: Dict[StorageKey, asyncio.Task] = {}
+		self._sweeper: Optional[asyncio.Task] = None
+		if self.spill_dir:
+			os.makedirs(self.spill_dir, exist_ok=True)
+			self._spilled = {
+				name[:-len(SPILL_EXTENSION)]
+				for name in os.listdir(self.spill_dir)
+				if name.endswith(SPILL_EXTENSION)
+			}
+
+	async def start(self) -> None:
+		"""
+		Восстанавливает снимок сессий и запускает фоновую очистку.
+
+		Вызывается при старте диспетчера, до начала поллинга.
+		"""
+		if self.snapshot_path:
+			await self.load_snapshot(self.snapshot_path)
+		if self.ttl > 0 and self._sweeper is None:
+			self._sweeper = asyncio.create_task(self._sweep_forever())
+
+	async def close(self) -> None:
+		"""
+		Останавливает фоновую очистку и сохраняет снимок сессий.
+
+		Вызывается при остановке диспетчера, после завершения обработчиков.
+		"""
+		if self._sweeper is not None:
+			self._sweeper.cancel()
+			with suppress(asyncio.CancelledError):
+				await self._sweeper
+			self._sweeper = None
+		if self.snapshot_path:
+			await self.save_snapshot(self.snapshot_path)
+
+	async def save_snapshot(self, path: str) -> int:
+		"""
+		Сохраняет все сессии в памяти в один файл (pickle + zlib).
+
+		Файл записывается атомарно; выгруженные на диск сессии остаются
+		в каталоге выгрузки и в снимок не попадают.
+
+		Args:
+			path (str): Путь к файлу снимка
+
+		Returns:
+			int: Количество сохраненных сессий
+		"""
+		records = {
+			key: (record.state, record.data)
+			for key, record in self.storage.items()
+			if record.state is not None or record.data
+		}
+		try:
+			blob = zlib.compress(pickle.dumps(records, pickle.HIGHEST_PROTOCOL))
+			if os.path.dirname(path):
+				os.makedirs(os.path.dirname(path), exist_ok=True)
+			await asyncio.to_thread(self._write_file, path, blob)
+		except Exception as e:
+			logger.error("Failed to save session snapshot %s: %s", path, e)
+			return 0
+		metrics.set('session.snapshot_bytes', len(blob))
+		logger.info("Saved %d sessions to %s (%d bytes)", len(records), path, len(blob))
+		return len(records)
+
+	async def load_snapshot(self, path: str) -> int:
+		"""
+		Восстанавливает сессии из снимка и удаляет файл.
+
+		Сессии, уже присутствующие в памяти, не перезаписываются.
+		Отсутствующий или поврежденный снимок только логируется.
+
+		Args:
+			path (str): Путь к файлу снимка
+
+		Returns:
+			int: Количество восстановленных сессий
+		"""
+		if not os.path.exists(path):
+			return 0
+		try:
+			blob = await asyncio.to_thread(self._read_file, path)
+			records: Dict[StorageKey, Tuple[StateType, Dict[str, Any]]] = pickle.loads(zlib.decompress(blob))
+		except Exception as e:
+			logger.error("Failed to load session snapshot %s: %s", path, e)
+			return 0
+		now = time.monotonic()
+		restored = 0
+		for key, (state, data) in records.items():
+			if key in self.storage:
+				continue
+			self.storage[key] = MemoryStorageRecord(data=data, state=state)
+			self._last_access[key] = now
+			self._account(key)
+			restored += 1
+		# Снимок больше не нужен: после сбоя без сохранения он вернул бы устаревшее состояние
+		with suppress(OSError):
+			await asyncio.to_thread(os.remove, path)
+		metrics.inc('session.restored', restored)
+		logger.info("Restored %d sessions from %s", restored, path)
+		return restored
+
+	async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+		await self._touch(key)
+		await super().set_state(key, state)
+		self._account(key)
+
+	async def get_state(self, key: StorageKey) -> Optional[str]:
+		await self._touch(key)
+		return await super().get_state(key)
+
+	async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+		await self._touch(key)
+		await super().set_data(key, data)
+		self._account(key)
+
+	async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+		await self._touch(key)
+		return await super().get_data(key)
+
+	async def get_value(self, storage_key: StorageKey, dict_key: str, default: Optional[Any] = None) -> Optional[Any]:
+		await self._touch(storage_key)
+		return await super().get_value(storage_key, dict_key, default)
+
+	@property
+	def mode_bytes(self) -> Dict[str, int]:
+		"""Возвращает объем состояния в байтах по режимам."""
+		return dict(self._mode_bytes)
+
+	async def _touch(self, key: StorageKey) -> None:
+		"""Отмечает обращение к сессии и восстанавливает ее с диска при необходимости."""
+		self._last_access[key] = time.monotonic()
+		if key in self.storage or not self._spilled:
+			return
+		task = self._restoring.get(key)
+		if task is None:
+			digest = self._digest(key)
+			if digest not in self._spilled:
+				return
+			task = asyncio.create_task(self._restore(key, digest))
+			self._restoring[key] = task
+			task.add_done_callback(lambda _: self._restoring.pop(key, None))
+		await task
+
+	async def _restore(self, key: StorageKey, digest: str) -> None:
+		"""Загружает выгруженную сессию с диска."""
+		path = self._spill_path(digest)
+		try:
+			blob = await asyncio.to_thread(self._read_file, path)
+			state, data = pickle.loads(zlib.decompress(blob))
+		except Exception as e:
+			logger.warning("Failed to restore session %s: %s", digest, e)
+			self._spilled.discard(digest)
+			return
+		self._spilled.discard(digest)
+		if key not in self.storage:
+			self.storage[key] = MemoryStorageRecord(data=data, state=state)
+			self._account(key)
+			metrics.inc('session.restored')
+		with suppress(OSError):
+			await asyncio.to_thread(os.remove, path)
+
+	def _account(self, key: StorageKey) -> None:
+		"""Пересчитывает объем сессии и обновляет показатели по режимам."""
+		record = self.storage.get(key)
+		previous = self._accounted.pop(key, None)
+		if previous is not None:
+			self._mode_bytes[previous[0]] -= previous[1]
+		if record is not None and (record.state is not None or record.data):
+			mode = record.state.split(':', 1)[0] if record.state else IDLE_MODE
+			size = estimate_size(record.data)
+			self._accounted[key] = (mode, size)
+			self._mode_bytes[mode] = self._mode_bytes.get(mode, 0) + size
+			metrics.set(f'session.bytes.{mode}', self._mode_bytes[mode])
+		if previous is not None and previous[0] in self._mode_bytes:
+			metrics.set(f'session.bytes.{previous[0]}', self._mode_bytes[previous[0]])
+		metrics.set('session.count', len(self._accounted))
+
+	async def _sweep_forever(self) -> None:
+		"""Периодически вытесняет неактивные сессии."""
+		while True:
+			await asyncio.sleep(self.sweep_interval)
+			try:
+				await self.sweep()
+			except Exception as e:
+				logger.error("Session sweep failed: %s", e)
+
+	async def sweep(self) -> int:
+		"""
+		Вытесняет сессии, неактивные дольше TTL.
+
+		Пустые записи удаляются сразу; сессии с данными выгружаются на диск,
+		если задан каталог выгрузки, иначе удаляются.
+
+		Returns:
+			int: Количество вытесненных сессий
+		"""
+		deadline = time.monotonic() - self.ttl
+		expired = [key for key, last in self._last_access.items() if last <= deadline]
+		evicted = 0
+		for key in expired:
+			last = self._last_access.get(key)
+			record = self.storage.get(key)
+			if record is not None and self.spill_dir and (record.state is not None or record.data):
+				if not await self._spill(key, record):
+					continue
+				if self._last_access.get(key) != last:
+					# Пользователь вернулся во время записи на диск
+					await self._discard_spilled(key)
+					continue
+			self.storage.pop(key, None)
+			self._last_access.pop(key, None)
+			self._account(key)
+			evicted += 1
+		if evicted:
+			metrics.inc('session.evicted', evicted)
+			logger.info("Evicted %d idle sessions, %d active", evicted, len(self.storage))
+		return evicted
+
+	async def _spill(self, key: StorageKey, record: MemoryStorageRecord) -> bool:
+		"""Записывает сессию на диск, возвращает True при успехе."""
+		digest = self._digest(key)
+		try:
+			blob = zlib.compress(pickle.dumps((record.state, record.data), pickle.HIGHEST_PROTOCOL))
+			await asyncio.to_thread(self._write_file, self._spill_path(digest), blob)
+		except Exception as e:
+			logger.warning("Failed to spill session %s: %s", digest, e)
+			return False
+		self._spilled.add(digest)
+		metrics.inc('session.spilled')
+		metrics.inc('session.spilled_bytes', len(blob))
+		return True
+
+	async def _discard_spilled(self, key: StorageKey) -> None:
+		"""Удаляет устаревшую выгрузку сессии."""
+		digest = self._digest(key)
+		self._spilled.discard(digest)
+		with suppress(OSError):
+			await asyncio.to_thread(os.remove, self._spill_path(digest))
+
+	def _spill_path(self, digest: str) -> str:
+		"""Возвращает путь к файлу выгрузки."""
+		return os.path.join(self.spill_dir, digest + SPILL_EXTENSION)
+
+	@staticmethod
+	def _digest(key: StorageKey) -> str:
+		"""Возвращает имя файла выгрузки для ключа."""
+		raw = f'{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id}:{key.business_connection_id}:{key.destiny}'
+		return hashlib.sha1(raw.encode()).hexdigest()
+
+	@staticmethod
+	def _read_file(path: str) -> bytes:
+		with open(path, 'rb') as file:
+			return file.read()
+
+	@staticmethod
+	def _write_file(path: str, blob: bytes) -> None:
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'wb') as file:
+			file.write(blob)
+		os.replace(tmp_path, path)
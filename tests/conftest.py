@@ -0,0 +1,43 @@
+"""
+Общие фикстуры тестов.
+
+Тесты не обращаются к сети: Telegram и OpenAI заменяются заглушками,
+SQLite-хранилища создаются во временном каталоге. Асинхронный код
+выполняется через asyncio.run.
+
+Запуск из корня проекта:
+	python -m pytest -q
+"""
+
+import pytest
+
+from common import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+	"""Сбрасывает общий реестр метрик до и после каждого теста."""
+	metrics.reset()
+	yield
+	metrics.reset()
+
+
+class FakeClock:
+	"""Управляемые часы для подмены time.monotonic."""
+
+	def __init__(self, now: float = 1000.0):
+		self.now = now
+
+	def __call__(self) -> float:
+		return self.now
+
+	def advance(self, seconds: float) -> None:
+		self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	"""Подменяет time.monotonic управляемыми часами (цикл событий тоже их видит: без asyncio.sleep)."""
+	fake = FakeClock()
+	monkeypatch.setattr('time.monotonic', fake)
+	return fake
@@ -0,0 +1,89 @@
+"""Тесты предохранителя запросов к OpenAI (models.circuit_breaker)."""
+
+from common import metrics
+from models.circuit_breaker import CircuitBreaker, CircuitState
+
+
+def _breaker() -> CircuitBreaker:
+	return CircuitBreaker(
+		'test', failure_rate=0.5, min_requests=4, window=10, slow_call_seconds=1, open_seconds=30,
+	)
+
+
+def test_stays_closed_below_min_requests(clock):
+	breaker = _breaker()
+	for _ in range(3):
+		breaker.record_failure()
+	assert breaker.state is CircuitState.CLOSED
+	assert breaker.allow()
+
+
+def test_opens_at_failure_rate_and_fails_fast(clock):
+	breaker = _breaker()
+	breaker.record_success(0.1)
+	breaker.record_success(0.1)
+	breaker.record_failure()
+	assert breaker.state is CircuitState.CLOSED
+	breaker.record_failure()
+	assert breaker.state is CircuitState.OPEN
+	assert not breaker.allow()
+	assert breaker.retry_after == 30
+	assert metrics.get('circuit.test.open') == 1
+	assert metrics.get('circuit.test.state') == CircuitState.OPEN.value
+
+
+def test_slow_calls_count_as_failures(clock):
+	breaker = _breaker()
+	for _ in range(4):
+		breaker.record_success(2)
+	assert breaker.state is CircuitState.OPEN
+	assert metrics.get('circuit.test.slow_calls') == 4
+
+
+def _open(breaker: CircuitBreaker) -> None:
+	for _ in range(4):
+		breaker.record_failure()
+	assert breaker.state is CircuitState.OPEN
+
+
+def test_half_open_allows_single_probe(clock):
+	breaker = _breaker()
+	_open(breaker)
+	clock.advance(30)
+	assert breaker.allow()
+	assert breaker.state is CircuitState.HALF_OPEN
+	assert not breaker.allow()
+
+
+def test_successful_probe_closes(clock):
+	breaker = _breaker()
+	_open(breaker)
+	clock.advance(30)
+	breaker.allow()
+	breaker.record_success(0.1)
+	assert breaker.state is CircuitState.CLOSED
+	# Окно очищено: одна ошибка не размыкает снова
+	breaker.record_failure()
+	assert breaker.state is CircuitState.CLOSED
+
+
+def test_failed_probe_reopens(clock):
+	breaker = _breaker()
+	_open(breaker)
+	clock.advance(30)
+	breaker.allow()
+	breaker.record_failure()
+	assert breaker.state is CircuitState.OPEN
+	assert not breaker.allow()
+	clock.advance(30)
+	assert breaker.allow()
+
+
+def test_released_probe_can_be_retried(clock):
+	breaker = _breaker()
+	_open(breaker)
+	clock.advance(30)
+	assert breaker.allow()
+	breaker.release()
+	assert breaker.state is CircuitState.HALF_OPEN
+	assert breaker.allow()
@@ -0,0 +1,102 @@
+"""Тесты отбрасывания повторно доставленных обновлений (middlewares.dedup)."""
+
+import asyncio
+
+from aiogram.types import Update
+
+from common import metrics
+from middlewares.dedup import MemorySeenStore, SqliteSeenStore, UpdateDeduplicator
+
+
+def test_memory_store_rejects_repeated_keys():
+	store = MemorySeenStore(ttl=60, max_size=100)
+	assert asyncio.run(store.add(['u:1'])) is True
+	assert asyncio.run(store.add(['u:1'])) is False
+	assert asyncio.run(store.add(['u:2'])) is True
+
+
+def test_memory_store_rejects_update_when_any_key_was_seen():
+	store = MemorySeenStore(ttl=60, max_size=100)
+	asyncio.run(store.add(['u:1', 'c:abc']))
+	assert asyncio.run(store.add(['u:2', 'c:abc'])) is False
+	# Отклоненное обновление не добавляет свои ключи
+	assert asyncio.run(store.add(['u:2'])) is True
+
+
+def test_memory_store_forgets_keys_after_ttl(clock):
+	store = MemorySeenStore(ttl=10, max_size=100)
+	asyncio.run(store.add(['u:1']))
+	clock.advance(5)
+	assert asyncio.run(store.add(['u:1'])) is False
+	clock.advance(10)
+	assert asyncio.run(store.add(['u:1'])) is True
+
+
+def test_memory_store_is_bounded():
+	store = MemorySeenStore(ttl=60, max_size=3)
+	for index in range(10):
+		asyncio.run(store.add([f'u:{index}']))
+	assert len(store) == 3
+	assert asyncio.run(store.add(['u:0'])) is True
+	assert asyncio.run(store.add(['u:9'])) is False
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+	path = str(tmp_path / 'dedup.sqlite3')
+
+	async def scenario():
+		store = SqliteSeenStore(path, ttl=60)
+		first = await store.add(['u:1', 'c:abc'])
+		repeated = await store.add(['u:1'])
+		await store.close()
+		reopened = SqliteSeenStore(path, ttl=60)
+		try:
+			return first, repeated, await reopened.add(['c:abc']), await reopened.add(['u:2'])
+		finally:
+			await reopened.close()
+
+	assert asyncio.run(scenario()) == (True, False, False, True)
+
+
+def test_sqlite_store_ignores_expired_keys(tmp_path):
+	async def scenario():
+		store = SqliteSeenStore(str(tmp_path / 'dedup.sqlite3'), ttl=0)
+		try:
+			return await store.add(['u:1']), await store.add(['u:1'])
+		finally:
+			await store.close()
+
+	assert asyncio.run(scenario()) == (True, True)
+
+
+def test_middleware_drops_duplicate_updates():
+	calls = []
+
+	async def handler(event, data):
+		calls.append(event.update_id)
+		return 'handled'
+
+	async def scenario():
+		middleware = UpdateDeduplicator(MemorySeenStore(ttl=60, max_size=100))
+		results = [
+			await middleware(handler, Update(update_id=update_id), {'bot': None})
+			for update_id in (1, 2, 1)
+		]
+		await middleware.close()
+		return results
+
+	assert asyncio.run(scenario()) == ['handled', 'handled', None]
+	assert calls == [1, 2]
+	assert metrics.get('updates.duplicate') == 1
+
+
+def test_middleware_processes_update_when_store_fails():
+	class BrokenStore:
+		async def add(self, keys):
+			raise OSError('disk I/O error')
+
+	async def handler(event, data):
+		return 'handled'
+
+	middleware = UpdateDeduplicator(BrokenStore())
+	assert asyncio.run(middleware(handler, Update(update_id=1), {'bot': None})) == 'handled'
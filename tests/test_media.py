@@ -0,0 +1,67 @@
+"""Тесты разбора ответа с рекомендацией и выбора response_format (models.media)."""
+
+import pytest
+
+from config import Config
+from models.media import media_response_format, parse_media_response, supports_json_schema
+
+
+@pytest.mark.parametrize('response', [
+	'{"title": "Дюна", "desc": "Фантастика"}',
+	'  {"title": "  Дюна ", "desc": " Фантастика  "}\n',
+	'```json\n{"title": "Дюна", "desc": "Фантастика"}\n```',
+	'Вот рекомендация: {"title": "Дюна", "desc": "Фантастика"} Приятного чтения!',
+	'Название: Дюна\nОписание: Фантастика',
+	'**Название:** Дюна\n**Описание:** Фантастика',
+])
+def test_parses_supported_formats(response):
+	assert parse_media_response(response) == {'title': 'Дюна', 'desc': 'Фантастика'}
+
+
+def test_parses_truncated_json():
+	result = parse_media_response('{"title": "Дюна", "desc": "Песчаная планета и \\"пряность')
+	assert result == {'title': 'Дюна', 'desc': 'Песчаная планета и "пряность'}
+
+
+def test_missing_description_is_empty():
+	assert parse_media_response('{"title": "Дюна"}') == {'title': 'Дюна', 'desc': ''}
+
+
+@pytest.mark.parametrize('response', [
+	'',
+	'Не могу ничего посоветовать',
+	'{"title": "", "desc": "Без названия"}',
+	'{"desc": "Без названия"}',
+	'Описание: только описание',
+])
+def test_rejects_replies_without_title(response):
+	assert parse_media_response(response) is None
+
+
+@pytest.mark.parametrize('model, expected', [
+	('gpt-4o-mini', True),
+	('gpt-4o', True),
+	('gpt-4.1', True),
+	('gpt-4o-2024-08-06', True),
+	('gpt-4o-2024-05-13', False),
+	('gpt-4', False),
+	('gpt-4-turbo', False),
+	('gpt-3.5-turbo', False),
+])
+def test_supports_json_schema(model, expected):
+	assert supports_json_schema(model) is expected
+
+
+def test_auto_response_format_follows_model(monkeypatch):
+	monkeypatch.setattr(Config, 'GPT_MEDIA_RESPONSE_FORMAT', 'auto')
+	assert media_response_format('gpt-4o-mini')['type'] == 'json_schema'
+	assert media_response_format('gpt-3.5-turbo') == {'type': 'json_object'}
+
+
+@pytest.mark.parametrize('mode, expected', [
+	('json_object', {'type': 'json_object'}),
+	('none', None),
+])
+def test_explicit_response_format(monkeypatch, mode, expected):
+	monkeypatch.setattr(Config, 'GPT_MEDIA_RESPONSE_FORMAT', mode)
+	assert media_response_format('gpt-4o-mini') == expected
@@ -0,0 +1,103 @@
+"""Тесты хранилища предпочтений (storage.preferences)."""
+
+import asyncio
+
+from common import metrics
+from storage.preferences import FACT, PreferenceStore, text_digest
+
+
+def _produce(replies):
+	"""Возвращает produce для first_unseen, выдающий ответы по порядку."""
+	attempts = []
+
+	async def produce(attempt):
+		attempts.append(attempt)
+		return replies[attempt]
+
+	return produce, attempts
+
+
+def test_digest_ignores_case_punctuation_and_yo():
+	assert text_digest('Ёж, живёт в лесу!') == text_digest('ёж живет   в лесу')
+	assert text_digest('ёж') != text_digest('уж')
+
+
+def test_first_unseen_returns_first_new_result(tmp_path):
+	store = PreferenceStore(path=str(tmp_path / 'prefs.sqlite3'), max_retries=3)
+	produce, attempts = _produce(['Факт один', 'факт ДВА', 'Факт три'])
+
+	async def scenario():
+		await store.add(1, FACT, 'Факт один')
+		await store.add(1, FACT, 'Факт два')
+		try:
+			return await store.first_unseen(1, FACT, produce)
+		finally:
+			await store.close()
+
+	assert asyncio.run(scenario()) == 'Факт три'
+	assert attempts == [0, 1, 2]
+	assert metrics.get('preferences.fact.filtered') == 2
+
+
+def test_first_unseen_gives_up_after_max_retries(tmp_path):
+	store = PreferenceStore(path=str(tmp_path / 'prefs.sqlite3'), max_retries=1)
+	produce, attempts = _produce(['Факт', 'Факт', 'Новый факт'])
+
+	async def scenario():
+		await store.add(1, FACT, 'Факт')
+		try:
+			return await store.first_unseen(1, FACT, produce)
+		finally:
+			await store.close()
+
+	assert asyncio.run(scenario()) == 'Факт'
+	assert attempts == [0, 1]
+
+
+def test_first_unseen_is_per_user_and_uses_text_of(tmp_path):
+	store = PreferenceStore(path=str(tmp_path / 'prefs.sqlite3'), max_retries=3)
+	produce, attempts = _produce([{'title': 'Дюна'}, {'title': 'Солярис'}])
+
+	async def scenario():
+		await store.add(1, FACT, 'Дюна')
+		try:
+			other = await store.first_unseen(2, FACT, produce, text_of=lambda item: item['title'])
+			own = await store.first_unseen(1, FACT, produce, text_of=lambda item: item['title'])
+			return other, own
+		finally:
+			await store.close()
+
+	assert asyncio.run(scenario()) == ({'title': 'Дюна'}, {'title': 'Солярис'})
+	assert attempts == [0, 0, 1]
+
+
+def test_first_unseen_accepts_empty_result(tmp_path):
+	store = PreferenceStore(path=str(tmp_path / 'prefs.sqlite3'), max_retries=3)
+	produce, attempts = _produce(['', 'Факт'])
+
+	async def scenario():
+		await store.add(1, FACT, '')
+		try:
+			return await store.first_unseen(1, FACT, produce)
+		finally:
+			await store.close()
+
+	assert asyncio.run(scenario()) == ''
+	assert attempts == [0]
+
+
+def test_records_survive_restart_and_are_trimmed(tmp_path):
+	path = str(tmp_path / 'prefs.sqlite3')
+
+	async def scenario():
+		store = PreferenceStore(path=path, max_items=2)
+		for text in ('первый', 'второй', 'третий'):
+			await store.add(1, FACT, text)
+		await store.close()
+		reopened = PreferenceStore(path=path, max_items=2)
+		try:
+			return [await reopened.contains(1, FACT, text) for text in ('первый', 'второй', 'третий')]
+		finally:
+			await reopened.close()
+
+	assert asyncio.run(scenario()) == [False, True, True]
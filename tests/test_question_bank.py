@@ -0,0 +1,65 @@
+"""Тесты банка вопросов викторины (storage.question_bank)."""
+
+import asyncio
+
+from common import metrics
+from storage.preferences import text_digest
+from storage.question_bank import QuestionBank
+
+
+def _bank(tmp_path, **kwargs) -> QuestionBank:
+	return QuestionBank(path=str(tmp_path / 'bank.sqlite3'), **kwargs)
+
+
+def _fill(bank: QuestionBank, topic: str, questions) -> list:
+	async def scenario():
+		await bank.start()
+		return [await bank.add(topic, question) for question in questions]
+
+	return asyncio.run(scenario())
+
+
+def test_pick_skips_seen_questions(tmp_path):
+	bank = _bank(tmp_path)
+	_fill(bank, 'history', ['Вопрос 1', 'Вопрос 2', 'Вопрос 3'])
+	seen = {text_digest('Вопрос 1'), text_digest('Вопрос 3')}
+	assert all(bank.pick('history', seen) == 'Вопрос 2' for _ in range(20))
+
+
+def test_pick_returns_none_when_topic_is_exhausted(tmp_path):
+	bank = _bank(tmp_path)
+	_fill(bank, 'history', ['Вопрос 1', 'Вопрос 2'])
+	seen = {text_digest('Вопрос 1'), text_digest('Вопрос 2')}
+	assert bank.pick('history', seen) is None
+	assert bank.pick('science', set()) is None
+	assert metrics.get('quiz.bank.requests') == 2
+	assert metrics.get('quiz.bank.miss') == 2
+
+
+def test_pick_varies_order_between_users(tmp_path):
+	bank = _bank(tmp_path)
+	questions = [f'Вопрос {index}' for index in range(10)]
+	_fill(bank, 'history', questions)
+	picked = {bank.pick('history', set()) for _ in range(100)}
+	assert len(picked) > 1
+	assert picked <= set(questions)
+	assert metrics.get('quiz.bank.hit') == 100
+
+
+def test_add_ignores_duplicates_and_respects_limit(tmp_path):
+	bank = _bank(tmp_path, max_questions=2)
+	added = _fill(bank, 'history', ['Вопрос 1', 'вопрос 1!', 'Вопрос 2', 'Вопрос 3'])
+	assert added == [True, False, True, False]
+	assert bank.size('history') == 2
+
+
+def test_questions_survive_restart(tmp_path):
+	bank = _bank(tmp_path)
+	_fill(bank, 'history', ['Вопрос 1'])
+	asyncio.run(bank.close())
+	reopened = _bank(tmp_path)
+	asyncio.run(reopened.start())
+	try:
+		assert reopened.pick('history', set()) == 'Вопрос 1'
+	finally:
+		asyncio.run(reopened.close())
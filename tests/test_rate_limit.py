@@ -0,0 +1,166 @@
+"""Тесты корзины токенов и ограничителя исходящих отправок (middlewares.rate_limit)."""
+
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendChatAction, SendMessage
+
+from common import metrics
+from middlewares.rate_limit import OutboundRateLimiter, TokenBucket, background_traffic
+
+
+def test_bucket_allows_burst_then_reports_wait(clock):
+	bucket = TokenBucket(rate=2, capacity=2)
+	assert bucket.try_acquire() == 0.0
+	assert bucket.try_acquire() == 0.0
+	assert bucket.try_acquire() == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+	bucket = TokenBucket(rate=2, capacity=2)
+	bucket.try_acquire()
+	bucket.try_acquire()
+	clock.advance(0.5)
+	assert bucket.try_acquire() == 0.0
+	assert bucket.try_acquire() > 0
+	clock.advance(100)
+	assert bucket.is_idle
+	assert bucket.try_acquire() == 0.0
+	assert bucket.try_acquire() == 0.0
+	assert bucket.try_acquire() > 0
+
+
+def test_bucket_block_holds_until_deadline(clock):
+	bucket = TokenBucket(rate=10, capacity=10)
+	bucket.block(3)
+	assert not bucket.is_idle
+	assert bucket.try_acquire() == pytest.approx(3)
+	clock.advance(1)
+	assert bucket.try_acquire() == pytest.approx(2)
+	clock.advance(2)
+	assert bucket.try_acquire() == 0.0
+
+
+def test_bucket_block_never_shortens_existing_block(clock):
+	bucket = TokenBucket(rate=1, capacity=1)
+	bucket.block(5)
+	bucket.block(1)
+	assert bucket.try_acquire() == pytest.approx(5)
+
+
+def _send(chat_id: int) -> SendMessage:
+	return SendMessage(chat_id=chat_id, text='text')
+
+
+async def _ok(bot, method):
+	return 'ok'
+
+
+def test_limiter_passes_unshaped_methods_without_waiting():
+	async def scenario():
+		limiter = OutboundRateLimiter(global_rate=1, chat_rate=1, chat_burst=1)
+		limiter.global_bucket.block(60)
+		action = SendChatAction(chat_id=1, action='typing')
+		return await asyncio.wait_for(limiter(_ok, None, action), 1)
+
+	assert asyncio.run(scenario()) == 'ok'
+
+
+def test_limiter_shapes_sends_per_chat():
+	async def scenario():
+		limiter = OutboundRateLimiter(global_rate=100, chat_rate=20, chat_burst=1)
+		loop = asyncio.get_running_loop()
+		started = loop.time()
+		for _ in range(3):
+			await limiter(_ok, None, _send(1))
+		return loop.time() - started
+
+	# Первая отправка из всплеска, еще две - по 1/20 с
+	assert asyncio.run(scenario()) >= 0.09
+
+
+def test_background_yields_to_interactive_on_global_bucket():
+	async def scenario():
+		limiter = OutboundRateLimiter(global_rate=20, chat_rate=100, chat_burst=100)
+		order = []
+
+		async def record(bot, method):
+			order.append(method.chat_id)
+			return 'ok'
+
+		limiter.global_bucket.block(0.05)
+
+		async def background():
+			with background_traffic():
+				await limiter(record, None, _send(2))
+
+		background_task = asyncio.create_task(background())
+		await asyncio.sleep(0)
+		await limiter(record, None, _send(1))
+		await background_task
+		return order
+
+	assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_blocked_chat_does_not_stall_background_traffic():
+	async def scenario():
+		limiter = OutboundRateLimiter(global_rate=100, chat_rate=1, chat_burst=1)
+		limiter._chat_bucket(1).block(60)
+		interactive = asyncio.create_task(limiter(_ok, None, _send(1)))
+		await asyncio.sleep(0.01)
+		try:
+			with background_traffic():
+				return await asyncio.wait_for(limiter(_ok, None, _send(2)), 1)
+		finally:
+			interactive.cancel()
+
+	assert asyncio.run(scenario()) == 'ok'
+
+
+def test_limiter_retries_after_flood_control():
+	async def scenario():
+		limiter = OutboundRateLimiter(global_rate=100, chat_rate=100, chat_burst=100, max_retries=2)
+		calls = []
+
+		async def flaky(bot, method):
+			calls.append(method)
+			if len(calls) == 1:
+				raise TelegramRetryAfter(method, 'Flood control exceeded', 0)
+			return 'ok'
+
+		return await limiter(flaky, None, _send(1)), len(calls)
+
+	assert asyncio.run(scenario()) == ('ok', 2)
+	assert metrics.get('telegram.retry_after') == 1
+
+
+def test_limiter_gives_up_after_max_retries():
+	async def scenario():
+		limiter = OutboundRateLimiter(global_rate=100, chat_rate=100, chat_burst=100, max_retries=1)
+
+		async def flooded(bot, method):
+			raise TelegramRetryAfter(method, 'Flood control exceeded', 0)
+
+		await limiter(flooded, None, _send(1))
+
+	with pytest.raises(TelegramRetryAfter):
+		asyncio.run(scenario())
+	assert metrics.get('telegram.retry_after') == 2
+
+
+def test_chat_buckets_stay_bounded_when_all_are_busy():
+	limiter = OutboundRateLimiter(global_rate=100, chat_rate=1, chat_burst=1, max_chat_buckets=5)
+	for chat_id in range(100):
+		limiter._chat_bucket(chat_id).try_acquire()
+	assert list(limiter._chat_buckets) == [95, 96, 97, 98, 99]
+
+
+def test_chat_bucket_eviction_prefers_idle_buckets():
+	limiter = OutboundRateLimiter(global_rate=100, chat_rate=1, chat_burst=1, max_chat_buckets=3)
+	limiter._chat_bucket(1).block(60)
+	limiter._chat_bucket(2)
+	limiter._chat_bucket(3).block(60)
+	limiter._chat_bucket(4)
+	assert list(limiter._chat_buckets) == [1, 3, 4]
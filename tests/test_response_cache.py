@@ -0,0 +1,112 @@
+"""Тесты кэша ответов ChatGPT (models.response_cache)."""
+
+import asyncio
+
+from common import metrics
+from models.response_cache import ResponseCache
+
+
+def _params(**overrides):
+	params = {
+		'model': 'gpt-4o-mini',
+		'messages': [{'role': 'system', 'content': 'prompt'}, {'role': 'user', 'content': 'hello'}],
+		'max_tokens': 100,
+		'temperature': 0,
+	}
+	params.update(overrides)
+	return params
+
+
+def test_key_depends_only_on_cached_params():
+	base = ResponseCache.make_key(_params())
+	assert ResponseCache.make_key(_params(timeout=30, user='x')) == base
+	assert ResponseCache.make_key(_params(temperature=1)) != base
+	assert ResponseCache.make_key(_params(model='gpt-4o')) != base
+
+
+def test_accepts_only_short_histories():
+	cache = ResponseCache(max_entries=10, ttl=60, max_messages=2)
+	assert cache.accepts(_params())
+	messages = _params()['messages'] + [{'role': 'assistant', 'content': 'hi'}]
+	assert not cache.accepts(_params(messages=messages))
+
+
+def test_single_variant_is_returned_after_first_put():
+	cache = ResponseCache(max_entries=10, ttl=60, max_messages=5)
+	assert cache.get('key') is None
+	cache.put('key', 'answer')
+	cache.put('key', 'other')
+	assert cache.get('key') == 'answer'
+
+
+def test_variants_are_served_once_collected():
+	cache = ResponseCache(max_entries=10, ttl=60, max_messages=5)
+	cache.put('key', 'a', variants=3)
+	cache.put('key', 'a', variants=3)
+	assert cache.get('key', variants=3) is None
+	# Повторяющиеся ответы тоже считаются вариантами
+	cache.put('key', 'b', variants=3)
+	assert cache.get('key', variants=3) in ('a', 'b')
+	cache.put('key', 'c', variants=3)
+	assert {cache.get('key', variants=3) for _ in range(50)} <= {'a', 'b'}
+
+
+def test_entries_expire(clock):
+	cache = ResponseCache(max_entries=10, ttl=10, max_messages=5)
+	cache.put('key', 'answer')
+	clock.advance(9)
+	assert cache.get('key') == 'answer'
+	clock.advance(1)
+	assert cache.get('key') is None
+	assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+	cache = ResponseCache(max_entries=2, ttl=60, max_messages=5)
+	cache.put('a', '1')
+	cache.put('b', '2')
+	cache.get('a')
+	cache.put('c', '3')
+	assert cache.get('a') == '1'
+	assert cache.get('b') is None
+	assert cache.get('c') == '3'
+
+
+def test_fetch_loads_once_and_counts_hits():
+	cache = ResponseCache(max_entries=10, ttl=60, max_messages=5)
+	loads = []
+
+	async def load():
+		loads.append(1)
+		return 'answer'
+
+	async def scenario():
+		return [await cache.fetch('translate', 'key', 1, load) for _ in range(3)]
+
+	assert asyncio.run(scenario()) == ['answer'] * 3
+	assert len(loads) == 1
+	assert metrics.get('gpt.cache.translate.miss') == 1
+	assert metrics.get('gpt.cache.translate.hit') == 2
+	assert ResponseCache.hit_rate('translate') == 2 / 3
+	assert ResponseCache.hit_rate() == 2 / 3
+
+
+def test_fetch_does_not_store_rejected_replies():
+	cache = ResponseCache(max_entries=10, ttl=60, max_messages=5)
+	replies = iter(['not json', '{"title": "ok"}'])
+
+	async def load():
+		return next(replies)
+
+	def accept(text):
+		return text.startswith('{')
+
+	async def scenario():
+		first = await cache.fetch('media', 'key', 1, load, accept=accept)
+		second = await cache.fetch('media', 'key', 1, load, accept=accept)
+		third = await cache.fetch('media', 'key', 1, load, accept=accept)
+		return first, second, third
+
+	assert asyncio.run(scenario()) == ('not json', '{"title": "ok"}', '{"title": "ok"}')
+	assert metrics.get('gpt.cache.media.rejected') == 1
+	assert metrics.get('gpt.cache.media.hit') == 1
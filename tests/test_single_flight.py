@@ -0,0 +1,93 @@
+"""Тесты объединения одновременных одинаковых запросов (models.single_flight)."""
+
+import asyncio
+
+import pytest
+
+from common import metrics
+from models.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_request():
+	async def scenario():
+		flight = SingleFlight('test')
+		calls = []
+
+		async def work():
+			calls.append(1)
+			await asyncio.sleep(0.01)
+			return len(calls)
+
+		results = await asyncio.gather(*(flight.do('key', work) for _ in range(5)))
+		return results, len(calls), len(flight)
+
+	assert asyncio.run(scenario()) == ([1] * 5, 1, 0)
+	assert metrics.get('test.coalesced') == 4
+
+
+def test_different_keys_run_separately():
+	async def scenario():
+		flight = SingleFlight()
+
+		async def work(value):
+			await asyncio.sleep(0.01)
+			return value
+
+		return await asyncio.gather(flight.do('a', lambda: work('a')), flight.do('b', lambda: work('b')))
+
+	assert asyncio.run(scenario()) == ['a', 'b']
+
+
+def test_error_reaches_every_waiter():
+	async def scenario():
+		flight = SingleFlight()
+
+		async def fail():
+			await asyncio.sleep(0.01)
+			raise RuntimeError('boom')
+
+		return await asyncio.gather(*(flight.do('key', fail) for _ in range(3)), return_exceptions=True)
+
+	results = asyncio.run(scenario())
+	assert [type(result) for result in results] == [RuntimeError] * 3
+
+
+def test_cancelled_waiter_does_not_cancel_shared_request():
+	async def scenario():
+		flight = SingleFlight()
+
+		async def work():
+			await asyncio.sleep(0.02)
+			return 'done'
+
+		first = asyncio.create_task(flight.do('key', work))
+		second = asyncio.create_task(flight.do('key', work))
+		await asyncio.sleep(0.005)
+		first.cancel()
+		with pytest.raises(asyncio.CancelledError):
+			await first
+		return await second
+
+	assert asyncio.run(scenario()) == 'done'
+
+
+def test_call_after_last_waiter_cancelled_starts_fresh_request():
+	async def scenario():
+		flight = SingleFlight()
+		started = []
+
+		async def work():
+			started.append(1)
+			await asyncio.sleep(0.02)
+			return len(started)
+
+		waiter = asyncio.create_task(flight.do('key', work))
+		await asyncio.sleep(0.005)
+		waiter.cancel()
+		# Новый вызов в том же шаге цикла, до завершения отмененного запроса
+		joined = asyncio.create_task(flight.do('key', work))
+		with pytest.raises(asyncio.CancelledError):
+			await waiter
+		return await joined, len(flight)
+
+	assert asyncio.run(scenario()) == (2, 0)
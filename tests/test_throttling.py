@@ -0,0 +1,80 @@
+"""Тесты ограничения частоты запросов пользователя (middlewares.throttling)."""
+
+import asyncio
+
+from aiogram.types import Message, User
+
+from common import metrics
+from middlewares.throttling import DEFAULT_CLASS, GPT_CLASS, UserThrottle
+
+
+def _user(user_id: int) -> User:
+	return User(id=user_id, is_bot=False, first_name='Test')
+
+
+def _throttle(**kwargs) -> UserThrottle:
+	kwargs.setdefault('limits', {DEFAULT_CLASS: (1, 2), GPT_CLASS: (1, 1)})
+	kwargs.setdefault('admin_ids', frozenset())
+	return UserThrottle(**kwargs)
+
+
+def _run(throttle: UserThrottle, event, user_id: int, times: int) -> int:
+	"""Пропускает событие times раз и возвращает число вызовов обработчика."""
+	calls = []
+
+	async def handler(event, data):
+		calls.append(event)
+
+	async def scenario():
+		for _ in range(times):
+			await throttle(handler, event, {'event_from_user': _user(user_id)})
+
+	asyncio.run(scenario())
+	return len(calls)
+
+
+def test_burst_passes_then_drops(clock):
+	throttle = _throttle()
+	assert _run(throttle, object(), user_id=1, times=5) == 2
+	assert metrics.get('throttle.dropped.default') == 3
+
+
+def test_users_are_limited_separately(clock):
+	throttle = _throttle()
+	assert _run(throttle, object(), user_id=1, times=3) == 2
+	assert _run(throttle, object(), user_id=2, times=3) == 2
+
+
+def test_admins_are_not_limited(clock):
+	throttle = _throttle(admin_ids=frozenset({1}))
+	assert _run(throttle, object(), user_id=1, times=10) == 10
+
+
+def test_tokens_refill_over_time(clock):
+	throttle = _throttle()
+	assert _run(throttle, object(), user_id=1, times=3) == 2
+	clock.advance(1)
+	assert _run(throttle, object(), user_id=1, times=3) == 1
+
+
+def test_user_is_warned_once_until_next_pass(clock, monkeypatch):
+	answers = []
+
+	async def answer(self, text, **kwargs):
+		answers.append(text)
+
+	monkeypatch.setattr(Message, 'answer', answer)
+	throttle = _throttle()
+	message = Message.model_construct()
+	assert _run(throttle, message, user_id=1, times=5) == 2
+	assert len(answers) == 1
+	clock.advance(1)
+	assert _run(throttle, message, user_id=1, times=2) == 1
+	assert len(answers) == 2
+
+
+def test_buckets_are_evicted_beyond_max_users(clock):
+	throttle = _throttle(max_users=3)
+	for user_id in range(10):
+		_run(throttle, object(), user_id=user_id, times=1)
+	assert len(throttle._buckets) == 3
@@ -0,0 +1,125 @@
+"""Тесты деления и отправки ответов (utils)."""
+
+import asyncio
+
+import pytest
+from aiogram.client.default import Default, DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendMessage
+
+from common import LIMITS
+from utils import send_answer, split_text, telegram_length
+
+
+class FakeBot:
+	"""Бот, записывающий отправки вместо обращения к Telegram."""
+
+	def __init__(self, parse_mode=ParseMode.MARKDOWN, reject_markdown=False):
+		self.default = DefaultBotProperties(parse_mode=parse_mode)
+		self.reject_markdown = reject_markdown
+		self.sent = []
+
+	def _resolve(self, parse_mode):
+		"""Подставляет режим разметки по умолчанию, как это делает Bot."""
+		return self.default.parse_mode if isinstance(parse_mode, Default) else parse_mode
+
+	async def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):
+		parse_mode = self._resolve(parse_mode)
+		if self.reject_markdown and parse_mode is not None:
+			raise TelegramBadRequest(SendMessage(chat_id=chat_id, text=text), "Bad Request: can't parse entities")
+		self.sent.append(('message', text, parse_mode, reply_markup))
+		return len(self.sent)
+
+	async def send_photo(self, chat_id, photo, caption=None, parse_mode=None, reply_markup=None):
+		parse_mode = self._resolve(parse_mode)
+		self.sent.append(('photo', caption, parse_mode, reply_markup))
+		return len(self.sent)
+
+
+def test_telegram_length_counts_utf16_units():
+	assert telegram_length('') == 0
+	assert telegram_length('привет') == 6
+	assert telegram_length('a😀') == 3
+
+
+def test_split_text_keeps_short_text_whole():
+	assert split_text('  short text \n', 100) == ['short text']
+	assert split_text('', 100) == []
+
+
+def test_split_text_prefers_paragraph_boundaries():
+	text = 'first paragraph\n\nsecond one\nline two'
+	assert split_text(text, 30) == ['first paragraph', 'second one\nline two']
+
+
+def test_split_text_falls_back_to_words_and_hard_cuts():
+	assert split_text('one two three', 8) == ['one two', 'three']
+	assert split_text('abcdefghij', 4) == ['abcd', 'efgh', 'ij']
+
+
+def test_split_text_respects_limit_for_non_bmp_characters():
+	text = '😀' * 10
+	chunks = split_text(text, 5)
+	assert ''.join(chunks) == text
+	assert all(telegram_length(chunk) <= 5 for chunk in chunks)
+
+
+def test_split_text_never_exceeds_limit():
+	text = ' '.join(f'слово{index}' for index in range(500))
+	chunks = split_text(text, 100)
+	assert all(telegram_length(chunk) <= 100 for chunk in chunks)
+	assert ' '.join(chunks) == text
+
+
+def test_send_answer_sends_short_text_as_one_message():
+	bot = FakeBot()
+	assert asyncio.run(send_answer(bot, 1, '*bold* answer', reply_markup='kb')) == 1
+	assert bot.sent == [('message', '*bold* answer', ParseMode.MARKDOWN, 'kb')]
+
+
+def test_send_answer_splits_long_text_and_attaches_keyboard_to_last():
+	bot = FakeBot()
+	text = '\n\n'.join('а' * 3000 for _ in range(3))
+	asyncio.run(send_answer(bot, 1, text, reply_markup='kb'))
+	assert [kind for kind, *_ in bot.sent] == ['message'] * 3
+	assert [markup for *_, markup in bot.sent] == [None, None, 'kb']
+
+
+def test_send_answer_puts_short_text_into_caption():
+	bot = FakeBot()
+	asyncio.run(send_answer(bot, 1, 'caption', photo='file-id', reply_markup='kb'))
+	assert bot.sent == [('photo', 'caption', ParseMode.MARKDOWN, 'kb')]
+
+
+def test_send_answer_continues_long_caption_in_messages():
+	bot = FakeBot()
+	text = 'а' * 1000 + '\n\n' + 'б' * 1000
+	asyncio.run(send_answer(bot, 1, text, photo='file-id', reply_markup='kb'))
+	kinds = [(kind, body, markup) for kind, body, _, markup in bot.sent]
+	assert kinds == [('photo', 'а' * 1000, None), ('message', 'б' * 1000, 'kb')]
+	assert telegram_length(bot.sent[0][1]) <= LIMITS['MAX_CAPTION_LENGTH']
+
+
+def test_send_answer_drops_unbalanced_markdown():
+	bot = FakeBot()
+	asyncio.run(send_answer(bot, 1, 'snake_case name'))
+	assert bot.sent == [('message', 'snake_case name', None, None)]
+
+
+def test_send_answer_resends_plain_text_when_markdown_is_rejected():
+	bot = FakeBot(reject_markdown=True)
+	asyncio.run(send_answer(bot, 1, '*bold*'))
+	assert bot.sent == [('message', '*bold*', None, None)]
+
+
+def test_send_answer_sends_photo_without_text():
+	bot = FakeBot()
+	asyncio.run(send_answer(bot, 1, '', photo='file-id'))
+	assert bot.sent == [('photo', None, ParseMode.MARKDOWN, None)]
+
+
+@pytest.mark.parametrize('text', ['', '   \n'])
+def test_send_answer_rejects_nothing_to_send(text):
+	with pytest.raises(ValueError):
+		asyncio.run(send_answer(FakeBot(), 1, text))
@@ -3,16 +3,34 @@
 
 Содержит утилитарные функции, используемые в различных частях приложения:
 - bot_thinking: Показывает индикатор "печатает" во время обработки запроса
+- send_answer: Отправляет ответ GPT с учетом лимитов подписи и разметки
+- escape_markdown: Экранирует символы разметки Markdown
+- markdown_is_balanced: Проверяет парность разметки Markdown
+- split_text: Делит длинный текст на части по границам абзацев
 - format_score: Форматирует счет в читаемом виде
 - truncate_text: Обрезает текст до указанной длины
 
 Зависимости:
 - aiogram: Фреймворк для Telegram ботов
 - asyncio: Асинхронное программирование
+- common: Лимиты Telegram
 """
 
 import asyncio
-from aiogram.types import Message
+import logging
+from typing import List, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.default import Default
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, InputFile, ReplyMarkupUnion
+
+from common import LIMITS
+
+logger = logging.getLogger(__name__)
+
+_MARKDOWN_SPECIAL = '_*`['
 
 
 async def bot_thinking(message: Message) -> None:
@@ -33,6 +51,192 @@ async def bot_thinking(message: Message) -> None:
 	await asyncio.sleep(1)
 
 
+def telegram_length(text: str) -> int:
+	"""
+	Возвращает длину текста так, как ее считает Telegram (в UTF-16 символах).
+	
+	Args:
+		text (str): Исходный текст
+		
+	Returns:
+		int: Длина в единицах UTF-16
+	"""
+	return len(text.encode('utf-16-le')) // 2
+
+
+def escape_markdown(text: str) -> str:
+	"""
+	Экранирует символы разметки Markdown (legacy) обратной косой чертой.
+	
+	Используется для вставки произвольного текста в шаблоны с разметкой.
+	
+	Args:
+		text (str): Исходный текст
+		
+	Returns:
+		str: Текст, безопасный для ParseMode.MARKDOWN
+	"""
+	return ''.join(f'\\{char}' if char in _MARKDOWN_SPECIAL else char for char in text)
+
+
+def markdown_is_balanced(text: str) -> bool:
+	"""
+	Проверяет, что все сущности разметки Markdown (legacy) закрыты.
+	
+	Telegram отклоняет сообщение с незакрытыми *, _, `, ``` или [
+	ошибкой "can't parse entities".
+	
+	Args:
+		text (str): Текст сообщения
+		
+	Returns:
+		bool: True, если разметка корректна
+	"""
+	open_entity: Optional[str] = None
+	i = 0
+	while i < len(text):
+		char = text[i]
+		if char == '\\' and open_entity is None:
+			i += 2
+			continue
+		if open_entity is None:
+			if text.startswith('```', i):
+				open_entity = '```'
+				i += 3
+				continue
+			if char in '*_`':
+				open_entity = char
+			elif char == '[':
+				open_entity = ']'
+		elif text.startswith(open_entity, i):
+			i += len(open_entity)
+			open_entity = None
+			continue
+		i += 1
+	return open_entity is None
+
+
+def split_text(text: str, limit: int) -> List[str]:
+	"""
+	Делит текст на части не длиннее limit.
+	
+	Границы выбираются по абзацам, затем по строкам, затем по пробелам;
+	слово длиннее лимита разрезается принудительно.
+	
+	Args:
+		text (str): Исходный текст
+		limit (int): Максимальная длина части в единицах UTF-16
+		
+	Returns:
+		List[str]: Части текста
+	"""
+	chunks: List[str] = []
+	rest = text.strip()
+	while telegram_length(rest) > limit:
+		# Запас на символы вне BMP, которые занимают две единицы UTF-16
+		window = rest[:limit]
+		while telegram_length(window) > limit:
+			window = window[:-1]
+		cut = -1
+		for separator in ('\n\n', '\n', ' '):
+			cut = window.rfind(separator)
+			if cut > 0:
+				break
+		if cut <= 0:
+			cut = len(window)
+		chunks.append(rest[:cut].rstrip())
+		rest = rest[cut:].lstrip()
+	if rest:
+		chunks.append(rest)
+	return chunks
+
+
+async def _send_text(bot: Bot, chat_id: int, text: str, parse_mode, reply_markup) -> Message:
+	"""Отправляет текст, при ошибке разметки повторяет без нее."""
+	try:
+		return await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode, reply_markup=reply_markup)
+	except TelegramBadRequest as e:
+		if parse_mode is None or "can't parse entities" not in str(e):
+			raise
+		logger.warning("Markdown rejected by Telegram, resending as plain text: %s", e)
+		return await bot.send_message(chat_id=chat_id, text=text, parse_mode=None, reply_markup=reply_markup)
+
+
+async def send_answer(
+	bot: Bot,
+	chat_id: int,
+	text: str,
+	photo: Optional[Union[InputFile, str]] = None,
+	reply_markup: Optional[ReplyMarkupUnion] = None,
+	parse_mode: Optional[Union[str, Default]] = Default('parse_mode'),
+) -> Message:
+	"""
+	Отправляет ответ GPT, выбирая формат по длине текста.
+	
+	- Текст помещается в подпись: фото с подписью
+	- Текст длиннее подписи: фото с первой частью и продолжение сообщениями
+	- Фото нет: только текстовые сообщения
+	
+	Разметка проверяется локально: при незакрытых сущностях текст
+	отправляется без разметки, чтобы Telegram не отклонил ответ.
+	Клавиатура прикрепляется к последнему сообщению.
+	
+	Args:
+		bot (Bot): Экземпляр бота
+		chat_id (int): Идентификатор чата
+		text (str): Текст ответа
+		photo (Optional[Union[InputFile, str]]): Изображение или file_id
+		reply_markup (Optional[ReplyMarkupUnion]): Клавиатура
+		parse_mode (Optional[Union[str, Default]]): Режим разметки (по умолчанию - из настроек бота)
+		
+	Returns:
+		Message: Последнее отправленное сообщение
+		
+	Raises:
+		ValueError: Если нет ни фото, ни текста (отправлять нечего)
+	"""
+	if photo is None and not text.strip():
+		raise ValueError(f"Nothing to send to chat {chat_id}: empty text without photo")
+	effective_mode = bot.default.parse_mode if isinstance(parse_mode, Default) else parse_mode
+	if effective_mode == ParseMode.MARKDOWN and not markdown_is_balanced(text):
+		logger.info("Unbalanced Markdown in answer for chat %s, sending as plain text", chat_id)
+		parse_mode = None
+
+	caption_limit = LIMITS['MAX_CAPTION_LENGTH']
+	message_limit = LIMITS['MAX_MESSAGE_LENGTH']
+	chunks: List[str] = []
+	if photo is not None:
+		caption, *_ = split_text(text, caption_limit) or ['']
+		chunks = split_text(text.strip()[len(caption):], message_limit)
+		if parse_mode is not None and not all(markdown_is_balanced(part) for part in [caption, *chunks]):
+			parse_mode = None
+		try:
+			sent = await bot.send_photo(
+				chat_id=chat_id,
+				photo=photo,
+				caption=caption or None,
+				parse_mode=parse_mode,
+				reply_markup=None if chunks else reply_markup,
+			)
+		except TelegramBadRequest as e:
+			if "can't parse entities" not in str(e) and 'caption is too long' not in str(e):
+				raise
+			logger.warning("Caption rejected by Telegram, sending photo and text separately: %s", e)
+			sent = await bot.send_photo(chat_id=chat_id, photo=photo)
+			chunks = split_text(text, message_limit)
+			parse_mode = None
+	else:
+		chunks = split_text(text, message_limit)
+		if parse_mode is not None and not all(markdown_is_balanced(part) for part in chunks):
+			parse_mode = None
+		sent = None
+
+	for index, chunk in enumerate(chunks):
+		is_last = index == len(chunks) - 1
+		sent = await _send_text(bot, chat_id, chunk, parse_mode, reply_markup if is_last else None)
+	return sent
+
+
 def format_score(score: int, total: int) -> str:
     """
     Форматирует счет в читаемом виде.